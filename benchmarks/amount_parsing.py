@@ -0,0 +1,31 @@
+import random
+import sys
+import timeit
+
+from benchmarks.synthetic_report import format_es_amount
+from src.utils.math import parse_es_float, parse_es_cents
+
+# Usage: python -m benchmarks.amount_parsing [number_of_amounts]
+g_default_number_of_amounts = 1_000_000
+
+
+def main(number_of_amounts: int) -> None:
+    rng = random.Random(0)
+
+    print(f"{'amounts':>22} {'parser':>16} {'amounts/s':>14}")
+
+    # Most transactions are below 1.000,00, while position and report totals have thousands separators
+    for label, maximum_cents in [("below 1.000,00", 99_999), ("up to 20.000.000,00", 2_000_000_000)]:
+        amounts = [format_es_amount(rng.randint(1, maximum_cents)) for _ in range(number_of_amounts)]
+
+        for amount in amounts:
+            if parse_es_cents(amount) != round(parse_es_float(amount) * 100):
+                raise Exception(f"Parsing mismatch: {amount}")
+
+        for name, parse in [("parse_es_float", parse_es_float), ("parse_es_cents", parse_es_cents)]:
+            seconds = min(timeit.repeat(lambda: [parse(amount) for amount in amounts], number=1, repeat=5))
+            print(f"{label:>22} {name:>16} {number_of_amounts / seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else g_default_number_of_amounts)
@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import xlsxwriter
+
+from benchmarks.synthetic_report import synthetic_report_pages, SyntheticPageSource
+from config.config import logger
+from src.services.CumulativeExpenseReportExcelGenerator import CumulativeExpenseReportExcelGenerator
+from src.services.CumulativeExpenseReportLineClassifier import CumulativeExpenseReportLineClassifier
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+
+# Usage: python -m benchmarks.excel_writer [number_of_transactions ...]
+# Every writer runs in its own process, so the peak resident memory of one does not hide the other's
+g_default_sizes = [100_000, 300_000]
+g_writers = ["cell by cell, in memory", "typed columns, in memory", "typed columns, constant memory"]
+
+
+def write_cell_by_cell(report, new_path: str) -> None:
+    # The writer as it was before: every cell written on its own and the whole workbook kept in memory until closed
+    workbook = xlsxwriter.Workbook(new_path)
+    worksheet = workbook.add_worksheet()
+
+    for column, title in enumerate(CumulativeExpenseReportExcelGenerator.HEADER[:-1]):
+        worksheet.write(0, column, title)
+
+    row = 2
+
+    for budget_position in report.budget_positions:
+        worksheet.write(row, 0, budget_position.compound_name())
+        row += 1
+
+        for transaction in report.budget_position_transactions(budget_position.code):
+            worksheet.write(row, 1 if transaction.excluded_from_total else 2, transaction.amount)
+            worksheet.write(row, 3, budget_position.budget_chapter)
+            worksheet.write(row, 4, "Gasto")
+            worksheet.write(row, 5, transaction.document_type_code)
+            worksheet.write(row, 6, transaction.document_number)
+            worksheet.write(row, 7, transaction.document_position)
+            worksheet.write(row, 8, transaction.reference)
+            worksheet.write(row, 9, transaction.vendor_id)
+            worksheet.write(row, 10, transaction.vendor_name)
+            row += 1
+
+        row += 1
+
+    workbook.close()
+
+
+def run_writer(writer: int, number_of_transactions: int) -> dict:
+    logger.setLevel(logging.ERROR)
+
+    context = CumulativeExpenseReportProcessor.ExecutionContext(
+        file_name="synthetic.pdf",
+        source="synthetic.pdf",
+        line_classifier=CumulativeExpenseReportLineClassifier(),
+        pdf_text_extractor=SyntheticPageSource(synthetic_report_pages(number_of_transactions))
+    )
+    report = context.process_report()
+
+    # Peak resident memory is only ever reported as a high-water mark, so the baseline is taken after parsing
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with tempfile.TemporaryDirectory() as directory:
+        new_path = os.path.join(directory, "report.xlsx")
+        start = time.perf_counter()
+
+        if writer == 0:
+            write_cell_by_cell(report, new_path)
+        else:
+            CumulativeExpenseReportExcelGenerator(constant_memory=writer == 2).generate_file(report, new_path)
+
+        seconds = time.perf_counter() - start
+        size = os.path.getsize(new_path)
+
+    return {
+        "rows": len(report.transactions),
+        "seconds": seconds,
+        "peak_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline,
+        "size": size,
+    }
+
+
+def main(sizes: list) -> None:
+    print(f"{'transactions':>12} {'writer':>30} {'rows/s':>10} {'extra peak RSS (MiB)':>21} {'file (MiB)':>11}")
+
+    for size in sizes:
+        for writer, name in enumerate(g_writers):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.excel_writer", "--child", str(writer), str(size)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+
+            print(f"{size:>12} {name:>30} {result['rows'] / result['seconds']:>10.0f} "
+                  f"{result['peak_kib'] / 1024:>21.1f} {result['size'] / 2 ** 20:>11.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        print(json.dumps(run_writer(int(sys.argv[2]), int(sys.argv[3]))))
+    else:
+        main([int(size) for size in sys.argv[1:]] or g_default_sizes)
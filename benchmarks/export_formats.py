@@ -0,0 +1,77 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_report import synthetic_report_pages, SyntheticPageSource
+from config.config import logger
+from src.models.CumulativeExpenseReportTransaction import CumulativeExpenseReportTransaction
+from src.services.CumulativeExpenseReportColumnarExporter import CumulativeExpenseReportColumnarExporter
+from src.services.CumulativeExpenseReportLineClassifier import CumulativeExpenseReportLineClassifier
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.ReportExporterRegistry import ReportExporterRegistry
+
+# Usage: python -m benchmarks.export_formats [number_of_transactions]
+g_default_number_of_transactions = 100_000
+
+
+def transaction_fields(report) -> list:
+    return [
+        tuple(getattr(transaction, name) for name in CumulativeExpenseReportTransaction.__slots__)
+        for transaction in report.transactions
+    ]
+
+
+def main(number_of_transactions: int) -> None:
+    logger.setLevel(logging.ERROR)
+
+    source = SyntheticPageSource(synthetic_report_pages(number_of_transactions))
+
+    start = time.perf_counter()
+    report = CumulativeExpenseReportProcessor.ExecutionContext(
+        file_name="synthetic.pdf",
+        source="synthetic.pdf",
+        line_classifier=CumulativeExpenseReportLineClassifier(),
+        pdf_text_extractor=source
+    ).process_report()
+    parse_seconds = time.perf_counter() - start
+
+    print(f"{len(report.transactions)} transactions, parsed from text in {parse_seconds:.2f} s")
+    print(f"{'format':>10} {'export (s)':>11} {'rows/s':>10} {'size (MiB)':>11}")
+
+    registry = ReportExporterRegistry()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for export_format in registry.formats():
+            exporter = registry.get(export_format)
+            path = os.path.join(directory, "report" + exporter.EXTENSION)
+
+            start = time.perf_counter()
+            exporter.export_file(report, path)
+            seconds = time.perf_counter() - start
+
+            print(f"{export_format:>10} {seconds:>11.2f} {len(report.transactions) / seconds:>10.0f} "
+                  f"{os.path.getsize(path) / 2 ** 20:>11.2f}")
+
+        # Other formats are exported from the columnar snapshot, which has to give back the very same report
+        columnar_exporter = CumulativeExpenseReportColumnarExporter()
+        path = os.path.join(directory, "report" + columnar_exporter.EXTENSION)
+
+        start = time.perf_counter()
+        loaded_report = columnar_exporter.load(path)
+        load_seconds = time.perf_counter() - start
+
+    identical = transaction_fields(loaded_report) == transaction_fields(report) and \
+        [budget_position.code for budget_position in loaded_report.budget_positions] == \
+        [budget_position.code for budget_position in report.budget_positions] and \
+        loaded_report.total_amount_cents == report.total_amount_cents
+
+    print(f"columnar snapshot loaded in {load_seconds:.2f} s, identical to the parsed report: {identical}")
+
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else g_default_number_of_transactions)
@@ -0,0 +1,102 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Usage: python -m benchmarks.import_time [-r 5] [--scale 1.0] [--no-calibration]
+# Time to import the modules that worker processes and short command line runs start with, from -X importtime in a
+# new interpreter for each of them, exiting with an error if any takes longer than its budget or imports a library
+# that should only be imported once it is used
+g_default_repetitions = 5
+g_root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries only needed by the web app, to read PDFs and to write Excel files
+g_lazy_libraries = ["flask", "werkzeug", "PyPDF2", "xlsxwriter"]
+
+# Module -> milliseconds it may take to import, including everything it imports, on a machine where importing the
+# reference module takes g_reference_milliseconds. They are about three times what they take on such a machine.
+g_budgets = {
+    "src.models.CumulativeExpenseReport": 15,
+    "config.config": 40,
+    "src.services.CumulativeExpenseReportProcessor": 100,
+    "src.services.CumulativeExpenseReportExcelGenerator": 75,
+    "src.cli": 180,
+}
+
+# Standard library package imported alongside, so the budgets scale with the speed of the machine and its disk
+g_reference_module = "unittest"
+g_reference_milliseconds = 30
+
+
+def import_times(module: str) -> dict:
+    # Cumulative milliseconds of every module imported by a new interpreter to import this one, including it
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, [g_root_path, environment.get("PYTHONPATH")]))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=g_root_path, env=environment, capture_output=True, text=True
+    )
+
+    if process.returncode != 0:
+        raise RuntimeError(f"Could not import {module}:\n{process.stderr}")
+
+    times = {}
+
+    # E.g.: "import time:       380 |      15672 |   config.config"
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and not line.endswith("| imported package"):
+            fields = line[len("import time:"):].split("|")
+
+            if fields[1].strip().isdigit():
+                times[fields[2].strip()] = int(fields[1]) / 1000
+
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.import_time",
+        description="Mide el tiempo de importación de los módulos y lo compara con su presupuesto."
+    )
+    parser.add_argument("-r", "--repetitions", type=int, default=g_default_repetitions,
+                        help="Repeticiones de cada importación, de las que se toma el mejor tiempo")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Factor adicional de los presupuestos")
+    parser.add_argument("--no-calibration", action="store_true",
+                        help="No ajusta los presupuestos a la velocidad de la máquina")
+    arguments = parser.parse_args()
+
+    failures = []
+    speed = 1.0
+
+    if not arguments.no_calibration:
+        reference = min(import_times(g_reference_module)[g_reference_module] for _ in range(arguments.repetitions))
+        # Only ever larger, so a fast reference import does not leave the modules without headroom
+        speed = max(reference / g_reference_milliseconds, 1.0)
+        print(f"{g_reference_module} took {reference:.1f} ms to import, budgets are scaled by {speed:.2f}")
+
+    print(f"{'module':>50} {'ms':>8} {'budget':>8}")
+
+    for module, budget in g_budgets.items():
+        runs = [import_times(module) for _ in range(arguments.repetitions)]
+        milliseconds = min(times[module] for times in runs)
+        budget *= speed * arguments.scale
+        print(f"{module:>50} {milliseconds:>8.1f} {budget:>8.1f}")
+
+        if milliseconds > budget:
+            failures.append(f"{module} took {milliseconds:.1f} ms to import, its budget is {budget:.1f} ms")
+
+        imported = {name.split(".")[0] for name in runs[0]}
+
+        for library in g_lazy_libraries:
+            if library in imported:
+                failures.append(f"{module} imports {library}")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_report import synthetic_budget_positions, synthetic_report_pages, synthetic_report_pdf, \
+    SyntheticPageSource
+from config.config import g_budget_positions, logger
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.PdfTextExtractor import PdfTextExtractor
+from src.services.ReportStateStore import ReportStateStore
+from src.valueobjects.BudgetPosition import BudgetPosition
+
+# Usage: python -m benchmarks.incremental_processing [number_of_transactions] [new_transactions] [repetitions]
+# A report of a whole year that grows by a week of transactions
+g_default_number_of_transactions = 20_000
+g_default_new_transactions = 400
+g_default_repetitions = 5
+g_number_of_positions = 40
+
+
+def measure(processor: CumulativeExpenseReportProcessor, source, previous_state_path: str = None) -> float:
+    # CPU time to process the report, after restoring the state saved for the previous report, if any
+    if previous_state_path is not None:
+        shutil.rmtree(processor.report_state_store.root, ignore_errors=True)
+        shutil.copytree(previous_state_path, processor.report_state_store.root)
+
+    start = time.process_time()
+    processor.process_report("report.pdf", source)
+
+    return time.process_time() - start
+
+
+def main(number_of_transactions: int, new_transactions: int, repetitions: int) -> None:
+    logger.setLevel(logging.ERROR)
+
+    # Positions of real reports are registered, so every synthetic one is too, instead of warning about each of them
+    for code, name in synthetic_budget_positions(g_number_of_positions):
+        g_budget_positions.setdefault(code, BudgetPosition(code, name, "2"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        previous_state_path = os.path.join(directory, "previous")
+        full = CumulativeExpenseReportProcessor(incremental=False)
+        incremental = CumulativeExpenseReportProcessor()
+        incremental.report_state_store = ReportStateStore(os.path.join(directory, "states"))
+
+        print(f"{number_of_transactions} transactions, then {new_transactions} more")
+        print(f"{'source':>8} {'pages':>6} {'full (s)':>9} {'incremental (s)':>16} {'speedup':>8}")
+
+        # From text already extracted, which shows the parsing saved, and from PDF files, whose text still has to be
+        # extracted from every page to know which pages changed
+        for source_type in ["text", "pdf"]:
+            if source_type == "text":
+                previous = SyntheticPageSource(synthetic_report_pages(number_of_transactions, g_number_of_positions))
+                current = SyntheticPageSource(synthetic_report_pages(
+                    number_of_transactions, g_number_of_positions, new_transactions=new_transactions
+                ))
+                previous_source = current_source = None
+                number_of_pages = len(current.pages)
+            else:
+                previous = current = PdfTextExtractor()
+                previous_source = os.path.join(directory, "previous.pdf")
+                current_source = os.path.join(directory, "current.pdf")
+
+                with open(previous_source, "wb") as file:
+                    file.write(synthetic_report_pdf(number_of_transactions, g_number_of_positions))
+
+                with open(current_source, "wb") as file:
+                    file.write(synthetic_report_pdf(
+                        number_of_transactions, g_number_of_positions, new_transactions=new_transactions
+                    ))
+
+                number_of_pages = len(list(current.iter_pages(current_source)))
+
+            # The state of the previous report is saved once and restored before every incremental run
+            shutil.rmtree(incremental.report_state_store.root, ignore_errors=True)
+            incremental.pdf_text_extractor = previous
+            incremental.process_report("report.pdf", previous_source)
+            shutil.rmtree(previous_state_path, ignore_errors=True)
+            shutil.copytree(incremental.report_state_store.root, previous_state_path)
+
+            full.pdf_text_extractor = incremental.pdf_text_extractor = current
+            times = {"full": [], "incremental": []}
+
+            # In turns, so a change in the load of the machine affects both alike, keeping the best time of each
+            for _ in range(repetitions):
+                times["full"].append(measure(full, current_source))
+                times["incremental"].append(measure(incremental, current_source, previous_state_path))
+
+            full_seconds = min(times["full"])
+            incremental_seconds = min(times["incremental"])
+
+            print(f"{source_type:>8} {number_of_pages:>6} {full_seconds:>9.3f} {incremental_seconds:>16.3f} "
+                  f"{full_seconds / incremental_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else g_default_number_of_transactions,
+        int(sys.argv[2]) if len(sys.argv) > 2 else g_default_new_transactions,
+        int(sys.argv[3]) if len(sys.argv) > 3 else g_default_repetitions
+    )
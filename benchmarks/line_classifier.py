@@ -0,0 +1,89 @@
+import re
+import sys
+import time
+
+from benchmarks.synthetic_report import synthetic_report_text
+from config.config import g_budget_position_header_regex, g_budget_position_total_amount_regex, \
+    g_transaction_first_line_regex, g_transaction_second_line_regex, g_ignored_strings
+from src.services.CumulativeExpenseReportLineClassifier import CumulativeExpenseReportLineClassifier
+
+# Usage: python -m benchmarks.line_classifier [number_of_lines ...]
+g_default_sizes = [10_000, 100_000, 1_000_000]
+
+
+def sequential_search_classify(line: str):
+    # Line classification as it was done before the classifier: four unanchored searches in a row
+    for line_type, regex in enumerate([
+        g_budget_position_header_regex,
+        g_budget_position_total_amount_regex,
+        g_transaction_first_line_regex,
+        g_transaction_second_line_regex
+    ], start=1):
+        match = re.search(regex, line)
+        if match is not None:
+            return line_type, match
+
+    return None, None
+
+
+def sequential_clean(line: str) -> str:
+    # Line cleaning as it was done before the grammars: one substitution per ignored string
+    for ignored_string in g_ignored_strings:
+        line = re.sub(ignored_string, '', line)
+
+    return line
+
+
+def raw_lines(number_of_lines: int) -> list:
+    # Two lines per transaction is close enough to size the synthetic report
+    return synthetic_report_text(number_of_lines // 2).splitlines()[:number_of_lines]
+
+
+def clean_lines(number_of_lines: int) -> list:
+    return [line for line in map(sequential_clean, raw_lines(number_of_lines)) if line.strip() != ""]
+
+
+def measure(classify, lines: list) -> float:
+    start = time.perf_counter()
+
+    for line in lines:
+        classify(line)
+
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main(sizes: list) -> None:
+    classifier = CumulativeExpenseReportLineClassifier()
+
+    print(f"{'lines':>10} {'before (lines/s)':>18} {'after (lines/s)':>18} {'speedup':>8}")
+
+    for size in sizes:
+        lines = clean_lines(size)
+
+        for line in lines:
+            if sequential_search_classify(line)[0] != classifier.classify(line)[0]:
+                raise Exception(f"Classification mismatch: {line}")
+
+        before = measure(sequential_search_classify, lines)
+        after = measure(classifier.classify, lines)
+
+        print(f"{len(lines):>10} {before:>18,.0f} {after:>18,.0f} {after / before:>7.1f}x")
+
+    print()
+    print(f"{'lines':>10} {'clean before (lines/s)':>24} {'clean after (lines/s)':>24} {'speedup':>8}")
+
+    for size in sizes:
+        lines = raw_lines(size)
+
+        for line in lines:
+            if sequential_clean(line) != classifier.clean(line):
+                raise Exception(f"Cleaning mismatch: {line}")
+
+        before = measure(sequential_clean, lines)
+        after = measure(classifier.clean, lines)
+
+        print(f"{len(lines):>10} {before:>24,.0f} {after:>24,.0f} {after / before:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or g_default_sizes)
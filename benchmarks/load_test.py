@@ -0,0 +1,109 @@
+import http.client
+import json
+import logging
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic_report import synthetic_report_pdf
+from config.config import g_http_port, logger
+
+# Usage: python -m benchmarks.load_test [url] [uploads] [concurrency] [number_of_transactions]
+# Uploads synthetic reports to a running server, e.g. gunicorn -c gunicorn.conf.py, and waits for each of them to be
+# processed. Every upload is a different report, so none of them is answered from the result cache.
+g_default_url = f"http://127.0.0.1:{g_http_port}"
+g_default_uploads = 40
+g_default_concurrency = 8
+g_default_number_of_transactions = 500
+g_poll_interval_seconds = 0.05
+
+
+class Client:
+
+    # One keep-alive connection per thread
+    def __init__(self, url: str):
+        self.url = urllib.parse.urlsplit(url)
+        self.local = threading.local()
+
+    def request(self, method: str, path: str, body: bytes = None, headers: dict = None) -> tuple:
+        connection = getattr(self.local, "connection", None)
+
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection(self.url.hostname, self.url.port)
+
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self.local.connection = None
+            raise
+
+
+def upload(client: Client, pdf: bytes) -> tuple:
+    # (seconds from the upload until the report is processed, final status)
+    start = time.perf_counter()
+    status, body = client.request(
+        "POST", "/api/cumulative-expense-reports?filename=report.pdf", pdf, {"Content-Type": "application/pdf"}
+    )
+
+    if status != 202:
+        return time.perf_counter() - start, f"HTTP {status}"
+
+    job_id = json.loads(body)["id"]
+
+    while True:
+        status, body = client.request("GET", f"/api/cumulative-expense-reports/jobs/{job_id}")
+
+        if status != 200:
+            return time.perf_counter() - start, f"HTTP {status}"
+
+        job_status = json.loads(body)["status"]
+
+        if job_status not in ("queued", "running"):
+            return time.perf_counter() - start, job_status
+
+        time.sleep(g_poll_interval_seconds)
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def main(url: str, uploads: int, concurrency: int, number_of_transactions: int) -> None:
+    logger.setLevel(logging.ERROR)
+
+    pdfs = [synthetic_report_pdf(number_of_transactions, seed=seed) for seed in range(uploads)]
+    client = Client(url)
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda pdf: upload(client, pdf), pdfs))
+
+    elapsed = time.perf_counter() - start
+    latencies = [seconds for seconds, status in results if status == "done"]
+    failures = [status for seconds, status in results if status != "done"]
+
+    print(f"{uploads} uploads of {number_of_transactions} transactions, {concurrency} at a time, to {url}")
+    print(f"requests/s:  {len(latencies) / elapsed:.2f}")
+
+    if latencies:
+        print(f"latency p50: {percentile(latencies, 0.50) * 1000:.0f} ms")
+        print(f"latency p95: {percentile(latencies, 0.95) * 1000:.0f} ms")
+
+    if failures:
+        print(f"failed:      {len(failures)} ({', '.join(sorted(set(failures)))})")
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else g_default_url,
+        int(sys.argv[2]) if len(sys.argv) > 2 else g_default_uploads,
+        int(sys.argv[3]) if len(sys.argv) > 3 else g_default_concurrency,
+        int(sys.argv[4]) if len(sys.argv) > 4 else g_default_number_of_transactions
+    )
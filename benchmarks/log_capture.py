@@ -0,0 +1,104 @@
+import io
+import logging
+import sys
+import threading
+import time
+
+from config.config import logger
+from src.log.CapturingLogger import CapturingLogger
+
+# Usage: python -m benchmarks.log_capture [number_of_requests] [messages_per_request] [threads]
+g_default_number_of_requests = 400
+g_default_messages_per_request = 100
+g_default_threads = 8
+
+
+def handler_per_call_capture_html_logs(func):
+    # Capture as it was before: a handler added to the shared logger for every call, so every concurrent call
+    # receives the records of the others, and every record is formatted as HTML as soon as it is logged
+    buffer = io.StringIO()
+    handler = logging.StreamHandler(buffer)
+    handler.setLevel(logging.DEBUG)
+    handler.setFormatter(CapturingLogger.AsciiToHtmlFormatter())
+
+    logger.addHandler(handler)
+
+    try:
+        result = func()
+    finally:
+        logger.removeHandler(handler)
+
+    log_contents = buffer.getvalue()
+    buffer.close()
+
+    return result, log_contents
+
+
+def request(name: str, messages_per_request: int):
+    def run():
+        for index in range(messages_per_request):
+            logger.info(f"{name} {index}")
+
+    return run
+
+
+def run_requests(capture, number_of_requests: int, messages_per_request: int, threads: int) -> dict:
+    # Every thread runs its share of the requests one after another, while the other threads run theirs
+    foreign = [0]
+    foreign_lock = threading.Lock()
+
+    def worker(thread_index: int):
+        for request_index in range(thread_index, number_of_requests, threads):
+            name = f"r{request_index}"
+            _, logs = capture(request(name, messages_per_request))
+            own = logs.count(f">{name} ")
+
+            with foreign_lock:
+                foreign[0] += logs.count("<p ") - own
+
+    start = time.perf_counter()
+
+    workers = [threading.Thread(target=worker, args=(thread_index,)) for thread_index in range(threads)]
+
+    for thread in workers:
+        thread.start()
+
+    for thread in workers:
+        thread.join()
+
+    seconds = time.perf_counter() - start
+
+    return {
+        "microseconds_per_message": seconds / (number_of_requests * messages_per_request) * 1_000_000,
+        "foreign_records": foreign[0],
+        "handlers_left": len(logger.handlers),
+    }
+
+
+def main(number_of_requests: int, messages_per_request: int, threads: int) -> None:
+    # Without the console handler, so only the capture itself is measured
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    # With a handler per call, records of other threads reach buffers already closed, which logging reports on stderr
+    logging.raiseExceptions = False
+
+    print(f"{number_of_requests} requests of {messages_per_request} messages on {threads} threads")
+    print(f"{'capture':>18} {'µs/message':>11} {'foreign records':>16} {'handlers left':>14}")
+
+    for name, capture in [
+        ("context capture", CapturingLogger.capture_html_logs),
+        ("handler per call", handler_per_call_capture_html_logs),
+    ]:
+        result = run_requests(capture, number_of_requests, messages_per_request, threads)
+
+        print(f"{name:>18} {result['microseconds_per_message']:>11.1f} {result['foreign_records']:>16} "
+              f"{result['handlers_left']:>14}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else g_default_number_of_requests,
+        int(sys.argv[2]) if len(sys.argv) > 2 else g_default_messages_per_request,
+        int(sys.argv[3]) if len(sys.argv) > 3 else g_default_threads
+    )
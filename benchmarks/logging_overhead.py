@@ -0,0 +1,91 @@
+import logging
+import os
+import sys
+import time
+
+from benchmarks.synthetic_report import synthetic_budget_positions, synthetic_report_pages, SyntheticPageSource
+from config.config import g_budget_positions, logger
+from src.log.CapturingLogger import CapturingLogger
+from src.log.CustomFormatter import CustomFormatter
+from src.services.CumulativeExpenseReportLineClassifier import CumulativeExpenseReportLineClassifier
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.valueobjects.BudgetPosition import BudgetPosition
+
+# Usage: python -m benchmarks.logging_overhead [number_of_transactions] [number_of_positions] [repetitions]
+# Many positions per report, since most messages are logged once per position
+g_default_number_of_transactions = 50_000
+g_default_number_of_positions = 2_000
+g_default_repetitions = 10
+
+
+def parse(pages: list, quiet: bool) -> None:
+    CumulativeExpenseReportProcessor.ExecutionContext(
+        file_name="synthetic.pdf",
+        source="synthetic.pdf",
+        line_classifier=CumulativeExpenseReportLineClassifier(),
+        pdf_text_extractor=SyntheticPageSource(pages),
+        quiet=quiet
+    ).process_report()
+
+
+def parse_with_logging(pages: list, console: logging.Handler, mode: str) -> None:
+    logger.disabled = mode == "disabled"
+
+    if mode in ("console", "console + web capture", "quiet, console + capture"):
+        logger.addHandler(console)
+
+    try:
+        if mode == "console + web capture":
+            CapturingLogger.capture_html_logs(lambda: parse(pages, quiet=False))
+        elif mode == "quiet, console + capture":
+            CapturingLogger.capture_html_logs(lambda: parse(pages, quiet=True))
+        else:
+            parse(pages, quiet=False)
+    finally:
+        logger.disabled = False
+        logger.removeHandler(console)
+
+
+def main(number_of_transactions: int, number_of_positions: int, repetitions: int) -> None:
+    pages = synthetic_report_pages(number_of_transactions, number_of_positions)
+
+    # Positions of real reports are registered, so every synthetic one is too, instead of warning about each of them
+    for code, name in synthetic_budget_positions(number_of_positions):
+        g_budget_positions.setdefault(code, BudgetPosition(code, name, "2"))
+    modes = ["disabled", "console", "console + web capture", "quiet, console + capture"]
+
+    # The console handler writes to the null device, so the terminal does not take part in the measure
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    console = logging.StreamHandler(open(os.devnull, "w"))
+    console.setFormatter(CustomFormatter())
+
+    # A first parse warms up the caches of the parser, e.g. the parsed dates. The modes are then run in turns, so a
+    # change in the load of the machine affects all of them alike, and the best time of each one is kept.
+    parse_with_logging(pages, console, "disabled")
+    times = {mode: [] for mode in modes}
+
+    for _ in range(repetitions):
+        for mode in modes:
+            start = time.process_time()
+            parse_with_logging(pages, console, mode)
+            times[mode].append(time.process_time() - start)
+
+    disabled = min(times["disabled"])
+
+    print(f"{number_of_transactions} transactions in {number_of_positions} positions, "
+          f"{disabled:.3f} s of CPU with logging disabled")
+    print(f"{'logging':>24} {'parse (s)':>10} {'logging share':>14}")
+
+    for mode in modes[1:]:
+        seconds = min(times[mode])
+        print(f"{mode:>24} {seconds:>10.3f} {(seconds - disabled) / seconds:>14.1%}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else g_default_number_of_transactions,
+        int(sys.argv[2]) if len(sys.argv) > 2 else g_default_number_of_positions,
+        int(sys.argv[3]) if len(sys.argv) > 3 else g_default_repetitions
+    )
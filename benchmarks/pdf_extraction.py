@@ -0,0 +1,46 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_report import synthetic_report_pdf
+from config.config import logger
+from src.services.PdfTextExtractor import PdfTextExtractor
+
+# Usage: python -m benchmarks.pdf_extraction [number_of_transactions] [processes ...]
+g_default_number_of_transactions = 20_000
+
+
+def main(number_of_transactions: int, processes: list) -> None:
+    logger.setLevel(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "report.pdf")
+
+        with open(path, "wb") as file:
+            file.write(synthetic_report_pdf(number_of_transactions))
+
+        start = time.perf_counter()
+        expected = "\n".join(PdfTextExtractor(processes=1).iter_pages(path))
+        sequential = time.perf_counter() - start
+
+        print(f"{'processes':>10} {'seconds':>10} {'speedup':>8}")
+        print(f"{1:>10} {sequential:>10.2f} {1:>7.1f}x")
+
+        for count in processes:
+            start = time.perf_counter()
+            text = "\n".join(PdfTextExtractor(processes=count).iter_pages(path))
+            elapsed = time.perf_counter() - start
+
+            if text != expected:
+                raise Exception(f"Parallel extraction with {count} processes differs from the sequential one")
+
+            print(f"{count:>10} {elapsed:>10.2f} {sequential / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else g_default_number_of_transactions,
+        [int(count) for count in sys.argv[2:]] or [2, 4, os.cpu_count()]
+    )
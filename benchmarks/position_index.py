@@ -0,0 +1,61 @@
+import logging
+import sys
+import time
+
+from benchmarks.synthetic_report import synthetic_report_pages, SyntheticPageSource
+from config.config import logger
+from src.services.CumulativeExpenseReportLineClassifier import CumulativeExpenseReportLineClassifier
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+
+# Usage: python -m benchmarks.position_index [number_of_transactions] [number_of_positions]
+g_default_number_of_transactions = 100_000
+g_default_number_of_positions = 500
+
+
+def scan_per_position(report, budget_position_totals: dict) -> None:
+    # Grouping and validation as they were done before the index: a full scan of the transactions per position
+    for budget_position in report.budget_positions:
+        [t for t in report.transactions if t.budget_position_code == budget_position.code]
+
+    for budget_position_code in budget_position_totals:
+        total_amount = 0
+
+        for transaction in report.transactions:
+            if transaction.budget_position_code == budget_position_code and not transaction.excluded_from_total:
+                total_amount += transaction.amount
+
+
+def indexed_per_position(report, budget_position_totals: dict) -> None:
+    for budget_position in report.budget_positions:
+        report.budget_position_transactions(budget_position.code)
+
+    for budget_position_code in budget_position_totals:
+        report.budget_position_transactions_total_cents(budget_position_code)
+
+
+def main(number_of_transactions: int, number_of_positions: int) -> None:
+    logger.setLevel(logging.ERROR)
+
+    context = CumulativeExpenseReportProcessor.ExecutionContext(
+        file_name="synthetic.pdf",
+        source="synthetic.pdf",
+        line_classifier=CumulativeExpenseReportLineClassifier(),
+        pdf_text_extractor=SyntheticPageSource(
+            synthetic_report_pages(number_of_transactions, number_of_positions)
+        )
+    )
+    report = context.process_report()
+
+    print(f"{len(report.transactions)} transactions across {len(report.budget_positions)} positions")
+
+    for name, function in [("per-position scan", scan_per_position), ("position index", indexed_per_position)]:
+        start = time.perf_counter()
+        function(report, context.budget_position_totals)
+        print(f"{name:>18}: {time.perf_counter() - start:.3f} s")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else g_default_number_of_transactions,
+        int(sys.argv[2]) if len(sys.argv) > 2 else g_default_number_of_positions
+    )
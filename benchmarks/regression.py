@@ -0,0 +1,171 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_report import synthetic_budget_positions, synthetic_report_pdf
+from config.config import g_budget_positions, logger
+from src.services.CumulativeExpenseReportExcelGenerator import CumulativeExpenseReportExcelGenerator
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.ReportMetrics import ReportMetrics
+from src.valueobjects.BudgetPosition import BudgetPosition
+
+# Usage: python -m benchmarks.regression [--scales 1000 10000] [--update-baseline]
+# Times every stage of the processing of synthetic PDF reports and compares them with the times stored in
+# benchmarks/baseline.json, exiting with an error if any of them got slower
+g_default_scales = [1_000, 10_000]
+g_default_repetitions = 5
+g_number_of_positions = 40
+g_baseline_path = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# A stage regresses if it is this much slower than the baseline...
+g_default_tolerance = 0.25
+# ...and by more than these seconds, as the shortest stages vary more than that from run to run
+g_min_regression_seconds = 0.005
+
+g_stages = [
+    ReportMetrics.EXTRACT, ReportMetrics.CLEAN, ReportMetrics.CLASSIFY, ReportMetrics.VALIDATE, ReportMetrics.GENERATE
+]
+
+
+def calibrate() -> float:
+    # CPU seconds of a fixed pure Python workload. Times are compared relative to its best time, so a baseline
+    # stored on one machine is still meaningful on a faster or slower one.
+    start = time.process_time()
+    total = 0
+
+    for i in range(300_000):
+        total += len(str(i * 7919)) % 3
+
+    return time.process_time() - start
+
+
+def measure(path: str, repetitions: int, calibrations: list) -> dict:
+    # Best CPU seconds of each stage, and of all of them, over the repetitions. The workload of calibrate runs
+    # before each of them, so a change in the load of the machine affects both alike.
+    processor = CumulativeExpenseReportProcessor(incremental=False)
+    excel_generator = CumulativeExpenseReportExcelGenerator()
+    best = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(repetitions):
+            calibrations.append(calibrate())
+            metrics = ReportMetrics()
+            report = processor.process_report(os.path.basename(path), path, metrics)
+
+            with metrics.stage(ReportMetrics.GENERATE):
+                excel_generator.generate_file(report, os.path.join(directory, "report.xlsx"))
+
+            times = {stage: metrics.stages[stage]["cpu_seconds"] for stage in g_stages}
+            times["total"] = sum(times.values())
+
+            for stage, seconds in times.items():
+                best[stage] = min(best.get(stage, seconds), seconds)
+
+    return best
+
+
+def compare(results: dict, speed: float, baseline: dict, tolerance: float) -> list:
+    # (scale, stage, expected seconds, seconds) of every stage slower than the baseline, once scaled by the speed
+    # of this machine relative to the one of the baseline
+    regressions = []
+
+    for scale, times in results.items():
+        baseline_times = baseline["results"].get(scale, {})
+
+        for stage, seconds in times.items():
+            if stage not in baseline_times:
+                continue
+
+            expected = baseline_times[stage] * speed
+
+            if seconds > expected * (1 + tolerance) and seconds - expected > g_min_regression_seconds:
+                regressions.append((scale, stage, expected, seconds))
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.regression",
+        description="Mide cada etapa del procesado de informes sintéticos y la compara con la línea base."
+    )
+    parser.add_argument("--scales", type=int, nargs="+", default=g_default_scales,
+                        help="Número de movimientos de cada informe sintético")
+    parser.add_argument("-r", "--repetitions", type=int, default=g_default_repetitions,
+                        help="Repeticiones de cada informe, de las que se toma el mejor tiempo")
+    parser.add_argument("-t", "--tolerance", type=float, default=g_default_tolerance,
+                        help="Fracción más lenta que la línea base a partir de la que una etapa es una regresión")
+    parser.add_argument("-b", "--baseline", default=g_baseline_path,
+                        help="Fichero JSON con la línea base")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Guarda los tiempos medidos como la nueva línea base")
+    arguments = parser.parse_args()
+
+    logger.setLevel(logging.ERROR)
+
+    # Positions of real reports are registered, so every synthetic one is too, instead of warning about each of them
+    for code, name in synthetic_budget_positions(g_number_of_positions):
+        g_budget_positions.setdefault(code, BudgetPosition(code, name, "2"))
+
+    calibrations = []
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in arguments.scales:
+            path = os.path.join(directory, f"report-{scale}.pdf")
+
+            with open(path, "wb") as file:
+                file.write(synthetic_report_pdf(scale, g_number_of_positions))
+
+            results[str(scale)] = measure(path, arguments.repetitions, calibrations)
+
+    calibration = min(calibrations)
+    baseline = None
+
+    if not arguments.update_baseline and os.path.exists(arguments.baseline):
+        with open(arguments.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    speed = calibration / baseline["calibration_seconds"] if baseline is not None else None
+
+    print(f"{'transactions':>12} {'stage':>9} {'seconds':>9} {'expected':>9} {'change':>8}")
+
+    for scale, times in results.items():
+        for stage, seconds in times.items():
+            expected = baseline["results"].get(scale, {}).get(stage) if baseline is not None else None
+            expected = expected * speed if expected is not None else None
+            change = f"{(seconds / expected - 1) * 100:+7.1f}%" if expected else ""
+            print(f"{scale:>12} {stage:>9} {seconds:>9.3f} {expected or 0:>9.3f} {change:>8}")
+
+    if arguments.update_baseline:
+        with open(arguments.baseline, "w", encoding="utf-8") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "calibration_seconds": calibration,
+                "results": results,
+            }, file, indent=2)
+            file.write("\n")
+
+        print(f"Baseline saved to {arguments.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"There is no baseline at {arguments.baseline}, run with --update-baseline to save one")
+        return 0
+
+    regressions = compare(results, speed, baseline, arguments.tolerance)
+
+    for scale, stage, expected, seconds in regressions:
+        print(f"REGRESSION: {stage} of {scale} transactions took {seconds:.3f} s, {expected:.3f} s expected")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import logging
+import sys
+import tracemalloc
+
+from benchmarks.synthetic_report import synthetic_report_pages, SyntheticPageSource
+from config.config import logger
+from src.services.CumulativeExpenseReportLineClassifier import CumulativeExpenseReportLineClassifier
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+
+# Usage: python -m benchmarks.streaming_memory [number_of_transactions ...]
+g_default_sizes = [10_000, 50_000, 200_000]
+
+
+def main(sizes: list) -> None:
+    logger.setLevel(logging.ERROR)
+
+    print(f"{'transactions':>12} {'pages':>6} {'peak (MiB)':>11} {'report (MiB)':>13} {'transient (MiB)':>16}")
+
+    for size in sizes:
+        # Pages are generated up front so only the pipeline itself is traced
+        source = SyntheticPageSource(synthetic_report_pages(size))
+
+        context = CumulativeExpenseReportProcessor.ExecutionContext(
+            file_name="synthetic.pdf",
+            source="synthetic.pdf",
+            line_classifier=CumulativeExpenseReportLineClassifier(),
+            pdf_text_extractor=source
+        )
+
+        tracemalloc.start()
+        report = context.process_report()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Whatever was allocated at the peak but is no longer retained by the report is text buffering
+        print(f"{size:>12} {len(source.pages):>6} {peak / 2 ** 20:>11.1f} {retained / 2 ** 20:>13.1f} "
+              f"{(peak - retained) / 2 ** 20:>16.2f}")
+
+        del report
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or g_default_sizes)
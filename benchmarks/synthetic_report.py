@@ -0,0 +1,197 @@
+import random
+import sys
+
+from config.config import g_budget_positions, d_transaction_document_types
+
+g_synthetic_object_id = "E0390122A400"
+g_synthetic_object_name = "DELEGACION ALUMNOS"
+g_synthetic_lines_per_page = 48
+
+g_synthetic_descriptions = [
+    "Tren Pedro Martínez Ritsi Valencia 8-12 noviembre",
+    "Dietas Ritsi Valencia",
+    "Material de oficina",
+]
+
+g_synthetic_vendors = [
+    "0842773 B82560947 OFIPAPEL CENTER. S.L.",
+    "20230401 B82352691 CONSTAN",
+    "SN 07.02.2023 00827691J GARCIA SANZ, JOSE LUIS -F. VENECIA",
+    "CF0012200 FTAD. DE INFORMÁTICA",
+    "EMIT-106 B88047196 FLUGE AUDIOVISUAL, S.L.",
+]
+
+
+def format_es_amount(cents: int) -> str:
+    integer, decimals = divmod(cents, 100)
+    return f"{integer:,}".replace(",", ".") + f",{decimals:02d}"
+
+
+def synthetic_budget_positions(number_of_positions: int) -> list:
+    known = [(bp.code, bp.name) for bp in g_budget_positions.values()]
+    positions = known[:number_of_positions]
+
+    for i in range(len(positions), number_of_positions):
+        positions.append((f"G/{9000000 + i:07d}/2000", f"Posición sintética {i}"))
+
+    return positions
+
+
+def synthetic_position_lines(code: str, name: str, number_of_transactions: int, rng: random.Random):
+    document_types = list(d_transaction_document_types)
+    lines = [f"Posición Presupuestaria: {code} {name}"]
+    position_cents = 0
+
+    for _ in range(number_of_transactions):
+        cents = rng.randint(1, 2_500_000)
+        excluded = rng.random() < 0.05
+        position = f" {rng.randint(1, 20):03d}" if rng.random() < 0.7 else ""
+        description = f" {rng.choice(g_synthetic_descriptions)}" if rng.random() < 0.3 else ""
+        lines.append(
+            f"{rng.choice(document_types)} {rng.randint(1000000000, 4999999999)}   /{position} "
+            f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2023 {code}{description}"
+            f"               {format_es_amount(cents)}{' *' if excluded else ''}"
+        )
+        lines.append(rng.choice(g_synthetic_vendors))
+
+        if not excluded:
+            position_cents += cents
+
+    lines.append(f"Importe total de la partida {code}:               {format_es_amount(position_cents)}")
+
+    return lines, position_cents
+
+
+def synthetic_body_lines(number_of_transactions: int, number_of_positions: int = 13, seed: int = 0,
+                         new_transactions: int = 0):
+    # new_transactions are added in one more position at the end, without changing the rest of the report, like in
+    # a later version of the same cumulative report
+    rng = random.Random(seed)
+    positions = synthetic_budget_positions(number_of_positions)
+    per_position, remainder = divmod(number_of_transactions, len(positions))
+    total_cents = 0
+    lines = []
+
+    for index, (code, name) in enumerate(positions):
+        position_lines, position_cents = synthetic_position_lines(
+            code, name, per_position + (1 if index < remainder else 0), rng
+        )
+        lines.extend(position_lines)
+        total_cents += position_cents
+
+    if new_transactions > 0:
+        position_lines, position_cents = synthetic_position_lines(
+            "G/9999999/2000", "Posición sintética nueva", new_transactions, random.Random(seed + 1)
+        )
+        lines.extend(position_lines)
+        total_cents += position_cents
+
+    return lines, total_cents
+
+
+def synthetic_report_pages(number_of_transactions: int, number_of_positions: int = 13, seed: int = 0,
+                           new_transactions: int = 0) -> list:
+    body, total_cents = synthetic_body_lines(number_of_transactions, number_of_positions, seed, new_transactions)
+    chunks = [body[i:i + g_synthetic_lines_per_page] for i in range(0, len(body), g_synthetic_lines_per_page)]
+    pages = []
+
+    for number, chunk in enumerate(chunks, start=1):
+        header = [
+            "UNIVERSIDAD COMPLUTENSE DE MADRID",
+            "INFORME DE GASTOS ACUMULADO",
+            f"Orden: {g_synthetic_object_id} {g_synthetic_object_name}",
+            f"{number}    de    {len(chunks)}",
+            "A DIA: 07 de Diciembre 2023",
+            "Tipo doc. Nº.Documento / Pos +/- Fecha doc. Pos.Pre. Descripción Importe",
+            "Referencia NIF acreedor Nombre",
+        ]
+        footer = []
+
+        if number == len(chunks):
+            footer = [
+                f"Importe total de la orden {g_synthetic_object_id}:            {format_es_amount(total_cents)}",
+                "(*): No interviene en el calculo del importe total",
+                "_______________________ _______________________",
+            ]
+
+        pages.append("\n".join(header + chunk + footer))
+
+    return pages
+
+
+def synthetic_report_text(number_of_transactions: int, number_of_positions: int = 13, seed: int = 0) -> str:
+    return "\n".join(synthetic_report_pages(number_of_transactions, number_of_positions, seed))
+
+
+class SyntheticPageSource:
+
+    # Stands in for PdfTextExtractor, yielding pages that have already been generated
+    def __init__(self, pages: list):
+        self.pages = pages
+
+    def iter_pages(self, source):
+        yield from self.pages
+
+
+def _pdf_string(line: str) -> bytes:
+    escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return b"(" + escaped.encode("cp1252") + b")"
+
+
+def synthetic_report_pdf(number_of_transactions: int, number_of_positions: int = 13, seed: int = 0,
+                         new_transactions: int = 0) -> bytes:
+    # Minimal hand-written PDF: one Helvetica text object per page, one line per T* operator
+    pages = synthetic_report_pages(number_of_transactions, number_of_positions, seed, new_transactions)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+
+    for page in pages:
+        content = b"BT /F1 8 Tf 10 TL 20 820 Td " + b" T* ".join(
+            _pdf_string(line) + b" Tj" for line in page.split("\n")
+        ) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        kids.append(b"%d 0 R" % len(objects))
+
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(kids)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    return bytes(output)
+
+
+def main(number_of_transactions: int, path: str, number_of_positions: int, seed: int) -> None:
+    # Writes a report as a PDF or, for any other extension, as the text the PDF extraction would give
+    if path.lower().endswith(".pdf"):
+        with open(path, "wb") as file:
+            file.write(synthetic_report_pdf(number_of_transactions, number_of_positions, seed))
+    else:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(synthetic_report_text(number_of_transactions, number_of_positions, seed))
+
+
+if __name__ == "__main__":
+    # Usage: python -m benchmarks.synthetic_report number_of_transactions path [number_of_positions] [seed]
+    main(
+        int(sys.argv[1]),
+        sys.argv[2],
+        int(sys.argv[3]) if len(sys.argv) > 3 else 13,
+        int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    )
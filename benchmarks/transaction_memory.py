@@ -0,0 +1,83 @@
+import logging
+import sys
+import tracemalloc
+
+from benchmarks.synthetic_report import synthetic_report_pages, SyntheticPageSource
+from config.config import logger
+from src.models.CumulativeExpenseReportTransaction import CumulativeExpenseReportTransaction
+from src.models.CumulativeExpenseReportTransactionTable import CumulativeExpenseReportTransactionTable
+from src.services.CumulativeExpenseReportLineClassifier import CumulativeExpenseReportLineClassifier
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+
+# Usage: python -m benchmarks.transaction_memory [number_of_transactions]
+g_default_number_of_transactions = 100_000
+
+
+class DictTransaction:
+
+    # Transaction record as it was before __slots__: one instance dictionary per transaction
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+
+def fresh(value):
+    # Parsed strings come from regex groups, so every row owns its own copies
+    return value.encode("utf-8").decode("utf-8") if isinstance(value, str) else value
+
+
+def fresh_fields(row: dict) -> dict:
+    return {name: fresh(value) for name, value in row.items()}
+
+
+def parsed_rows(number_of_transactions: int) -> list:
+    context = CumulativeExpenseReportProcessor.ExecutionContext(
+        file_name="synthetic.pdf",
+        source="synthetic.pdf",
+        line_classifier=CumulativeExpenseReportLineClassifier(),
+        pdf_text_extractor=SyntheticPageSource(synthetic_report_pages(number_of_transactions))
+    )
+
+    return [
+        {name: getattr(transaction, name) for name in CumulativeExpenseReportTransaction.__slots__}
+        for transaction in context.process_report().transactions
+    ]
+
+
+def measure(build, rows: list) -> int:
+    tracemalloc.start()
+    container = build(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del container
+
+    return size
+
+
+def build_table(rows: list) -> CumulativeExpenseReportTransactionTable:
+    table = CumulativeExpenseReportTransactionTable()
+
+    for row in rows:
+        table.append(CumulativeExpenseReportTransaction(**fresh_fields(row)))
+
+    return table
+
+
+def main(number_of_transactions: int) -> None:
+    logger.setLevel(logging.ERROR)
+
+    rows = parsed_rows(number_of_transactions)
+    scale = 100_000 / len(rows)
+
+    print(f"{'storage':>22} {'MiB per 100k transactions':>26}")
+
+    for name, build in [
+        ("dict-backed objects", lambda r: [DictTransaction(**fresh_fields(row)) for row in r]),
+        ("__slots__ objects", lambda r: [CumulativeExpenseReportTransaction(**fresh_fields(row)) for row in r]),
+        ("columnar table", build_table),
+    ]:
+        print(f"{name:>22} {measure(build, rows) * scale / 2 ** 20:>26.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else g_default_number_of_transactions)
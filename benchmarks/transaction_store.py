@@ -0,0 +1,108 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_report import synthetic_budget_positions, synthetic_report_pages, SyntheticPageSource
+from config.config import g_budget_positions, logger
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.TransactionStore import TransactionStore
+from src.valueobjects.BudgetPosition import BudgetPosition
+
+# Usage: python -m benchmarks.transaction_store [number_of_reports] [transactions_per_report] [repetitions]
+# The total spent with every vendor across the reports of several objects, from the store and by parsing the
+# reports again
+g_default_number_of_reports = 20
+g_default_transactions_per_report = 5_000
+g_default_repetitions = 5
+g_number_of_positions = 40
+
+
+def vendor_totals(reports: list) -> dict:
+    # The same aggregation as TransactionStore.aggregate("vendor"), from parsed reports
+    totals = {}
+
+    for report in reports:
+        transactions = report.transactions
+
+        for vendor_id, amount_cents, excluded in zip(
+                transactions.column("vendor_id"),
+                transactions.column("amount_cents"),
+                transactions.column("excluded_from_total")
+        ):
+            if not excluded:
+                totals[vendor_id] = totals.get(vendor_id, 0) + amount_cents
+
+    return totals
+
+
+def main(number_of_reports: int, transactions_per_report: int, repetitions: int) -> None:
+    logger.setLevel(logging.ERROR)
+
+    # Positions of real reports are registered, so every synthetic one is too, instead of warning about each of them
+    for code, name in synthetic_budget_positions(g_number_of_positions):
+        g_budget_positions.setdefault(code, BudgetPosition(code, name, "2"))
+
+    processor = CumulativeExpenseReportProcessor(incremental=False)
+    sources = [
+        SyntheticPageSource(synthetic_report_pages(transactions_per_report, g_number_of_positions, seed=seed))
+        for seed in range(number_of_reports)
+    ]
+
+    def parse_reports() -> list:
+        reports = []
+
+        for number, source in enumerate(sources):
+            processor.pdf_text_extractor = source
+            report = processor.process_report("report.pdf", None)
+            # Every synthetic report has the same object id, so each one stands for a different object here
+            report.object_id = f"{report.object_id}{number:04d}"
+            reports.append(report)
+
+        return reports
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = TransactionStore(os.path.join(directory, "transactions.sqlite3"))
+        reports = parse_reports()
+
+        start = time.perf_counter()
+
+        for report in reports:
+            store.insert_report(report)
+
+        insert_seconds = time.perf_counter() - start
+        expected = vendor_totals(reports)
+        stored = {group["key"]: group["amount_cents"] for group in store.aggregate("vendor")}
+
+        if stored != expected:
+            raise AssertionError("The store and the parsed reports disagree")
+
+        times = {"reparse": [], "store": []}
+
+        # In turns, so a change in the load of the machine affects both alike, keeping the best time of each
+        for _ in range(repetitions):
+            start = time.perf_counter()
+            vendor_totals(parse_reports())
+            times["reparse"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            store.aggregate("vendor")
+            times["store"].append(time.perf_counter() - start)
+
+        number_of_transactions = sum(len(report.transactions) for report in reports)
+        reparse_seconds = min(times["reparse"])
+        store_seconds = min(times["store"])
+
+        print(f"{number_of_reports} reports, {number_of_transactions} transactions")
+        print(f"insert:              {insert_seconds:.3f} s ({number_of_transactions / insert_seconds:,.0f} transactions/s)")
+        print(f"totals by reparsing: {reparse_seconds * 1000:.1f} ms")
+        print(f"totals from store:   {store_seconds * 1000:.1f} ms ({reparse_seconds / store_seconds:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else g_default_number_of_reports,
+        int(sys.argv[2]) if len(sys.argv) > 2 else g_default_transactions_per_report,
+        int(sys.argv[3]) if len(sys.argv) > 3 else g_default_repetitions
+    )
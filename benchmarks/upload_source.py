@@ -0,0 +1,71 @@
+import io
+import logging
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_report import synthetic_report_pdf
+from config.config import logger
+from src.services.ArtifactStore import ArtifactStore
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+
+# Usage: python -m benchmarks.upload_source [repetitions] [number_of_transactions ...]
+g_default_repetitions = 10
+g_default_sizes = [100, 1_000, 10_000]
+
+
+def receive_on_disk(store: ArtifactStore, pdf: bytes):
+    # As every upload was handled before: saved to a source file, which the parser then opens
+    source, _ = store.save_upload(io.BytesIO(pdf))
+
+    return source
+
+
+def receive_in_memory(store: ArtifactStore, pdf: bytes):
+    source, _ = store.receive_upload(io.BytesIO(pdf), max_memory_bytes=len(pdf))
+
+    return source
+
+
+def main(repetitions: int, sizes: list) -> None:
+    logger.setLevel(logging.ERROR)
+    processor = CumulativeExpenseReportProcessor()
+    modes = {"disk": receive_on_disk, "memory": receive_in_memory}
+
+    print(f"{'transactions':>12} {'size (KiB)':>10} {'mode':>7} {'receive (ms)':>13} {'request (ms)':>13}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ArtifactStore(root=directory)
+
+        for number_of_transactions in sizes:
+            pdf = synthetic_report_pdf(number_of_transactions)
+            # Best time of each mode to receive the upload, and to receive and parse it. The modes are run in turns,
+            # so a change in the load of the machine affects both alike.
+            receive_times = {mode: [] for mode in modes}
+            request_times = {mode: [] for mode in modes}
+
+            for _ in range(repetitions):
+                for mode, receive in modes.items():
+                    start = time.perf_counter()
+                    source = receive(store, pdf)
+                    received = time.perf_counter()
+                    processor.process_report("report.pdf", source)
+                    finished = time.perf_counter()
+
+                    store.delete_source(source)
+                    receive_times[mode].append(received - start)
+                    request_times[mode].append(finished - start)
+
+            for mode in modes:
+                print(f"{number_of_transactions:>12} {len(pdf) / 1024:>10.0f} {mode:>7} "
+                      f"{min(receive_times[mode]) * 1000:>13.2f} {min(request_times[mode]) * 1000:>13.2f}")
+
+            saved = min(request_times["disk"]) - min(request_times["memory"])
+            print(f"{'':>12} {'':>10} {'saved':>7} {'':>13} {saved * 1000:>13.2f}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else g_default_repetitions,
+        [int(argument) for argument in sys.argv[2:]] or g_default_sizes
+    )
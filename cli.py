@@ -0,0 +1,6 @@
+import sys
+
+from src.cli import Cli
+
+if __name__ == "__main__":
+    sys.exit(Cli.run())
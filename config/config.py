@@ -1,12 +1,25 @@
 import locale
 import logging
+import os
 
 from config.configlocal import local_g_tmp_path, local_g_http_port
 from src.log.CustomFormatter import CustomFormatter
 from src.valueobjects.BudgetPosition import BudgetPosition
 from src.valueobjects.TransactionDocumentType import TransactionDocumentType
 
-locale.setlocale(locale.LC_ALL, "es_ES.UTF-8")
+# Locale of the amounts and dates of the messages, set on first use by setup_locale instead of on import, so the
+# processes that never format any do not pay for it
+g_locale = "es_ES.UTF-8"
+g_locale_set = False
+
+
+def setup_locale() -> None:
+    global g_locale_set
+
+    if not g_locale_set:
+        locale.setlocale(locale.LC_ALL, g_locale)
+        g_locale_set = True
+
 
 # Logging
 logger = logging.getLogger("Wizard")
@@ -18,13 +31,91 @@ ch.setFormatter(CustomFormatter())
 
 logger.addHandler(ch)
 
+# Maximum number of log records captured for a single report, the rest are counted but not kept
+g_log_capture_max_records = 10_000
+# Production mode: the success message of every budget position is not logged, only errors, warnings and the
+# messages of the whole report
+g_quiet_processing = False
+
 g_http_port = local_g_http_port
+# Production mode (gunicorn.conf.py): number of web worker processes forked from the one that loaded the app, each
+# of them with its own pool of g_job_workers processes
+g_http_workers = 2
+# Threads of each web worker, so slow uploads do not hold up the polling of the job statuses
+g_http_threads = 4
 
 g_allowed_extensions = ['pdf']
+g_allowed_archive_extensions = ['zip']
 
 # Files
 g_tmp_path = local_g_tmp_path
 
+# Excel files are written row by row to disk instead of being kept in memory until they are closed
+g_excel_constant_memory = True
+
+# PDF text extraction
+# Number of worker processes that extract the text of the pages in parallel (1 extracts them sequentially)
+g_pdf_extraction_processes = 1
+# Number of consecutive pages extracted by each worker task
+g_pdf_extraction_chunk_size = 16
+# PDF files are memory mapped, so the reader only reads the parts of them it needs instead of copying them whole
+g_pdf_mmap = True
+
+# Temporary files
+# Generated files not downloaded for this long are deleted
+g_artifact_ttl_seconds = 24 * 60 * 60
+# Maximum size of all the generated files, beyond which the least recently used are deleted
+g_artifact_max_bytes = 1024 * 1024 * 1024
+# Seconds between the checks of the background cleanup
+g_artifact_cleanup_interval_seconds = 5 * 60
+# Uploads are written to disk in chunks of this size
+g_upload_chunk_size = 1024 * 1024
+# Uploads up to this size are parsed from memory, without writing them to disk
+g_in_memory_upload_max_bytes = 4 * 1024 * 1024
+
+# Incremental processing
+# The parsed state of the last report of each object is kept, so a new report of the same object only parses the
+# pages that changed since then
+g_incremental_processing = True
+g_report_state_path = os.path.join(g_tmp_path, "report-states")
+
+# Transaction store
+# The transactions of every processed report are kept in a SQLite database for queries across reports
+g_transaction_store_enabled = True
+g_transaction_store_path = os.path.join(g_tmp_path, "store", "transactions.sqlite3")
+
+# Result cache of already processed uploads, evicted in least recently used order
+g_result_cache_max_entries = 256
+
+# Report processing jobs
+# Number of worker processes that process the uploaded reports concurrently
+g_job_workers = 2
+# Maximum number of queued or running jobs before new uploads are rejected
+g_job_max_pending = 16
+# Number of finished jobs whose status and logs are kept
+g_job_history_size = 256
+# Limits of each report processed by a job, None disables a limit (see ReportLimits)
+g_report_max_pages = 5_000
+g_report_max_cpu_seconds = 300
+g_report_max_wall_seconds = 600
+g_report_max_memory_bytes = 1024 ** 3
+# Seconds past g_report_max_wall_seconds after which a job that could not be stopped, e.g. inside a long native
+# call, is killed together with the rest of the jobs of its pool
+g_job_kill_grace_seconds = 30
+# Job statuses are also written here, so any web worker can answer for the jobs of the others
+g_job_status_path = os.path.join(g_tmp_path, "jobs")
+# Job status files not written for this long are deleted, whichever worker wrote them
+g_job_status_ttl_seconds = 24 * 60 * 60
+
+# Batch uploads
+# Number of worker processes that parse the reports of a batch concurrently
+g_batch_processes = 2
+# Maximum number of reports in a single batch upload
+g_batch_max_files = 100
+# Maximum size of each report of a batch and of all of them, once extracted from their ZIP archives
+g_batch_max_report_bytes = 100 * 1024 * 1024
+g_batch_max_total_bytes = 1024 * 1024 * 1024
+
 # E.g.: "Orden: E0390122A400 DELEGACION ALUMNOS"
 g_report_object_regex = r"Orden: (?P<object_id>\w+) (?P<object_name>.+)"
 
@@ -55,6 +146,10 @@ g_amount_regex = r"\d{1,3}(?:\.\d{3})*,\d{2}"
 # E.g.: "Importe total de la orden E0390122A400:            11.384.852,92"
 g_total_report_amount_regex = r"Importe total de la orden (?P<request_id>\w+):\s+(?P<total_amount>" + g_amount_regex + ")"
 
+# Column titles of the transactions, also the signature of this layout of the report, see g_report_layouts
+# E.g.: "Tipo doc. Nº.Documento / Pos +/- Fecha doc. Pos.Pre. Descripción Importe"
+g_transactions_header_regex = r"Tipo\ doc\.\ Nº\.Documento\ /\ Pos\ \+/\-\ Fecha\ doc\.\ Pos\.Pre\.\ Descripción\ Importe"
+
 g_ignored_strings = [
     "UNIVERSIDAD COMPLUTENSE DE MADRID",
     "INFORME DE GASTOS ACUMULADO",
@@ -62,7 +157,7 @@ g_ignored_strings = [
     g_number_of_pages_regex,
     g_date_regex,
     g_total_report_amount_regex,
-    "Tipo\ doc\.\ Nº\.Documento\ /\ Pos\ \+/\-\ Fecha\ doc\.\ Pos\.Pre\.\ Descripción\ Importe",
+    g_transactions_header_regex,
     "Referencia\ NIF\ acreedor\ Nombre",
     r"_{5,}\s*_{5,}",  # E.g.: "_______________________ _______________________"
     "\(\*\):\ No\ interviene\ en\ el\ calculo\ del\ importe\ total"
@@ -133,3 +228,22 @@ d_transaction_document_types = {
     "RJ": TransactionDocumentType("RJ"),
     "KJ": TransactionDocumentType("KJ"),
 }
+
+# Layouts of the report by name, with the patterns of their lines. Each report is parsed with the first layout whose
+# signature is found on its first page, or with the first one if none is. A new version of the report from the
+# accounting system gets its own layout here, so the reports of the previous one can still be parsed.
+g_report_layouts = {
+    "2023": {
+        "signature": g_transactions_header_regex,
+        "report_object": g_report_object_regex,
+        "number_of_pages": g_number_of_pages_regex,
+        "date": g_date_regex,
+        "total_report_amount": g_total_report_amount_regex,
+        "budget_position_header": g_budget_position_header_regex,
+        "budget_position_total_amount": g_budget_position_total_amount_regex,
+        "transaction_first_line": g_transaction_first_line_regex,
+        "transaction_second_line": g_transaction_second_line_regex,
+        "ignored_strings": g_ignored_strings,
+        "document_types": list(d_transaction_document_types),
+    },
+}
@@ -0,0 +1,15 @@
+from config.config import g_http_port, g_http_workers, g_http_threads
+
+# Production mode: gunicorn -c gunicorn.conf.py
+wsgi_app = "wsgi:application"
+bind = f"0.0.0.0:{g_http_port}"
+
+# The app and its services are loaded once, before forking the web workers, which share them until they write to them
+preload_app = True
+workers = g_http_workers
+worker_class = "gthread"
+threads = g_http_threads
+
+# Uploads are processed by the job processes, so requests only take as long as reading the upload
+timeout = 120
+graceful_timeout = 30
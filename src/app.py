@@ -3,6 +3,13 @@ from flask import Flask
 from config.config import g_http_port, logger
 from src.services.CumulativeExpenseReportExcelGenerator import CumulativeExpenseReportExcelGenerator
 from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.ArtifactStore import ArtifactStore
+from src.services.MetricsRegistry import MetricsRegistry
+from src.services.ReportExporterRegistry import ReportExporterRegistry
+from src.services.ReportJobQueue import ReportJobQueue, preload_worker_services
+from src.services.ReportResultCache import ReportResultCache
+from src.services.ReportStateStore import ReportStateStore
+from src.services.TransactionStore import TransactionStore
 
 g_welcome_ascii_art = '''
     ____  ___    __________
@@ -25,6 +32,13 @@ class App:
         self.flask = None
         self.cumulative_expense_report_processor = None
         self.cumulative_expense_report_excel_generator = None
+        self.artifact_store = None
+        self.report_result_cache = None
+        self.report_state_store = None
+        self.transaction_store = None
+        self.report_job_queue = None
+        self.report_exporter_registry = None
+        self.metrics_registry = None
 
     @staticmethod
     def print_welcome() -> None:
@@ -35,6 +49,17 @@ class App:
         if App.instance is not None:
             raise RuntimeError('App has already been initialized.')
 
+        App.create_app()
+
+    @staticmethod
+    def create_app() -> Flask:
+        # App factory for WSGI servers. Creating the app again in the same process returns the same one, so it can be
+        # loaded once before forking the web workers, which then start with the services already loaded. Everything
+        # that cannot survive a fork, i.e. the worker process pools, threads and database connections, is created on
+        # first use in each worker.
+        if App.instance is not None:
+            return App.instance.flask
+
         App.instance = App()
 
         App.instance.flask = Flask(
@@ -43,11 +68,26 @@ class App:
             template_folder="../resources/templates"
         )
 
-        # noinspection PyUnresolvedReferences
-        import src.routes
+        from src.routes import routes
+        App.instance.flask.register_blueprint(routes)
 
         App.instance.cumulative_expense_report_processor = CumulativeExpenseReportProcessor()
         App.instance.cumulative_expense_report_excel_generator = CumulativeExpenseReportExcelGenerator()
+        App.instance.artifact_store = ArtifactStore()
+        App.instance.report_result_cache = ReportResultCache(App.instance.artifact_store)
+        App.instance.report_state_store = ReportStateStore()
+        App.instance.transaction_store = TransactionStore()
+        App.instance.metrics_registry = MetricsRegistry()
+        App.instance.report_job_queue = ReportJobQueue(metrics_registry=App.instance.metrics_registry)
+        App.instance.report_exporter_registry = ReportExporterRegistry()
+
+        # The job processes are forked from this one, so they inherit these instead of creating their own
+        preload_worker_services(
+            App.instance.cumulative_expense_report_processor,
+            App.instance.cumulative_expense_report_excel_generator
+        )
+
+        return App.instance.flask
 
     @staticmethod
     def run() -> None:
@@ -0,0 +1,225 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from config.config import g_allowed_extensions, g_batch_processes, g_transaction_store_enabled, logger
+from src.services.CumulativeExpenseReportExcelGenerator import CumulativeExpenseReportExcelGenerator
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.ReportMetrics import ReportMetrics
+from src.services.TransactionStore import TransactionStore
+
+# Services of each worker process, created on its first report and reused by the following ones
+g_cli_worker_processor = None
+g_cli_worker_excel_generator = None
+g_cli_worker_transaction_store = None
+
+
+def convert_report(real_path: str, output_path: str) -> dict:
+    # Runs inside the worker processes, so it has to be a picklable module level function
+    global g_cli_worker_processor, g_cli_worker_excel_generator, g_cli_worker_transaction_store
+
+    if g_cli_worker_processor is None:
+        g_cli_worker_processor = CumulativeExpenseReportProcessor()
+        g_cli_worker_excel_generator = CumulativeExpenseReportExcelGenerator()
+
+        if g_transaction_store_enabled:
+            g_cli_worker_transaction_store = TransactionStore()
+
+    summary = {"source": real_path, "output": None, "error": None}
+    metrics = ReportMetrics()
+    start = time.perf_counter()
+
+    try:
+        report = g_cli_worker_processor.process_report(
+            file_name=os.path.basename(real_path),
+            source=real_path,
+            metrics=metrics
+        )
+
+        with metrics.stage(ReportMetrics.GENERATE):
+            g_cli_worker_excel_generator.generate_file(report, output_path)
+
+        if g_cli_worker_transaction_store is not None:
+            with metrics.stage(ReportMetrics.EXPORT):
+                g_cli_worker_transaction_store.insert_report(report)
+    except Exception as error:
+        logger.error(f"Error al procesar el informe \"{real_path}\": {error}")
+        summary["error"] = str(error)
+    else:
+        summary.update({
+            "output": output_path,
+            "object_id": report.object_id,
+            "object_name": report.object_name,
+            "date": report.date.isoformat(),
+            "number_of_pages": report.number_of_pages,
+            "number_of_transactions": len(report.transactions),
+            "total_amount_cents": report.total_amount_cents,
+        })
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    metrics.finish()
+    summary["metrics"] = metrics.to_dict()
+
+    return summary
+
+
+class Cli:
+
+    @staticmethod
+    def parse_arguments(arguments: list) -> argparse.Namespace:
+        parser = argparse.ArgumentParser(
+            prog="cli.py",
+            description="Convierte informes de gastos acumulados en PDF a ficheros Excel XLSX sin servidor web."
+        )
+        parser.add_argument("inputs", nargs="+",
+                            help="Ficheros PDF, directorios o patrones glob (p. ej. \"informes/**/*.pdf\")")
+        parser.add_argument("-o", "--output-dir", default=None,
+                            help="Directorio de salida de los XLSX (por defecto, junto a cada PDF)")
+        parser.add_argument("-j", "--processes", type=int, default=g_batch_processes,
+                            help="Número de procesos que convierten informes en paralelo")
+        parser.add_argument("-s", "--summary", default="-",
+                            help="Fichero JSON con el resumen de la conversión (\"-\" para la salida estándar)")
+        parser.add_argument("-w", "--watch", action="store_true",
+                            help="Sigue vigilando los directorios y convierte los nuevos PDF según llegan")
+        parser.add_argument("--interval", type=float, default=2.0,
+                            help="Segundos entre comprobaciones del modo vigilancia")
+        parser.add_argument("-q", "--quiet", action="store_true",
+                            help="Muestra solo avisos y errores")
+
+        return parser.parse_args(arguments)
+
+    @staticmethod
+    def is_pdf(path: str) -> bool:
+        return os.path.isfile(path) and path.rsplit('.', 1)[-1].lower() in g_allowed_extensions
+
+    @staticmethod
+    def find_sources(inputs: list) -> list:
+        sources = []
+
+        for pattern in inputs:
+            if os.path.isdir(pattern):
+                try:
+                    paths = [os.path.join(pattern, name) for name in sorted(os.listdir(pattern))]
+                except FileNotFoundError:
+                    # Deleted since it was checked
+                    paths = []
+            else:
+                paths = sorted(glob.glob(pattern, recursive=True))
+
+            sources.extend(os.path.realpath(path) for path in paths if Cli.is_pdf(path))
+
+        # Without duplicates, keeping the order in which they were given
+        return list(dict.fromkeys(sources))
+
+    @staticmethod
+    def output_path(source: str, output_dir: str, used_output_paths: set) -> str:
+        # Reports with the same name, e.g. from different directories into the same output directory, get a number
+        # like the sheets of a batch, e.g. "informe (2).xlsx", instead of overwriting each other
+        name = os.path.splitext(os.path.basename(source))[0]
+        directory = output_dir or os.path.dirname(source)
+        path = os.path.join(directory, name + ".xlsx")
+        number = 1
+
+        while os.path.normcase(path) in used_output_paths:
+            number += 1
+            path = os.path.join(directory, f"{name} ({number}).xlsx")
+
+        used_output_paths.add(os.path.normcase(path))
+
+        return path
+
+    @staticmethod
+    def convert(executor: ProcessPoolExecutor, sources: list, output_dir: str, used_output_paths: set) -> list:
+        return list(executor.map(
+            convert_report,
+            sources,
+            [Cli.output_path(source, output_dir, used_output_paths) for source in sources]
+        ))
+
+    @staticmethod
+    def write_summary(summaries: list, destination: str) -> None:
+        output = json.dumps(summaries, ensure_ascii=False, indent=2)
+
+        if destination == "-":
+            print(output)
+        else:
+            with open(destination, "w", encoding="utf-8") as file:
+                file.write(output)
+
+    @staticmethod
+    def watch(executor: ProcessPoolExecutor, arguments: argparse.Namespace, summaries: list,
+              used_output_paths: set) -> None:
+        # A file is converted once its size and modification time stop changing between two checks
+        last_seen = {}
+        converted = {summary["source"] for summary in summaries}
+
+        logger.info("Vigilando nuevos informes, pulsa Ctrl+C para salir")
+
+        try:
+            while True:
+                time.sleep(arguments.interval)
+
+                ready = []
+
+                for source in Cli.find_sources(arguments.inputs):
+                    if source in converted:
+                        continue
+
+                    try:
+                        stat = os.stat(source)
+                    except FileNotFoundError:
+                        # Deleted since it was found
+                        last_seen.pop(source, None)
+                        continue
+
+                    signature = (stat.st_size, stat.st_mtime)
+
+                    if last_seen.get(source) == signature:
+                        ready.append(source)
+                    else:
+                        last_seen[source] = signature
+
+                if len(ready) > 0:
+                    converted.update(ready)
+                    new_summaries = Cli.convert(executor, ready, arguments.output_dir, used_output_paths)
+                    summaries.extend(new_summaries)
+
+                    # The standard output gets each new conversion, a summary file is rewritten with all of them
+                    Cli.write_summary(new_summaries if arguments.summary == "-" else summaries, arguments.summary)
+        except KeyboardInterrupt:
+            pass
+
+    @staticmethod
+    def run(arguments: list = None) -> int:
+        arguments = Cli.parse_arguments(sys.argv[1:] if arguments is None else arguments)
+
+        if arguments.quiet:
+            logger.setLevel(logging.WARNING)
+
+        if arguments.output_dir is not None:
+            os.makedirs(arguments.output_dir, exist_ok=True)
+
+        sources = Cli.find_sources(arguments.inputs)
+
+        if len(sources) == 0 and not arguments.watch:
+            logger.error("No se encontró ningún informe PDF")
+            return 1
+
+        # Output paths given to the reports of this run, so no two of them write the same file
+        used_output_paths = set()
+
+        with ProcessPoolExecutor(max_workers=arguments.processes) as executor:
+            summaries = Cli.convert(executor, sources, arguments.output_dir, used_output_paths)
+
+            if len(sources) > 0:
+                Cli.write_summary(summaries, arguments.summary)
+
+            if arguments.watch:
+                Cli.watch(executor, arguments, summaries, used_output_paths)
+
+        return 1 if any(summary["error"] is not None for summary in summaries) else 0
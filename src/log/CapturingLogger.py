@@ -1,30 +1,102 @@
-import io
+import contextvars
+import functools
 import logging
+import threading
 
 from colorama import Fore
 
-from config.config import logger
+from config.config import g_log_capture_max_records, logger
 
 
 class CapturingLogger:
 
+    # Capture of the code running in the current context, None outside of any capture. Every thread, and every task
+    # of an event loop, has its own context, so concurrent captures never see each other's records.
+    current_capture = contextvars.ContextVar("current_log_capture", default=None)
+
+    # A single handler is added to the logger, the first time something is captured, and kept for the whole process
+    handler = None
+    handler_lock = threading.Lock()
+
+    @staticmethod
+    def install_handler() -> None:
+        if CapturingLogger.handler is not None:
+            return
+
+        with CapturingLogger.handler_lock:
+            if CapturingLogger.handler is None:
+                CapturingLogger.handler = CapturingLogger.CaptureHandler(logging.DEBUG)
+                logger.addHandler(CapturingLogger.handler)
+
+    @staticmethod
+    def capture_logs(func, max_records: int = g_log_capture_max_records):
+        # Runs func and returns its result together with the Capture of what it logged
+        CapturingLogger.install_handler()
+
+        capture = CapturingLogger.Capture(max_records)
+        token = CapturingLogger.current_capture.set(capture)
+
+        try:
+            result = func()
+        finally:
+            CapturingLogger.current_capture.reset(token)
+
+        return result, capture
+
     @staticmethod
     def capture_html_logs(func):
-        buffer = io.StringIO()
-        handler = logging.StreamHandler(buffer)
-        handler.setLevel(logging.DEBUG)
+        result, capture = CapturingLogger.capture_logs(func)
+
+        return result, capture.to_html()
+
+    class Capture:
 
-        formatter = CapturingLogger.AsciiToHtmlFormatter()
-        handler.setFormatter(formatter)
+        __slots__ = ("records", "max_records", "dropped")
 
-        logger.addHandler(handler)
+        def __init__(self, max_records: int):
+            # (level number, message, arguments, creation time) of every captured record. Messages are only formatted
+            # with their arguments, and rendered, when asked for.
+            self.records = []
+            self.max_records = max_records
+            self.dropped = 0
 
-        result = func()
+        def add(self, record: logging.LogRecord) -> None:
+            if len(self.records) >= self.max_records:
+                self.dropped += 1
+                return
 
-        log_contents = buffer.getvalue()
-        buffer.close()
+            self.records.append((record.levelno, record.msg, record.args, record.created))
 
-        return result, log_contents
+        def to_html(self) -> str:
+            formatter = CapturingLogger.AsciiToHtmlFormatter()
+            lines = [
+                formatter.format_message(levelno, message, args) + "\n"
+                for levelno, message, args, _ in self.records
+            ]
+
+            if self.dropped > 0:
+                lines.append(formatter.format_message(
+                    logging.WARNING,
+                    f"! Se han omitido {self.dropped} mensajes más del registro"
+                ) + "\n")
+
+            return "".join(lines)
+
+    class CaptureHandler(logging.Handler):
+
+        def handle(self, record: logging.LogRecord) -> bool:
+            # Each capture is only written by its own context, so the handler lock of Handler.handle is not needed
+            capture = CapturingLogger.current_capture.get()
+
+            if capture is None or record.levelno < self.level:
+                return False
+
+            capture.add(record)
+
+            return True
+
+        def emit(self, record: logging.LogRecord) -> None:
+            self.handle(record)
 
     class AsciiToHtmlFormatter(logging.Formatter):
         CLASSES = {
@@ -43,9 +115,22 @@ class CapturingLogger:
         }
 
         def format(self, record):
-            output = record.msg
+            return self.format_message(record.levelno, record.msg, record.args)
+
+        def format_message(self, levelno: int, message, args=()) -> str:
+            # The replacements are applied to the message before its arguments are inserted, so messages logged
+            # many times with different arguments are only converted once
+            output = CapturingLogger.AsciiToHtmlFormatter.html_message(str(message))
+
+            if args:
+                output = output % args
+
+            return f"<p class=\"{self.CLASSES.get(levelno)}\">{output}</p>"
 
-            for key, value in self.REPLACEMENTS.items():
-                output = output.replace(key, value)
+        @staticmethod
+        @functools.lru_cache(maxsize=1024)
+        def html_message(message: str) -> str:
+            for key, value in CapturingLogger.AsciiToHtmlFormatter.REPLACEMENTS.items():
+                message = message.replace(key, value)
 
-            return f"<p class=\"{self.CLASSES.get(record.levelno)}\">{output}</p>"
+            return message
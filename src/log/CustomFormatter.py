@@ -17,7 +17,11 @@ class CustomFormatter(logging.Formatter):
         logging.CRITICAL: pre + Fore.LIGHTRED_EX + message + reset
     }
 
+    def __init__(self):
+        super().__init__()
+        # One formatter per level, built once instead of for every record
+        self.formatters = {level: logging.Formatter(log_fmt) for level, log_fmt in self.FORMATS.items()}
+        self.default_formatter = logging.Formatter()
+
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
-        return formatter.format(record)
+        return self.formatters.get(record.levelno, self.default_formatter).format(record)
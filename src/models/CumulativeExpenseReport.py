@@ -1,6 +1,8 @@
 import datetime
+from array import array
 
 from src.models.CumulativeExpenseReportTransaction import CumulativeExpenseReportTransaction
+from src.models.CumulativeExpenseReportTransactionTable import CumulativeExpenseReportTransactionTable
 from src.valueobjects.BudgetPosition import BudgetPosition
 
 
@@ -12,9 +14,12 @@ class CumulativeExpenseReport:
         self._object_name = None
         self._number_of_pages = None
         self._date = None
-        self._total_amount = None
+        self._total_amount_cents = None
         self._budget_positions = []
-        self._transactions = []
+        self._transactions = CumulativeExpenseReportTransactionTable()
+        self._budget_positions_by_code = {}
+        self._transactions_by_budget_position = {}
+        self._budget_position_transactions_totals = {}
 
     # Getters
 
@@ -39,15 +44,15 @@ class CumulativeExpenseReport:
         return self._date
 
     @property
-    def total_amount(self) -> float:
-        return self._total_amount
+    def total_amount_cents(self) -> int:
+        return self._total_amount_cents
 
     @property
     def budget_positions(self) -> list:
         return self._budget_positions
 
     @property
-    def transactions(self) -> list:
+    def transactions(self) -> CumulativeExpenseReportTransactionTable:
         return self._transactions
 
     # Setters
@@ -68,12 +73,57 @@ class CumulativeExpenseReport:
     def date(self, date: datetime.date):
         self._date = date
 
-    @total_amount.setter
-    def total_amount(self, total_amount: float):
-        self._total_amount = total_amount
+    @total_amount_cents.setter
+    def total_amount_cents(self, total_amount_cents: int):
+        self._total_amount_cents = total_amount_cents
 
     def add_budget_position(self, budget_position: BudgetPosition):
         self._budget_positions.append(budget_position)
+        self._budget_positions_by_code[budget_position.code] = budget_position
 
     def add_transaction(self, transaction: CumulativeExpenseReportTransaction):
-        self._transactions.append(transaction)
+        row = self._transactions.append(transaction)
+
+        code = transaction.budget_position_code
+        rows = self._transactions_by_budget_position.get(code)
+
+        if rows is None:
+            rows = self._transactions_by_budget_position[code] = array('I')
+
+        rows.append(row)
+
+        if not transaction.excluded_from_total:
+            self._budget_position_transactions_totals[code] = \
+                self._budget_position_transactions_totals.get(code, 0) + transaction.amount_cents
+
+    def set_transactions(self, transactions: CumulativeExpenseReportTransactionTable):
+        # Replaces every transaction of the report at once, e.g. with those of a report parsed before
+        self._transactions = transactions
+        self._transactions_by_budget_position = {}
+        self._budget_position_transactions_totals = {}
+
+        codes = transactions.column("budget_position_code")
+        amounts_cents = transactions.column("amount_cents")
+        excluded_from_total = transactions.column("excluded_from_total")
+
+        for row, code in enumerate(codes):
+            rows = self._transactions_by_budget_position.get(code)
+
+            if rows is None:
+                rows = self._transactions_by_budget_position[code] = array('I')
+
+            rows.append(row)
+
+            if not excluded_from_total[row]:
+                self._budget_position_transactions_totals[code] = \
+                    self._budget_position_transactions_totals.get(code, 0) + amounts_cents[row]
+
+    def has_budget_position(self, code: str) -> bool:
+        return code in self._budget_positions_by_code
+
+    def budget_position_transactions(self, code: str):
+        return self._transactions.rows(self._transactions_by_budget_position.get(code, ()))
+
+    def budget_position_transactions_total_cents(self, code: str) -> int:
+        # Sum of the amounts of the transactions of the position that count towards the report total
+        return self._budget_position_transactions_totals.get(code, 0)
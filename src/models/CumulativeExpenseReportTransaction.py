@@ -3,6 +3,20 @@ from datetime import datetime
 
 class CumulativeExpenseReportTransaction:
 
+    __slots__ = (
+        "document_type_code",
+        "document_number",
+        "document_position",
+        "document_date",
+        "reference",
+        "budget_position_code",
+        "vendor_id",
+        "vendor_name",
+        "description",
+        "amount_cents",
+        "excluded_from_total",
+    )
+
     def __init__(self,
                  document_type_code: str = None,
                  document_number: str = None,
@@ -13,7 +27,7 @@ class CumulativeExpenseReportTransaction:
                  vendor_id: str = None,
                  vendor_name: str = None,
                  description: str = None,
-                 amount: float = None,
+                 amount_cents: int = None,
                  excluded_from_total: bool = False,
                  ):
         self.document_type_code = document_type_code
@@ -25,7 +39,7 @@ class CumulativeExpenseReportTransaction:
         self.vendor_id = vendor_id
         self.vendor_name = vendor_name
         self.description = description
-        self.amount = amount
+        self.amount_cents = amount_cents
         self.excluded_from_total = excluded_from_total
 
     @staticmethod
@@ -36,7 +50,7 @@ class CumulativeExpenseReportTransaction:
             document_date: datetime.date = None,
             budget_position_code: str = None,
             description: str = None,
-            amount: float = None,
+            amount_cents: int = None,
             excluded_from_total: bool = False,
     ) -> 'CumulativeExpenseReportTransaction':
         return CumulativeExpenseReportTransaction(
@@ -46,10 +60,14 @@ class CumulativeExpenseReportTransaction:
             document_date=document_date,
             budget_position_code=budget_position_code,
             description=description,
-            amount=amount,
+            amount_cents=amount_cents,
             excluded_from_total=excluded_from_total,
         )
 
+    @property
+    def amount(self) -> float:
+        return self.amount_cents / 100
+
     def complete_with_report_second_line(
             self,
             reference: str = None,
@@ -0,0 +1,203 @@
+from array import array
+
+from src.models.CumulativeExpenseReportTransaction import CumulativeExpenseReportTransaction
+
+
+class CumulativeExpenseReportTransactionRow(CumulativeExpenseReportTransaction):
+    # Transaction read from a row of a table. It is built from the columns on every access, so changing it would not
+    # change the table, and trying to fails instead.
+
+    __slots__ = ()
+
+    # Setters of the slots of the fields, which __setattr__ no longer reaches
+    _SLOT_SETTERS = tuple(getattr(CumulativeExpenseReportTransaction, name).__set__
+                          for name in CumulativeExpenseReportTransaction.__slots__)
+
+    def __init__(self, *values):
+        # Values of the fields in the order of CumulativeExpenseReportTransaction.__slots__
+        for setter, value in zip(self._SLOT_SETTERS, values):
+            setter(self, value)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"transactions read from a table are read-only, cannot set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"transactions read from a table are read-only, cannot delete {name}")
+
+
+class CumulativeExpenseReportTransactionTable:
+
+    # Attribute holding each field, as symbol ids or directly as values
+    SYMBOL_COLUMNS = {
+        "document_type_code": "_document_type_codes",
+        "document_position": "_document_positions",
+        "document_date": "_document_dates",
+        "budget_position_code": "_budget_position_codes",
+        "vendor_id": "_vendor_ids",
+        "vendor_name": "_vendor_names",
+        "description": "_descriptions",
+    }
+    VALUE_COLUMNS = {
+        "document_number": "_document_numbers",
+        "reference": "_references",
+        "amount_cents": "_amounts_cents",
+    }
+
+    def __init__(self):
+        # Repeated strings (codes, dates, vendors...) are stored once and referenced by their index
+        self._symbols = [None]
+        self._symbol_ids = {None: 0}
+
+        self._document_type_codes = array('I')
+        self._document_numbers = []
+        self._document_positions = array('I')
+        self._document_dates = array('I')
+        self._references = []
+        self._budget_position_codes = array('I')
+        self._vendor_ids = array('I')
+        self._vendor_names = array('I')
+        self._descriptions = array('I')
+        self._amounts_cents = array('q')
+        self._excluded_from_total = bytearray()
+        self._length = 0
+
+    def _symbol_id(self, value: str) -> int:
+        symbol_id = self._symbol_ids.get(value)
+
+        if symbol_id is None:
+            symbol_id = len(self._symbols)
+            self._symbols.append(value)
+            self._symbol_ids[value] = symbol_id
+
+        return symbol_id
+
+    def append(self, transaction: CumulativeExpenseReportTransaction) -> int:
+        row = self._length
+        symbol_id = self._symbol_id
+
+        self._document_type_codes.append(symbol_id(transaction.document_type_code))
+        self._document_numbers.append(transaction.document_number)
+        self._document_positions.append(symbol_id(transaction.document_position))
+        self._document_dates.append(symbol_id(transaction.document_date))
+        self._references.append(transaction.reference)
+        self._budget_position_codes.append(symbol_id(transaction.budget_position_code))
+        self._vendor_ids.append(symbol_id(transaction.vendor_id))
+        self._vendor_names.append(symbol_id(transaction.vendor_name))
+        self._descriptions.append(symbol_id(transaction.description))
+        self._amounts_cents.append(transaction.amount_cents)
+
+        # One bit per row
+        if row % 8 == 0:
+            self._excluded_from_total.append(0)
+
+        if transaction.excluded_from_total:
+            self._excluded_from_total[row >> 3] |= 1 << (row & 7)
+
+        self._length += 1
+
+        return row
+
+    def head(self, number_of_rows: int) -> 'CumulativeExpenseReportTransactionTable':
+        # New table with the first rows of this one, copied column by column
+        table = CumulativeExpenseReportTransactionTable()
+        table._symbols = list(self._symbols)
+        table._symbol_ids = dict(self._symbol_ids)
+
+        for attribute in list(self.SYMBOL_COLUMNS.values()) + list(self.VALUE_COLUMNS.values()):
+            setattr(table, attribute, getattr(self, attribute)[:number_of_rows])
+
+        table._excluded_from_total = self._excluded_from_total[:(number_of_rows + 7) // 8]
+
+        # Bits of the rows left out in the last byte
+        if number_of_rows % 8 != 0:
+            table._excluded_from_total[-1] &= (1 << (number_of_rows % 8)) - 1
+
+        table._length = number_of_rows
+
+        return table
+
+    @staticmethod
+    def from_columns(columns: dict) -> 'CumulativeExpenseReportTransactionTable':
+        # Table with the values of every field by name without building a transaction per row. Fields stored as
+        # symbols are given as their distinct values and, for every row, the index of its value.
+        table = CumulativeExpenseReportTransactionTable()
+
+        for name in table.SYMBOL_COLUMNS:
+            dictionary, indexes = columns[name]
+            table.set_symbol_column(name, dictionary, indexes)
+
+        table._document_numbers = list(columns["document_number"])
+        table._references = list(columns["reference"])
+        table._amounts_cents = array('q', columns["amount_cents"])
+
+        table._length = len(table._amounts_cents)
+        table._excluded_from_total = bytearray((table._length + 7) // 8)
+
+        for row, excluded in enumerate(columns["excluded_from_total"]):
+            if excluded:
+                table._excluded_from_total[row >> 3] |= 1 << (row & 7)
+
+        return table
+
+    def symbol_column(self, name: str) -> tuple:
+        # All the symbols of the table and, for every row, the id of the symbol of a field stored as symbols
+        return self._symbols, getattr(self, self.SYMBOL_COLUMNS[name])
+
+    def set_symbol_column(self, name: str, dictionary: list, indexes) -> None:
+        symbol_ids = [self._symbol_id(value) for value in dictionary]
+        setattr(self, self.SYMBOL_COLUMNS[name], array('I', map(symbol_ids.__getitem__, indexes)))
+
+    def amount_cents(self, row: int) -> int:
+        return self._amounts_cents[row]
+
+    def excluded_from_total(self, row: int) -> bool:
+        return bool(self._excluded_from_total[row >> 3] & (1 << (row & 7)))
+
+    def column(self, name: str) -> list:
+        # Values of a field for every row, without building a transaction per row
+        if name in self.SYMBOL_COLUMNS:
+            symbols = self._symbols
+            return [symbols[symbol_id] for symbol_id in getattr(self, self.SYMBOL_COLUMNS[name])]
+
+        if name in self.VALUE_COLUMNS:
+            return list(getattr(self, self.VALUE_COLUMNS[name]))
+
+        if name == "excluded_from_total":
+            return [self.excluded_from_total(row) for row in range(self._length)]
+
+        raise KeyError(name)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, row: int) -> CumulativeExpenseReportTransaction:
+        if row < 0:
+            row += self._length
+
+        if not 0 <= row < self._length:
+            raise IndexError("transaction index out of range")
+
+        symbols = self._symbols
+
+        # Read-only, as changing it would not change the table
+        return CumulativeExpenseReportTransactionRow(
+            symbols[self._document_type_codes[row]],
+            self._document_numbers[row],
+            symbols[self._document_positions[row]],
+            symbols[self._document_dates[row]],
+            self._references[row],
+            symbols[self._budget_position_codes[row]],
+            symbols[self._vendor_ids[row]],
+            symbols[self._vendor_names[row]],
+            symbols[self._descriptions[row]],
+            self._amounts_cents[row],
+            self.excluded_from_total(row),
+        )
+
+    def __iter__(self):
+        for row in range(self._length):
+            yield self[row]
+
+    def rows(self, rows):
+        for row in rows:
+            yield self[row]
@@ -3,64 +3,365 @@ import logging
 import os
 import sys
 import uuid
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
 
-from flask import render_template, request, send_file
+from flask import Blueprint, Response, render_template, request, send_file
 from werkzeug.utils import secure_filename
 
-from config.config import g_allowed_extensions, g_tmp_path, logger
+from config.config import g_allowed_extensions, g_allowed_archive_extensions, g_batch_max_files, \
+    g_batch_max_report_bytes, g_batch_max_total_bytes, logger
 from src.app import App
-from src.log.CapturingLogger import CapturingLogger
+from src.services.ArtifactStore import ArtifactStore
+from src.services.CumulativeExpenseReportColumnarExporter import CumulativeExpenseReportColumnarExporter
+from src.services.CumulativeExpenseReportDeltaExporter import CumulativeExpenseReportDeltaExporter
+from src.services.CumulativeExpenseReportPreflightChecker import run_preflight_check
+from src.services.ReportJobQueue import ReportJobQueue
+from src.services.TransactionStore import TransactionStore
 
+# Registered on the Flask app by App.create_app
+routes = Blueprint("routes", __name__)
 
-@App.instance.flask.route("/")
+
+def allowed_file(filename, extensions=None):
+    return '.' in filename and \
+        filename.rsplit('.', 1)[1].lower() in (extensions or g_allowed_extensions)
+
+
+def is_pdf_file(file) -> bool:
+    return file.filename != '' and file.content_type == 'application/pdf' and allowed_file(file.filename)
+
+
+def uploaded_report():
+    # (file name, stream) of the PDF, which is either the "file" field of a form or, streamed as is, the whole body
+    # of the request. None if there is no PDF.
+    if request.mimetype == 'application/pdf':
+        return secure_filename(request.args.get("filename", "")) or "informe.pdf", request.stream
+
+    if 'file' not in request.files:
+        return None
+
+    file = request.files['file']
+
+    if not is_pdf_file(file):
+        return None
+
+    return secure_filename(file.filename), file.stream
+
+
+def save_source(stream, max_bytes: int = None) -> str:
+    real_source_path, _ = App.instance.artifact_store.save_upload(stream, max_bytes=max_bytes)
+
+    return real_source_path
+
+
+@routes.route("/")
 def home():
     return render_template("home.html")
 
 
-@App.instance.flask.route("/api/cumulative-expense-reports", methods=["POST"])
+@routes.route("/api/cumulative-expense-reports", methods=["POST"])
 def api_process_cumulative_expense_report():
-    if 'file' not in request.files:
+    upload = uploaded_report()
+
+    if upload is None:
         return "", 400
 
-    file = request.files['file']
+    original_source_filename, stream = upload
 
-    def allowed_file(filename):
-        return '.' in filename and \
-            filename.rsplit('.', 1)[1].lower() in g_allowed_extensions
+    # The job status then includes the time and resources taken by each processing stage
+    include_metrics = request.args.get("metrics", "").lower() in ("1", "true", "yes")
 
-    if file.filename == '' or file.content_type != 'application/pdf' or not allowed_file(file.filename):
-        return "", 400
+    # The upload is hashed while it is read, so it is read only once. Small uploads are then parsed from memory.
+    source, digest = App.instance.artifact_store.receive_upload(stream)
+
+    cache_key = App.instance.report_result_cache.key(digest)
+    cached_result = App.instance.report_result_cache.get(cache_key)
+
+    if cached_result is not None:
+        App.instance.artifact_store.delete_source(source)
+        output_file_id, logs = cached_result
+        job_id = App.instance.report_job_queue.add_finished(original_source_filename, output_file_id, logs)
+
+        return {
+            "id": job_id,
+            "status": ReportJobQueue.DONE,
+            "cached": True
+        }, 202
 
-    original_source_filename = secure_filename(file.filename)
-    real_source_filename = uuid.uuid4()
-    file.save(os.path.join(g_tmp_path, real_source_filename.__str__()))
+    def cache_result(output_file_id: str, logs: str) -> None:
+        App.instance.artifact_store.register(output_file_id, [
+            output_file_id + ".xlsx",
+            output_file_id + CumulativeExpenseReportColumnarExporter.EXTENSION
+        ])
+        App.instance.report_result_cache.put(cache_key, output_file_id=output_file_id, logs=logs)
 
-    def run():
-        report = App.instance.cumulative_expense_report_processor.process_report(
+    try:
+        job_id = App.instance.report_job_queue.submit(
             file_name=original_source_filename,
-            real_path=os.path.realpath(os.path.join(g_tmp_path, real_source_filename.__str__()))
+            source=source,
+            on_success=cache_result,
+            include_metrics=include_metrics
+        )
+    except ReportJobQueue.QueueFullError as error:
+        logger.warning(f"! Informe rechazado, la cola de trabajos está llena: {error}")
+        App.instance.artifact_store.delete_source(source)
+
+        return {"error": "La cola de trabajos está llena, inténtalo de nuevo más tarde"}, 503, {"Retry-After": "5"}
+
+    return {
+        "id": job_id,
+        "status": ReportJobQueue.QUEUED,
+        "cached": False
+    }, 202
+
+
+@routes.route("/api/cumulative-expense-reports/preflight", methods=["POST"])
+def api_preflight_cumulative_expense_report():
+    # Go/no-go check of a report without processing it, answered in the same request. With "?positions=1" the totals
+    # of the budget positions are also checked, which reads every page. Either way it runs in a job process, under
+    # the limits of the reports, as reading even a single page of an arbitrary PDF may take too long.
+    upload = uploaded_report()
+
+    if upload is None:
+        return "", 400
+
+    original_source_filename, stream = upload
+    validate_positions = request.args.get("positions", "").lower() in ("1", "true", "yes")
+    source, _ = App.instance.artifact_store.receive_upload(stream)
+
+    try:
+        result = App.instance.report_job_queue.run(
+            run_preflight_check,
+            (original_source_filename, source, validate_positions)
+        )
+    except ReportJobQueue.QueueFullError as error:
+        logger.warning(f"! Comprobación rechazada, la cola de trabajos está llena: {error}")
+
+        return {"error": "La cola de trabajos está llena, inténtalo de nuevo más tarde"}, 503, {"Retry-After": "5"}
+    except BrokenProcessPool as error:
+        logger.error(f"El proceso de trabajo terminó inesperadamente: {error}")
+
+        return {"error": "El proceso de trabajo terminó inesperadamente, inténtalo de nuevo"}, 503, {"Retry-After": "5"}
+    except Exception as error:
+        logger.error(f"Error al comprobar el informe: {error!r}")
+
+        return {"error": "Error al comprobar el informe", "error_code": ReportJobQueue.ERROR}, 500
+    finally:
+        App.instance.artifact_store.delete_source(source)
+
+    return result, 200
+
+
+@routes.route("/api/cumulative-expense-reports/batch", methods=["POST"])
+def api_process_cumulative_expense_report_batch():
+    files = request.files.getlist('files')
+
+    if len(files) == 0:
+        return "", 400
+
+    # (original file name, saved path) of every PDF, whether uploaded directly or inside a ZIP archive
+    sources = []
+    too_many_files_message = f"Un lote no puede tener más de {g_batch_max_files} informes"
+
+    def reject(status: int, message: str):
+        for _, real_path in sources:
+            App.instance.artifact_store.delete_file(real_path)
+
+        return {"error": message}, status
+
+    def save_batch_source(file_name: str, stream) -> None:
+        # Each report is limited on its own and by what is left of the limit of the whole batch
+        saved_bytes = sum(os.path.getsize(real_path) for _, real_path in sources)
+        max_bytes = min(g_batch_max_report_bytes, g_batch_max_total_bytes - saved_bytes)
+        sources.append((file_name, save_source(stream, max_bytes)))
+
+    try:
+        for file in files:
+            if is_pdf_file(file):
+                save_batch_source(secure_filename(file.filename), file.stream)
+            elif allowed_file(file.filename, g_allowed_archive_extensions) and zipfile.is_zipfile(file.stream):
+                file.stream.seek(0)
+
+                with zipfile.ZipFile(file.stream) as archive:
+                    # Checked before extracting anything. The sizes in the archive may be forged, so they are also
+                    # enforced while extracting.
+                    members = [
+                        member for member in archive.infolist()
+                        if not member.is_dir() and allowed_file(member.filename)
+                    ]
+
+                    if len(sources) + len(members) > g_batch_max_files:
+                        return reject(400, too_many_files_message)
+
+                    for member in members:
+                        if member.file_size > g_batch_max_report_bytes:
+                            return reject(
+                                413,
+                                f"El informe \"{member.filename}\" supera el máximo de {g_batch_max_report_bytes} bytes"
+                            )
+
+                        with archive.open(member) as stream:
+                            save_batch_source(secure_filename(os.path.basename(member.filename)), stream)
+            else:
+                return reject(400, f"El fichero \"{file.filename}\" no es un PDF ni un ZIP")
+
+            if len(sources) > g_batch_max_files:
+                return reject(400, too_many_files_message)
+    except (zipfile.BadZipFile, EOFError) as error:
+        return reject(400, f"El fichero ZIP está dañado: {error}")
+    except ArtifactStore.UploadTooLargeError:
+        return reject(
+            413,
+            f"Cada informe de un lote puede ocupar hasta {g_batch_max_report_bytes} bytes, y todos ellos hasta "
+            f"{g_batch_max_total_bytes} bytes"
+        )
+
+    if len(sources) == 0:
+        return reject(400, "El lote no contiene ningún informe PDF")
+
+    try:
+        job_id = App.instance.report_job_queue.submit_batch(
+            file_name=f"Lote de {len(sources)} informes",
+            sources=sources,
+            on_success=lambda output_file_id, logs: App.instance.artifact_store.register(
+                output_file_id, [output_file_id + ".xlsx"]
+            )
         )
+    except ReportJobQueue.QueueFullError as error:
+        logger.warning(f"! Lote rechazado, la cola de trabajos está llena: {error}")
 
-        return App.instance.cumulative_expense_report_excel_generator.generate(report)
+        body, status = reject(503, "La cola de trabajos está llena, inténtalo de nuevo más tarde")
 
-    output_file_id, logs = CapturingLogger.capture_html_logs(run)
+        return body, status, {"Retry-After": "5"}
 
     return {
-        "id": output_file_id.__str__(),
-        "logs": logs
-    }, 200
+        "id": job_id,
+        "status": ReportJobQueue.QUEUED
+    }, 202
+
 
+@routes.route("/api/cumulative-expense-reports/jobs/<uuid:job_id>", methods=["GET"])
+def api_retrieve_cumulative_expense_report_job(job_id: uuid.UUID):
+    status = App.instance.report_job_queue.status(job_id.__str__())
 
-@App.instance.flask.route("/api/cumulative-expense-reports/<uuid:report_id>", methods=["GET"])
+    if status is None:
+        return "", 404
+
+    return status, 200
+
+
+@routes.route("/api/cumulative-expense-reports/<uuid:report_id>", methods=["GET"])
 def api_retrieve_cumulative_expense_report(report_id: uuid.UUID):
-    path = os.path.join(g_tmp_path, report_id.__str__() + ".xlsx")
+    # The format is chosen with "?format=" or, without it, with the Accept header. Excel files are generated by the
+    # processing job, every other format is exported from the columnar snapshot of the parsed report.
+    registry = App.instance.report_exporter_registry
+    requested_format = request.args.get("format")
+
+    if requested_format is not None:
+        exporter = registry.get(requested_format)
+
+        if exporter is None:
+            return {"error": f"Formato desconocido, los formatos disponibles son: {', '.join(registry.formats())}"}, 400
+    else:
+        exporter = registry.negotiate(request.accept_mimetypes)
 
-    if not os.path.exists(path):
+        if exporter is None:
+            return {"error": f"Los formatos disponibles son: {', '.join(registry.formats())}"}, 406
+
+    artifact_store = App.instance.artifact_store
+    path = artifact_store.lookup(report_id.__str__(), report_id.__str__() + ".xlsx")
+
+    if path is None:
         return "", 404
 
-    response = send_file(
-        path,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        as_attachment=False
+    headers = {"Vary": "Accept"}
+
+    # Formats that cannot be streamed are sent from the Excel file the processing job generated
+    if not exporter.streaming:
+        response = send_file(path, mimetype=exporter.MIME_TYPE, as_attachment=False)
+        response.headers.update(headers)
+        return response
+
+    snapshot_path = artifact_store.lookup(
+        report_id.__str__(),
+        report_id.__str__() + CumulativeExpenseReportColumnarExporter.EXTENSION
     )
-    return response
+
+    # Consolidated batch workbooks have no single parsed report to export
+    if snapshot_path is None:
+        return {"error": f"El formato {exporter.FORMAT} no está disponible para este informe"}, 406
+
+    if exporter.FORMAT == CumulativeExpenseReportColumnarExporter.FORMAT:
+        response = send_file(snapshot_path, mimetype=exporter.MIME_TYPE, as_attachment=False)
+        response.headers.update(headers)
+        return response
+
+    report = registry.get(CumulativeExpenseReportColumnarExporter.FORMAT).load(snapshot_path)
+
+    return Response(exporter.iter_chunks(report), mimetype=exporter.MIME_TYPE, headers=headers)
+
+
+@routes.route("/api/cumulative-expense-reports/objects/<object_id>/delta", methods=["GET"])
+def api_retrieve_cumulative_expense_report_delta(object_id: str):
+    # Changes between the last two reports processed of the object
+    path = App.instance.report_state_store.delta_path(object_id)
+
+    if path is None:
+        return "", 404
+
+    return send_file(path, mimetype=CumulativeExpenseReportDeltaExporter.MIME_TYPE, as_attachment=False)
+
+
+@routes.route("/api/transactions/aggregates/<group>", methods=["GET"])
+def api_aggregate_transactions(group: str):
+    # Transactions of the last report of every object, grouped by position, chapter, vendor or month, and filtered
+    # with the query parameters in TransactionStore.FILTERS
+    filters = {name: value for name, value in request.args.items() if name != "include_excluded"}
+    include_excluded = request.args.get("include_excluded", "").lower() in ("1", "true", "yes")
+
+    try:
+        groups = App.instance.transaction_store.aggregate(group, filters, include_excluded)
+    except TransactionStore.QueryError as error:
+        return {"error": str(error)}, 400
+
+    return {"group": group, "groups": groups}, 200
+
+
+@routes.route("/api/transactions/reports", methods=["GET"])
+def api_retrieve_stored_reports():
+    # Reports whose transactions are stored, the last one of each object
+    return {"reports": App.instance.transaction_store.reports()}, 200
+
+
+@routes.route("/metrics", methods=["GET"])
+def metrics():
+    result_cache_stats = App.instance.report_result_cache.stats()
+    artifact_store_stats = App.instance.artifact_store.stats()
+    job_stats = App.instance.report_job_queue.stats()
+
+    body = App.instance.metrics_registry.render({
+        "dafi_jobs_pending": ("Queued or running jobs", job_stats["pending"]),
+        "dafi_jobs_rejected": ("Jobs rejected because the queue was full", job_stats["rejected"]),
+        "dafi_jobs_limit_rejections": ("Reports over their page or memory limit", job_stats["limit_rejections"]),
+        "dafi_jobs_timeouts": ("Reports over their CPU or wall time limit", job_stats["timeouts"]),
+        "dafi_result_cache_entries": ("Entries of the result cache", result_cache_stats["entries"]),
+        "dafi_result_cache_hits": ("Uploads served from the result cache", result_cache_stats["hits"]),
+        "dafi_result_cache_misses": ("Uploads not found in the result cache", result_cache_stats["misses"]),
+        "dafi_artifacts": ("Generated outputs kept in the temporary folder", artifact_store_stats["artifacts"]),
+        "dafi_artifacts_bytes": ("Bytes of the generated outputs kept", artifact_store_stats["bytes"]),
+        "dafi_artifacts_expired": ("Outputs deleted for not being used", artifact_store_stats["expired"]),
+        "dafi_artifacts_evicted": ("Outputs deleted to stay under the size limit", artifact_store_stats["evicted"]),
+        "dafi_uploaded_bytes": ("Bytes of the uploaded reports", artifact_store_stats["uploaded_bytes"]),
+    })
+
+    return body, 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+@routes.route("/api/stats", methods=["GET"])
+def api_stats():
+    return {
+        "result_cache": App.instance.report_result_cache.stats(),
+        "artifact_store": App.instance.artifact_store.stats(),
+        "jobs": App.instance.report_job_queue.stats()
+    }, 200
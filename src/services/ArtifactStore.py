@@ -0,0 +1,282 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from config.config import g_tmp_path, g_artifact_ttl_seconds, g_artifact_max_bytes, \
+    g_artifact_cleanup_interval_seconds, g_upload_chunk_size, g_in_memory_upload_max_bytes, logger
+
+
+class ArtifactStore:
+    # Files of the temporary folder. Uploaded sources are written in chunks and deleted by the jobs once parsed.
+    # Generated outputs are registered here and deleted once they have not been used for the TTL or, least recently
+    # used first, when they exceed the size limit. Every web worker process has its own store, so the use of a file is
+    # also recorded in its access time, which the stores of the other processes see.
+
+    PARTIAL_SUFFIX = ".part"
+
+    # Files named by this store: the id of an upload or output, e.g. a UUID, and optionally extensions
+    FILE_NAME_PATTERN = re.compile(r"^(?P<id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})(\.\w+)*$")
+
+    class UploadTooLargeError(Exception):
+        pass
+
+    def __init__(self,
+                 root: str = g_tmp_path,
+                 ttl_seconds: float = g_artifact_ttl_seconds,
+                 max_bytes: int = g_artifact_max_bytes,
+                 cleanup_interval_seconds: float = g_artifact_cleanup_interval_seconds,
+                 chunk_size: int = g_upload_chunk_size
+                 ):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.cleanup_interval_seconds = cleanup_interval_seconds
+        self.chunk_size = chunk_size
+        # Artifact id -> {"paths", "size", "last_access"}, least recently used first
+        self.artifacts = OrderedDict()
+        self.total_bytes = 0
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self.expired = 0
+        self.evicted = 0
+        self.orphans_removed = 0
+        self.cleaner = None
+        self.lock = threading.Lock()
+
+    def path(self, file_name: str) -> str:
+        return os.path.realpath(os.path.join(self.root, file_name))
+
+    @staticmethod
+    def touch(path: str) -> None:
+        # Only the access time, as the modification time of a file is part of the responses that send it
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def last_used(paths: list) -> float:
+        # Latest time any process used or wrote any of the files, 0 if none of them exists
+        times = [0.0]
+
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+            times.append(max(stat.st_atime, stat.st_mtime))
+
+        return max(times)
+
+    def receive_upload(self, stream, max_memory_bytes: int = g_in_memory_upload_max_bytes) -> tuple:
+        # Uploads of up to max_memory_bytes are kept in memory and larger ones saved as a source file. Returns the
+        # contents or the path of the source, and the SHA-256 hex digest of the upload.
+        head = bytearray()
+
+        while len(head) <= max_memory_bytes:
+            chunk = stream.read(min(self.chunk_size, max_memory_bytes + 1 - len(head)))
+
+            if not chunk:
+                with self.lock:
+                    self.uploads += 1
+                    self.uploaded_bytes += len(head)
+
+                contents = bytes(head)
+
+                return contents, hashlib.sha256(contents).hexdigest()
+
+            head += chunk
+
+        return self.save_upload(stream, bytes(head))
+
+    def save_upload(self, stream, head: bytes = b"", max_bytes: int = None) -> tuple:
+        # Copies head, the part of the upload already read, and the rest of the stream to a new source file chunk
+        # by chunk, hashing them on the way. Returns its path and the SHA-256 hex digest of its contents. Uploads
+        # larger than max_bytes are deleted as soon as they reach it, whatever size they claimed to have.
+        source_path = self.path(uuid.uuid4().__str__())
+        partial_path = source_path + self.PARTIAL_SUFFIX
+        digest = hashlib.sha256(head)
+        size = len(head)
+
+        try:
+            with open(partial_path, "wb") as destination:
+                destination.write(head)
+
+                for chunk in iter(lambda: stream.read(self.chunk_size), b""):
+                    size += len(chunk)
+
+                    if max_bytes is not None and size > max_bytes:
+                        raise ArtifactStore.UploadTooLargeError(f"El fichero supera el máximo de {max_bytes} bytes")
+
+                    digest.update(chunk)
+                    destination.write(chunk)
+
+            os.replace(partial_path, source_path)
+        except BaseException:
+            self.delete_file(partial_path)
+            raise
+
+        with self.lock:
+            self.uploads += 1
+            self.uploaded_bytes += size
+
+        return source_path, digest.hexdigest()
+
+    def register(self, artifact_id: str, file_names: list) -> None:
+        # The files of an output, e.g. an Excel file and its columnar snapshot, are kept and evicted together
+        paths = [self.path(file_name) for file_name in file_names]
+        size = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+        for path in paths:
+            self.touch(path)
+
+        with self.lock:
+            if artifact_id in self.artifacts:
+                self.total_bytes -= self.artifacts.pop(artifact_id)["size"]
+
+            self.artifacts[artifact_id] = {"paths": paths, "size": size, "last_access": time.monotonic()}
+            self.total_bytes += size
+
+            self.evict_over_limit()
+
+        self.start_cleaner()
+
+    def lookup(self, artifact_id: str, file_name: str):
+        # Path of a file of an output, None if it is not available. Looking an output up counts as using it. Files
+        # left by another process or by a previous run are registered when they are first asked for.
+        path = self.path(file_name)
+
+        if not os.path.exists(path):
+            return None
+
+        self.touch(path)
+
+        with self.lock:
+            artifact = self.artifacts.get(artifact_id)
+
+            if artifact is not None:
+                artifact["last_access"] = time.monotonic()
+                self.artifacts.move_to_end(artifact_id)
+
+                if path not in artifact["paths"]:
+                    size = os.path.getsize(path)
+                    artifact["paths"].append(path)
+                    artifact["size"] += size
+                    self.total_bytes += size
+
+                return path
+
+        self.register(artifact_id, [file_name])
+
+        return path
+
+    def delete_source(self, source) -> None:
+        # Sources kept in memory have no file
+        if isinstance(source, str):
+            self.delete_file(source)
+
+    def delete_file(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as error:
+            logger.warning(f"! No se pudo eliminar el fichero {path}: {error}")
+
+    def remove(self, artifact_id: str) -> None:
+        # Must be called with the lock held
+        artifact = self.artifacts.pop(artifact_id)
+        self.total_bytes -= artifact["size"]
+
+        for path in artifact["paths"]:
+            self.delete_file(path)
+
+    def evict_over_limit(self) -> None:
+        # Must be called with the lock held. The newest output is never evicted, even if it alone exceeds the limit.
+        while len(self.artifacts) > 1 and self.total_bytes > self.max_bytes:
+            self.remove(next(iter(self.artifacts)))
+            self.evicted += 1
+
+    def cleanup(self) -> None:
+        now = time.monotonic()
+        oldest_use = time.time() - self.ttl_seconds
+
+        with self.lock:
+            # In least recently used order, so the first output still in use ends the search
+            for artifact_id, artifact in list(self.artifacts.items()):
+                if now - artifact["last_access"] < self.ttl_seconds:
+                    break
+
+                if self.last_used(artifact["paths"]) >= oldest_use:
+                    # Used by another process since this one last did
+                    artifact["last_access"] = now
+                    self.artifacts.move_to_end(artifact_id)
+                    continue
+
+                self.remove(artifact_id)
+                self.expired += 1
+
+            self.evict_over_limit()
+
+            known_paths = {path for artifact in self.artifacts.values() for path in artifact["paths"]}
+
+        # Files of this store that no output of this process owns, e.g. from before a restart or registered by
+        # another process, once none of the files with the same id has been used for the TTL. Sources of jobs still
+        # running are newer than that.
+        orphans = {}
+
+        for entry in os.scandir(self.root):
+            match = self.FILE_NAME_PATTERN.match(entry.name)
+
+            if match is not None and entry.is_file():
+                orphans.setdefault(match.group("id"), []).append(entry.path)
+
+        for paths in orphans.values():
+            if any(path in known_paths for path in paths) or self.last_used(paths) >= oldest_use:
+                continue
+
+            for path in paths:
+                self.delete_file(path)
+
+                with self.lock:
+                    self.orphans_removed += 1
+
+    def start_cleaner(self) -> None:
+        # Started on first use, so processes that fork after creating the store get their own thread
+        if self.cleaner is not None and self.cleaner.is_alive():
+            return
+
+        with self.lock:
+            if self.cleaner is not None and self.cleaner.is_alive():
+                return
+
+            self.cleaner = threading.Thread(target=self.run_cleaner, name="artifact-store-cleaner", daemon=True)
+            self.cleaner.start()
+
+    def run_cleaner(self) -> None:
+        while True:
+            time.sleep(self.cleanup_interval_seconds)
+
+            try:
+                self.cleanup()
+            except Exception as error:
+                logger.error(f"Error al limpiar los ficheros temporales: {error}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "artifacts": len(self.artifacts),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "uploads": self.uploads,
+                "uploaded_bytes": self.uploaded_bytes,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "orphans_removed": self.orphans_removed,
+            }
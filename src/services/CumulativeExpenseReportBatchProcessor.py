@@ -0,0 +1,60 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from config.config import g_batch_processes, logger
+from src.log.CapturingLogger import CapturingLogger
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+
+# Processor of each worker process, created on its first report and reused by the following ones
+g_batch_worker_processor = None
+
+
+def process_batch_report(file_name: str, real_path: str) -> tuple:
+    # Runs inside the worker processes, so it has to be a picklable module level function
+    global g_batch_worker_processor
+
+    if g_batch_worker_processor is None:
+        g_batch_worker_processor = CumulativeExpenseReportProcessor()
+
+    def run():
+        try:
+            with g_batch_worker_processor.report_limits.apply():
+                return g_batch_worker_processor.process_report(file_name=file_name, source=real_path), None
+        except Exception as error:
+            logger.error(f"Error al procesar el informe \"{file_name}\": {error}")
+            return None, str(error)
+
+    (report, error), logs = CapturingLogger.capture_html_logs(run)
+
+    return report, logs, error
+
+
+class CumulativeExpenseReportBatchProcessor:
+
+    def __init__(self, processes: int = g_batch_processes):
+        self.processes = processes
+
+    def process_reports(self, sources: list):
+        # Yields (file name, report or None, logs, error) in the order of the sources. Only a bounded window of
+        # reports is parsed ahead of the consumer, so the whole batch is never held in memory at once.
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            pending = deque()
+
+            for file_name, real_path in sources:
+                pending.append((file_name, executor.submit(process_batch_report, file_name, real_path)))
+
+                if len(pending) >= 2 * self.processes:
+                    yield self.result(*pending.popleft())
+
+            while pending:
+                yield self.result(*pending.popleft())
+
+    @staticmethod
+    def result(file_name: str, future) -> tuple:
+        try:
+            report, logs, error = future.result()
+        except Exception as error:
+            logger.error(f"Error al procesar el informe \"{file_name}\": {error}")
+            return file_name, None, "", str(error)
+
+        return file_name, report, logs, error
@@ -0,0 +1,240 @@
+import datetime
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from config.config import g_tmp_path
+from src.models.CumulativeExpenseReport import CumulativeExpenseReport
+from src.models.CumulativeExpenseReportTransactionTable import CumulativeExpenseReportTransactionTable
+from src.services.CumulativeExpenseReportExporter import CumulativeExpenseReportExporter
+from src.valueobjects.BudgetPosition import BudgetPosition
+
+
+class CumulativeExpenseReportColumnarExporter(CumulativeExpenseReportExporter):
+    # Layout of a file:
+    #   MAGIC | version (uint16) | header length (uint32) | header (UTF-8 JSON) | column blocks
+    # The header holds the report metadata, its budget positions and, for every column, its name, type and the
+    # length of its block. Every block is zlib compressed and holds, by column type:
+    #   "dictionary": length of the dictionary (uint32) | dictionary (UTF-8 JSON list) | indexes (uint32 array)
+    #   "date": proleptic Gregorian ordinals (int32 array), 0 for no date
+    #   "int64": values (int64 array)
+    #   "bitmask": one bit per row, least significant bit first
+    # All numbers are little-endian.
+
+    FORMAT = "columnar"
+    MIME_TYPE = "application/vnd.dafi.columnar"
+    EXTENSION = ".dafc"
+
+    MAGIC = b"DAFC"
+    VERSION = 1
+
+    COMPRESSION_LEVEL = 1
+
+    COLUMNS = [
+        ("document_type_code", "dictionary"),
+        ("document_number", "dictionary"),
+        ("document_position", "dictionary"),
+        ("document_date", "date"),
+        ("reference", "dictionary"),
+        ("budget_position_code", "dictionary"),
+        ("vendor_id", "dictionary"),
+        ("vendor_name", "dictionary"),
+        ("description", "dictionary"),
+        ("amount_cents", "int64"),
+        ("excluded_from_total", "bitmask"),
+    ]
+
+    class FormatError(Exception):
+        pass
+
+    @staticmethod
+    def snapshot_path(output_file_id: str) -> str:
+        # Every processed report is also kept in this format next to its Excel file, so any other format can be
+        # exported later from the parsed report without parsing the PDF again
+        return os.path.join(g_tmp_path, output_file_id + CumulativeExpenseReportColumnarExporter.EXTENSION)
+
+    @staticmethod
+    def little_endian(values: array) -> bytes:
+        if sys.byteorder == "big":
+            values = array(values.typecode, values)
+            values.byteswap()
+
+        return values.tobytes()
+
+    @staticmethod
+    def from_little_endian(typecode: str, data: bytes) -> array:
+        values = array(typecode)
+        values.frombytes(data)
+
+        if sys.byteorder == "big":
+            values.byteswap()
+
+        return values
+
+    @staticmethod
+    def encode_dictionary(dictionary: list, indexes: array) -> bytes:
+        encoded_dictionary = json.dumps(dictionary, ensure_ascii=False).encode("utf-8")
+
+        return struct.pack("<I", len(encoded_dictionary)) + encoded_dictionary + \
+            CumulativeExpenseReportColumnarExporter.little_endian(indexes)
+
+    @staticmethod
+    def encode_symbol_column(symbols: list, symbol_ids: array) -> bytes:
+        # Dictionary column of a field the table already stores as symbols: the symbols used by the field, in order
+        # of appearance, are numbered again from 0 without looking any value up
+        used_symbol_ids = list(dict.fromkeys(symbol_ids))
+        new_indexes = [0] * len(symbols)
+
+        for index, symbol_id in enumerate(used_symbol_ids):
+            new_indexes[symbol_id] = index
+
+        return CumulativeExpenseReportColumnarExporter.encode_dictionary(
+            [symbols[symbol_id] for symbol_id in used_symbol_ids],
+            array('I', map(new_indexes.__getitem__, symbol_ids))
+        )
+
+    @staticmethod
+    def encode_column(column_type: str, values: list) -> bytes:
+        if column_type == "dictionary":
+            dictionary = {}
+            indexes = array('I', (dictionary.setdefault(value, len(dictionary)) for value in values))
+
+            return CumulativeExpenseReportColumnarExporter.encode_dictionary(list(dictionary), indexes)
+
+        if column_type == "date":
+            return CumulativeExpenseReportColumnarExporter.little_endian(
+                array('i', (value.toordinal() if value is not None else 0 for value in values))
+            )
+
+        if column_type == "int64":
+            return CumulativeExpenseReportColumnarExporter.little_endian(array('q', values))
+
+        bitmask = bytearray((len(values) + 7) // 8)
+
+        for row, value in enumerate(values):
+            if value:
+                bitmask[row >> 3] |= 1 << (row & 7)
+
+        return bytes(bitmask)
+
+    @staticmethod
+    def decode_dictionary(data: bytes) -> tuple:
+        (dictionary_length,) = struct.unpack_from("<I", data)
+        dictionary = json.loads(data[4:4 + dictionary_length].decode("utf-8"))
+        indexes = CumulativeExpenseReportColumnarExporter.from_little_endian('I', data[4 + dictionary_length:])
+
+        return dictionary, indexes
+
+    @staticmethod
+    def decode_column(column_type: str, data: bytes, rows: int) -> list:
+        if column_type == "dictionary":
+            dictionary, indexes = CumulativeExpenseReportColumnarExporter.decode_dictionary(data)
+
+            return [dictionary[index] for index in indexes]
+
+        if column_type == "date":
+            ordinals = CumulativeExpenseReportColumnarExporter.from_little_endian('i', data)
+            dates = {}
+
+            return [
+                dates.setdefault(ordinal, datetime.date.fromordinal(ordinal)) if ordinal != 0 else None
+                for ordinal in ordinals
+            ]
+
+        if column_type == "int64":
+            return list(CumulativeExpenseReportColumnarExporter.from_little_endian('q', data))
+
+        return [bool(data[row >> 3] & (1 << (row & 7))) for row in range(rows)]
+
+    def iter_chunks(self, report: CumulativeExpenseReport):
+        transactions = report.transactions
+        blocks = []
+
+        for name, column_type in self.COLUMNS:
+            if column_type == "dictionary" and name in transactions.SYMBOL_COLUMNS:
+                encoded = self.encode_symbol_column(*transactions.symbol_column(name))
+            else:
+                encoded = self.encode_column(column_type, transactions.column(name))
+
+            blocks.append(zlib.compress(encoded, self.COMPRESSION_LEVEL))
+
+        header = json.dumps({
+            "report": {
+                "file_name": report.file_name,
+                "object_id": report.object_id,
+                "object_name": report.object_name,
+                "date": report.date.isoformat() if report.date is not None else None,
+                "number_of_pages": report.number_of_pages,
+                "total_amount_cents": report.total_amount_cents,
+            },
+            "budget_positions": [
+                [budget_position.code, budget_position.name, budget_position.budget_chapter]
+                for budget_position in report.budget_positions
+            ],
+            "rows": len(transactions),
+            "columns": [
+                {"name": name, "type": column_type, "length": len(block)}
+                for (name, column_type), block in zip(self.COLUMNS, blocks)
+            ],
+        }, ensure_ascii=False).encode("utf-8")
+
+        yield self.MAGIC + struct.pack("<HI", self.VERSION, len(header)) + header
+
+        yield from blocks
+
+    def load(self, path: str) -> CumulativeExpenseReport:
+        # Rebuilds the report from an exported file, without the PDF
+        with open(path, "rb") as file:
+            data = file.read()
+
+        try:
+            return self.decode(path, data)
+        except (struct.error, zlib.error, ValueError, OverflowError, KeyError, IndexError, TypeError) as error:
+            # E.g. a truncated or corrupt file
+            raise self.FormatError(f"{path} está dañado: {error!r}") from error
+
+    def decode(self, path: str, data: bytes) -> CumulativeExpenseReport:
+        if data[:4] != self.MAGIC:
+            raise self.FormatError(f"{path} no es un fichero columnar de informes")
+
+        version, header_length = struct.unpack_from("<HI", data, 4)
+
+        if version != self.VERSION:
+            raise self.FormatError(f"Versión {version} del formato columnar no soportada")
+
+        offset = 10 + header_length
+        header = json.loads(data[10:offset].decode("utf-8"))
+        rows = header["rows"]
+        columns = {}
+
+        for column in header["columns"]:
+            block = zlib.decompress(data[offset:offset + column["length"]])
+
+            # Fields the table stores as symbols are given to it as distinct values and indexes, see from_columns
+            if column["name"] not in CumulativeExpenseReportTransactionTable.SYMBOL_COLUMNS:
+                columns[column["name"]] = self.decode_column(column["type"], block, rows)
+            elif column["type"] == "dictionary":
+                columns[column["name"]] = self.decode_dictionary(block)
+            else:
+                values = self.decode_column(column["type"], block, rows)
+                indexes = {value: index for index, value in enumerate(dict.fromkeys(values))}
+                columns[column["name"]] = list(indexes), array('I', map(indexes.__getitem__, values))
+            offset += column["length"]
+
+        metadata = header["report"]
+        report = CumulativeExpenseReport(metadata["file_name"])
+        report.object_id = metadata["object_id"]
+        report.object_name = metadata["object_name"]
+        report.date = datetime.date.fromisoformat(metadata["date"]) if metadata["date"] is not None else None
+        report.number_of_pages = metadata["number_of_pages"]
+        report.total_amount_cents = metadata["total_amount_cents"]
+
+        for code, name, budget_chapter in header["budget_positions"]:
+            report.add_budget_position(BudgetPosition(code, name, budget_chapter))
+
+        report.set_transactions(CumulativeExpenseReportTransactionTable.from_columns(columns))
+
+        return report
@@ -0,0 +1,33 @@
+import csv
+import io
+
+from src.models.CumulativeExpenseReport import CumulativeExpenseReport
+from src.services.CumulativeExpenseReportExporter import CumulativeExpenseReportExporter
+
+
+class CumulativeExpenseReportCsvExporter(CumulativeExpenseReportExporter):
+
+    FORMAT = "csv"
+    MIME_TYPE = "text/csv"
+    EXTENSION = ".csv"
+
+    def iter_chunks(self, report: CumulativeExpenseReport):
+        # Dates in ISO format and amounts in integer cents, so no value depends on the locale
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(self.FIELDS)
+
+        for index, row in enumerate(self.iter_rows(report), start=1):
+            writer.writerow([
+                *row[:6],
+                row[6].isoformat() if row[6] is not None else None,
+                *row[7:12],
+                int(row[12])
+            ])
+
+            if index % self.CHUNK_ROWS == 0:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue().encode("utf-8")
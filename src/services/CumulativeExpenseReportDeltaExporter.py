@@ -0,0 +1,142 @@
+import json
+
+from src.models.CumulativeExpenseReport import CumulativeExpenseReport
+from src.services.CumulativeExpenseReportExporter import CumulativeExpenseReportExporter
+
+
+class CumulativeExpenseReportDeltaExporter:
+    # Changes between two reports of the same object, e.g. the one downloaded last week and today's one, as NDJSON.
+    # The first line sums the changes up and every following line is a transaction that was added, removed or
+    # changed. Changed transactions also have the previous values of the fields that changed.
+
+    MIME_TYPE = "application/x-ndjson"
+    EXTENSION = ".delta.ndjson"
+
+    ADDED = "added"
+    REMOVED = "removed"
+    CHANGED = "changed"
+
+    # Fields that identify a transaction between two reports, the rest of them may change
+    KEY_FIELDS = ["budget_position_code", "document_type_code", "document_number", "document_position"]
+
+    @staticmethod
+    def keyed_rows(report: CumulativeExpenseReport, first_row: int) -> dict:
+        # Key of every transaction from first_row on -> its row. The same document may have several transactions
+        # with the same key, which are told apart by their order.
+        transactions = report.transactions
+        keys = zip(*(transactions.column(field) for field in CumulativeExpenseReportDeltaExporter.KEY_FIELDS))
+        occurrences = {}
+        rows = {}
+
+        for row, key in enumerate(keys):
+            occurrence = occurrences[key] = occurrences.get(key, -1) + 1
+
+            if row >= first_row:
+                rows[key + (occurrence,)] = row
+
+        return rows
+
+    @staticmethod
+    def row_values(report: CumulativeExpenseReport, budget_chapters: dict, row: int) -> tuple:
+        # Values of CumulativeExpenseReportExporter.FIELDS of a transaction
+        transaction = report.transactions[row]
+
+        return (
+            report.object_id,
+            transaction.budget_position_code,
+            budget_chapters.get(transaction.budget_position_code),
+            transaction.document_type_code,
+            transaction.document_number,
+            transaction.document_position,
+            transaction.document_date,
+            transaction.reference,
+            transaction.vendor_id,
+            transaction.vendor_name,
+            transaction.description,
+            transaction.amount_cents,
+            transaction.excluded_from_total,
+        )
+
+    def diff(self, previous: CumulativeExpenseReport, current: CumulativeExpenseReport, common_rows: int = 0):
+        # Yields (change, values, previous values of the changed fields) in the order of the current report, and
+        # then the removed transactions in the order of the previous one. The first common_rows transactions are
+        # known to be the same in both reports, e.g. because they were reused from the previous one, and are not
+        # compared.
+        fields = CumulativeExpenseReportExporter.FIELDS
+        previous_chapters = {position.code: position.budget_chapter for position in previous.budget_positions}
+        current_chapters = {position.code: position.budget_chapter for position in current.budget_positions}
+        previous_rows = self.keyed_rows(previous, common_rows)
+
+        for key, row in self.keyed_rows(current, common_rows).items():
+            values = self.row_values(current, current_chapters, row)
+            previous_row = previous_rows.pop(key, None)
+
+            if previous_row is None:
+                yield self.ADDED, values, None
+                continue
+
+            previous_values = self.row_values(previous, previous_chapters, previous_row)
+
+            if previous_values[1:] != values[1:]:
+                yield self.CHANGED, values, {
+                    field: previous_value
+                    for field, value, previous_value in zip(fields, values, previous_values)
+                    if value != previous_value
+                }
+
+        for row in previous_rows.values():
+            yield self.REMOVED, self.row_values(previous, previous_chapters, row), None
+
+    @staticmethod
+    def record(values: tuple) -> dict:
+        record = dict(zip(CumulativeExpenseReportExporter.FIELDS, values))
+
+        if record["document_date"] is not None:
+            record["document_date"] = record["document_date"].isoformat()
+
+        return record
+
+    def iter_chunks(self, previous: CumulativeExpenseReport, current: CumulativeExpenseReport, common_rows: int = 0):
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        lines = []
+        counts = {self.ADDED: 0, self.REMOVED: 0, self.CHANGED: 0}
+
+        for change, values, previous_values in self.diff(previous, current, common_rows):
+            record = {"record": change, **self.record(values)}
+
+            if previous_values is not None:
+                if previous_values.get("document_date") is not None:
+                    previous_values["document_date"] = previous_values["document_date"].isoformat()
+
+                record["previous"] = previous_values
+
+            lines.append(dumps(record))
+            counts[change] += 1
+
+        # The summary goes first, so the changes are only serialized and counted before yielding anything
+        yield (dumps({
+            "record": "delta",
+            "object_id": current.object_id,
+            "object_name": current.object_name,
+            "previous_date": previous.date.isoformat() if previous.date is not None else None,
+            "date": current.date.isoformat() if current.date is not None else None,
+            "previous_number_of_pages": previous.number_of_pages,
+            "number_of_pages": current.number_of_pages,
+            "previous_total_amount_cents": previous.total_amount_cents,
+            "total_amount_cents": current.total_amount_cents,
+            **counts,
+        }) + "\n").encode("utf-8")
+
+        for first_line in range(0, len(lines), CumulativeExpenseReportExporter.CHUNK_ROWS):
+            chunk = lines[first_line:first_line + CumulativeExpenseReportExporter.CHUNK_ROWS]
+            yield ("\n".join(chunk) + "\n").encode("utf-8")
+
+    def export_file(self,
+                    previous: CumulativeExpenseReport,
+                    current: CumulativeExpenseReport,
+                    new_path: str,
+                    common_rows: int = 0
+                    ) -> None:
+        with open(new_path, "wb") as file:
+            for chunk in self.iter_chunks(previous, current, common_rows):
+                file.write(chunk)
@@ -1,62 +1,181 @@
 import os
 import uuid
 
-import xlsxwriter
-
-from config.config import g_tmp_path, logger
+from config.config import g_tmp_path, g_excel_constant_memory, logger
 from src.models.CumulativeExpenseReport import CumulativeExpenseReport
 
 
 class CumulativeExpenseReportExcelGenerator:
 
+    # Excel limits worksheet names to 31 characters
+    MAX_WORKSHEET_NAME_LENGTH = 31
+
+    SUMMARY_WORKSHEET_NAME = "Resumen"
+
+    DATE_FORMAT = "dd/mm/yyyy"
+    CURRENCY_FORMAT = "#,##0.00 \"€\""
+
+    HEADER = [
+        "Posición presupuestaria",
+        "Importe previsto",
+        "Importe anotado",
+        "Capítulo",
+        "Tipo transacción",
+        "Tipo doc.",
+        "Nº documento",
+        "Posición",
+        "Referencia",
+        "NIF acreedor",
+        "Posición presupuestaria o cl. coste y denom. cl. coste",
+        "Fecha doc.",
+    ]
+
+    def __init__(self, constant_memory: bool = g_excel_constant_memory):
+        # In constant memory mode every row is flushed to disk as soon as a later row is written, so rows must be
+        # written in order, but memory no longer grows with the number of transactions
+        self.constant_memory = constant_memory
+
+    @staticmethod
+    def backend():
+        # XlsxWriter takes longer to import than the rest of the app, so it is only imported once a file is generated
+        import xlsxwriter
+
+        return xlsxwriter
+
+    def create_workbook(self, new_path: str, constant_memory: bool = None):
+        return self.backend().Workbook(new_path, {
+            "constant_memory": self.constant_memory if constant_memory is None else constant_memory,
+            "default_date_format": self.DATE_FORMAT
+        })
+
     def generate(self, report: CumulativeExpenseReport) -> uuid.UUID:
+        output_file_id = uuid.uuid4()
+
+        self.generate_file(report, os.path.join(g_tmp_path, output_file_id.__str__() + ".xlsx"))
+
+        return output_file_id
+
+    def generate_file(self, report: CumulativeExpenseReport, new_path: str) -> None:
         logger.info("Generating Excel file")
 
+        workbook = self.create_workbook(new_path)
+        worksheet = workbook.add_worksheet()
+
+        self.write_report(worksheet, report, workbook.add_format({"num_format": self.CURRENCY_FORMAT}))
+
+        workbook.close()
+
+        logger.info("Excel file generated")
+
+    def generate_batch(self, results) -> uuid.UUID:
+        # The results are (file name, report or None, error) tuples, written and released one at a time, so the
+        # workbook is always written in constant memory mode
+        logger.info("Generating consolidated Excel file")
+
         output_file_id = uuid.uuid4()
         new_path = os.path.join(g_tmp_path, output_file_id.__str__() + ".xlsx")
 
-        workbook = xlsxwriter.Workbook(new_path)
-        worksheet = workbook.add_worksheet()
+        workbook = self.create_workbook(new_path, constant_memory=True)
+        currency_format = workbook.add_format({"num_format": self.CURRENCY_FORMAT})
+
+        # The summary goes through the same unique names as the reports, so no report can take its name
+        worksheet_names = set()
+        summary = workbook.add_worksheet(self.unique_worksheet_name(self.SUMMARY_WORKSHEET_NAME, worksheet_names))
+        summary.set_column(2, 2, 12)
+        summary.set_column(5, 5, 16, currency_format)
+
+        summary.write_row(0, 0, [
+            "Orden",
+            "Nombre",
+            "Fecha del informe",
+            "Nº páginas",
+            "Nº movimientos",
+            "Importe total",
+            "Fichero",
+            "Error"
+        ])
+
+        row = 1
+        total_amount_cents = 0
+
+        for file_name, report, error in results:
+            if report is None:
+                summary.write_row(row, 0, [None, None, None, None, None, None, file_name, error])
+            else:
+                worksheet = workbook.add_worksheet(self.unique_worksheet_name(report.object_id, worksheet_names))
+                self.write_report(worksheet, report, currency_format)
+
+                summary.write_row(row, 0, [
+                    report.object_id,
+                    report.object_name,
+                    report.date,
+                    report.number_of_pages,
+                    len(report.transactions),
+                    report.total_amount_cents / 100,
+                    file_name
+                ])
+                total_amount_cents += report.total_amount_cents
+
+            row += 1
 
-        worksheet.write(0, 0, "Posición presupuestaria")
-        worksheet.write(0, 1, "Importe previsto")
-        worksheet.write(0, 2, "Importe anotado")
-        worksheet.write(0, 3, "Capítulo")
-        worksheet.write(0, 4, "Tipo transacción")
-        worksheet.write(0, 5, "Tipo doc.")
-        worksheet.write(0, 6, "Nº documento")
-        worksheet.write(0, 7, "Posición")
-        worksheet.write(0, 8, "Referencia")
-        worksheet.write(0, 9, "NIF acreedor")
-        worksheet.write(0, 10, "Posición presupuestaria o cl. coste y denom. cl. coste")
+        summary.write_row(row + 1, 0, ["Total", None, None, None, None, total_amount_cents / 100])
 
+        workbook.close()
+
+        logger.info("Consolidated Excel file generated")
+
+        return output_file_id
+
+    def unique_worksheet_name(self, name: str, worksheet_names: set) -> str:
+        unique_name = name[:self.MAX_WORKSHEET_NAME_LENGTH]
+        suffix = 2
+
+        # Excel compares worksheet names case-insensitively
+        while unique_name.lower() in worksheet_names:
+            unique_name = f"{name[:self.MAX_WORKSHEET_NAME_LENGTH - len(str(suffix)) - 3]} ({suffix})"
+            suffix += 1
+
+        worksheet_names.add(unique_name.lower())
+
+        return unique_name
+
+    def write_report(self, worksheet, report: CumulativeExpenseReport, currency_format) -> None:
+        # Amount and date columns are formatted once for the whole column, so cells are written without a format.
+        # Every column has a known type, so the typed writers skip the type detection of worksheet.write.
+        worksheet.set_column(1, 2, 16, currency_format)
+        worksheet.set_column(11, 11, 12)
+
+        worksheet.write_row(0, 0, self.HEADER)
+
+        write_string = worksheet.write_string
+        write_number = worksheet.write_number
+        write_datetime = worksheet.write_datetime
         row = 2
 
         for budget_position in report.budget_positions:
-            worksheet.write(row, 0, budget_position.compound_name())
+            write_string(row, 0, budget_position.compound_name())
             row += 1
 
-            for transaction in [t for t in report.transactions if t.budget_position_code == budget_position.code]:
-                if transaction.excluded_from_total:
-                    worksheet.write(row, 1, transaction.amount)
-                else:
-                    worksheet.write(row, 2, transaction.amount)
-
-                worksheet.write(row, 3, budget_position.budget_chapter)
-                worksheet.write(row, 4, "Gasto")
-                worksheet.write(row, 5, transaction.document_type_code)
-                worksheet.write(row, 6, transaction.document_number)
-                worksheet.write(row, 7, transaction.document_position)
-                worksheet.write(row, 8, transaction.reference)
-                worksheet.write(row, 9, transaction.vendor_id)
-                worksheet.write(row, 10, transaction.vendor_name)
+            budget_chapter = budget_position.budget_chapter
+
+            for transaction in report.budget_position_transactions(budget_position.code):
+                write_number(row, 1 if transaction.excluded_from_total else 2, transaction.amount)
+                write_string(row, 3, budget_chapter)
+                write_string(row, 4, "Gasto")
+                write_string(row, 5, transaction.document_type_code)
+                write_string(row, 6, transaction.document_number)
+                write_datetime(row, 11, transaction.document_date)
+
+                # The document position, the reference and the whole second line are optional
+                for column, value in (
+                        (7, transaction.document_position),
+                        (8, transaction.reference),
+                        (9, transaction.vendor_id),
+                        (10, transaction.vendor_name)
+                ):
+                    if value is not None:
+                        write_string(row, column, value)
 
                 row += 1
 
             row += 1
-
-        workbook.close()
-
-        logger.info("Excel file generated")
-
-        return output_file_id
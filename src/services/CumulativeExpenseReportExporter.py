@@ -0,0 +1,66 @@
+import abc
+
+from src.models.CumulativeExpenseReport import CumulativeExpenseReport
+
+
+class CumulativeExpenseReportExporter(abc.ABC):
+
+    # Short name used to select the exporter, e.g. in "?format=csv"
+    FORMAT = None
+    MIME_TYPE = None
+    EXTENSION = None
+
+    # Number of transactions serialized before each chunk of a streamed export is yielded
+    CHUNK_ROWS = 1000
+
+    # Transaction fields of the row oriented formats, in order
+    FIELDS = [
+        "object_id",
+        "budget_position_code",
+        "budget_chapter",
+        "document_type_code",
+        "document_number",
+        "document_position",
+        "document_date",
+        "reference",
+        "vendor_id",
+        "vendor_name",
+        "description",
+        "amount_cents",
+        "excluded_from_total",
+    ]
+
+    # Whether iter_chunks yields the export while it is being produced. Otherwise the whole export is produced before
+    # its first chunk, so it is better sent from a file generated beforehand.
+    streaming = True
+
+    @abc.abstractmethod
+    def iter_chunks(self, report: CumulativeExpenseReport):
+        # Generator of the bytes of the exported report
+        pass
+
+    def export_file(self, report: CumulativeExpenseReport, new_path: str) -> None:
+        with open(new_path, "wb") as file:
+            for chunk in self.iter_chunks(report):
+                file.write(chunk)
+
+    @staticmethod
+    def iter_rows(report: CumulativeExpenseReport):
+        # Every transaction as a tuple of the values of FIELDS, grouped by budget position like in the Excel file
+        for budget_position in report.budget_positions:
+            for transaction in report.budget_position_transactions(budget_position.code):
+                yield (
+                    report.object_id,
+                    budget_position.code,
+                    budget_position.budget_chapter,
+                    transaction.document_type_code,
+                    transaction.document_number,
+                    transaction.document_position,
+                    transaction.document_date,
+                    transaction.reference,
+                    transaction.vendor_id,
+                    transaction.vendor_name,
+                    transaction.description,
+                    transaction.amount_cents,
+                    transaction.excluded_from_total,
+                )
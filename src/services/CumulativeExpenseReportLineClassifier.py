@@ -0,0 +1,85 @@
+import hashlib
+
+from src.services.ReportGrammarRegistry import report_grammar_registry
+from src.valueobjects.ReportGrammar import ReportGrammar
+
+
+class CumulativeExpenseReportLineClassifier:
+
+    BUDGET_POSITION_HEADER = 1
+    BUDGET_POSITION_TOTAL_AMOUNT = 2
+    TRANSACTION_FIRST_LINE = 3
+    TRANSACTION_SECOND_LINE = 4
+
+    # E.g.: "Posición Presupuestaria: G/2050000/2000 Mobiliario y Enseres"
+    BUDGET_POSITION_HEADER_PREFIX = "Posición Presupuestaria:"
+
+    # E.g.: "Importe total de la partida G/2050000/2000:               855,71"
+    BUDGET_POSITION_TOTAL_AMOUNT_PREFIX = "Importe total de la partida"
+
+    def __init__(self, grammar: ReportGrammar = None):
+        self.grammar = grammar or report_grammar_registry().default()
+
+        # Bound once, as they are used on every line
+        self.ignored_pattern_sub = self.grammar.ignored_pattern.sub
+        self.budget_position_header_match = self.grammar.budget_position_header_pattern.match
+        self.budget_position_total_amount_match = self.grammar.budget_position_total_amount_pattern.match
+        self.transaction_first_line_match = self.grammar.transaction_first_line_pattern.match
+        self.budget_position_header_search = self.grammar.budget_position_header_pattern.search
+        self.budget_position_total_amount_search = self.grammar.budget_position_total_amount_pattern.search
+        self.transaction_first_line_search = self.grammar.transaction_first_line_pattern.search
+        self.transaction_second_line_match = self.grammar.transaction_second_line_pattern.match
+        self.transaction_first_line_prefixes = self.grammar.transaction_first_line_prefixes
+
+    def clean(self, text: str) -> str:
+        # Of a line or a whole page
+        return self.ignored_pattern_sub('', text)
+
+    def page_fingerprint(self, page: str) -> str:
+        # Equal for two pages with the same text but for their volatile metadata, without cleaning their lines
+        return hashlib.blake2b(
+            self.grammar.volatile_metadata_pattern.sub('', page).encode("utf-8"),
+            digest_size=16
+        ).hexdigest()
+
+    def classify(self, line: str) -> tuple:
+        # Dispatch on cheap prefixes so the lines that start like their kind run a single anchored match, before
+        # searching the rest and falling back to the second line pattern, which matches almost anything and must go
+        # last.
+        if line.startswith(self.BUDGET_POSITION_HEADER_PREFIX):
+            match = self.budget_position_header_match(line)
+            if match is not None:
+                return self.BUDGET_POSITION_HEADER, match
+        elif line.startswith(self.BUDGET_POSITION_TOTAL_AMOUNT_PREFIX):
+            match = self.budget_position_total_amount_match(line)
+            if match is not None:
+                return self.BUDGET_POSITION_TOTAL_AMOUNT, match
+        elif line[:3] in self.transaction_first_line_prefixes or (line[2:3] == " " and line[:2].isalnum()):
+            # Known document types first, but any two characters and a space may start a first line, as in the
+            # pattern, e.g. a document type added after the grammar
+            match = self.transaction_first_line_match(line)
+            if match is not None:
+                return self.TRANSACTION_FIRST_LINE, match
+
+        # The patterns are not anchored, so a line may also have anything before them, e.g. indentation or text left
+        # by the cleaning. Those lines are searched in the same order, the first two kinds only if they contain the
+        # text their patterns start with.
+        if self.BUDGET_POSITION_HEADER_PREFIX in line:
+            match = self.budget_position_header_search(line)
+            if match is not None:
+                return self.BUDGET_POSITION_HEADER, match
+
+        if self.BUDGET_POSITION_TOTAL_AMOUNT_PREFIX in line:
+            match = self.budget_position_total_amount_search(line)
+            if match is not None:
+                return self.BUDGET_POSITION_TOTAL_AMOUNT, match
+
+        match = self.transaction_first_line_search(line)
+        if match is not None:
+            return self.TRANSACTION_FIRST_LINE, match
+
+        match = self.transaction_second_line_match(line)
+        if match is not None:
+            return self.TRANSACTION_SECOND_LINE, match
+
+        return None, None
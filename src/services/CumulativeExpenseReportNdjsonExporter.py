@@ -0,0 +1,39 @@
+import json
+
+from src.models.CumulativeExpenseReport import CumulativeExpenseReport
+from src.services.CumulativeExpenseReportExporter import CumulativeExpenseReportExporter
+
+
+class CumulativeExpenseReportNdjsonExporter(CumulativeExpenseReportExporter):
+
+    FORMAT = "ndjson"
+    MIME_TYPE = "application/x-ndjson"
+    EXTENSION = ".ndjson"
+
+    def iter_chunks(self, report: CumulativeExpenseReport):
+        # The first line describes the report and every following line is one of its transactions
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+        lines = [dumps({
+            "record": "report",
+            "file_name": report.file_name,
+            "object_id": report.object_id,
+            "object_name": report.object_name,
+            "date": report.date.isoformat() if report.date is not None else None,
+            "number_of_pages": report.number_of_pages,
+            "number_of_transactions": len(report.transactions),
+            "total_amount_cents": report.total_amount_cents,
+        })]
+
+        for row in self.iter_rows(report):
+            record = dict(zip(self.FIELDS, row))
+            record["document_date"] = row[6].isoformat() if row[6] is not None else None
+
+            lines.append(dumps({"record": "transaction", **record}))
+
+            if len(lines) >= self.CHUNK_ROWS:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+                lines = []
+
+        if len(lines) > 0:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
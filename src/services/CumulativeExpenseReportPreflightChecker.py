@@ -0,0 +1,211 @@
+from config.config import logger
+from src.models.CumulativeExpenseReport import CumulativeExpenseReport
+from src.services.CumulativeExpenseReportLineClassifier import CumulativeExpenseReportLineClassifier
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.PdfTextExtractor import PdfTextExtractor
+from src.services.ReportLimits import ReportLimits
+from src.utils.math import format_es_cents, parse_es_cents
+
+# Checker of each worker process, created on its first report and reused by the following ones
+g_worker_preflight_checker = None
+
+
+def run_preflight_check(file_name: str, source, validate_positions: bool) -> dict:
+    # Runs inside the worker processes, so it has to be a picklable module level function
+    global g_worker_preflight_checker
+
+    if g_worker_preflight_checker is None:
+        g_worker_preflight_checker = CumulativeExpenseReportPreflightChecker()
+
+    # check reports the errors of the report itself, these are the ones the limits raise outside of it, e.g. a
+    # MemoryError or a timeout while it was not reading the report, and any it did not expect
+    try:
+        with g_worker_preflight_checker.processor.report_limits.apply():
+            return g_worker_preflight_checker.check(file_name, source, validate_positions)
+    except ReportLimits.LimitExceededError as limit_error:
+        code, message = limit_error.code, str(limit_error)
+    except PdfTextExtractor.read_error() as read_error:
+        code, message = CumulativeExpenseReportPreflightChecker.INVALID_REPORT, \
+            f"El fichero no es un PDF válido: {read_error}"
+    except CumulativeExpenseReportPreflightChecker.FORMAT_ERRORS as format_error:
+        code, message = CumulativeExpenseReportPreflightChecker.INVALID_REPORT, \
+            f"El informe no tiene el formato esperado: {format_error!r}"
+
+    logger.warning(f"! {message}")
+
+    return CumulativeExpenseReportPreflightChecker.failed_result(file_name, code, message)
+
+
+class CumulativeExpenseReportPreflightChecker:
+    # Go/no-go check of a report before processing it. The metadata is read from the header of the first page and
+    # the total from the footer of the last one, without extracting the pages in between, and the page count of
+    # the header is compared with the pages of the PDF. Optionally, every page is then streamed to compare the
+    # total of each budget position with the running sum of its transactions, stopping at the first mismatch,
+    # without building the report.
+
+    MISSING_METADATA = "missing_metadata"
+    PAGE_COUNT_MISMATCH = "page_count_mismatch"
+    POSITION_TOTAL_MISMATCH = "position_total_mismatch"
+    REPORT_TOTAL_MISMATCH = "report_total_mismatch"
+    INVALID_REPORT = "invalid_report"
+
+    # Errors of reports whose text is not as expected, as caught by CumulativeExpenseReportProcessor
+    FORMAT_ERRORS = (AttributeError, KeyError, IndexError, TypeError, ValueError)
+
+    def __init__(self, processor: CumulativeExpenseReportProcessor = None):
+        self.processor = processor or CumulativeExpenseReportProcessor(quiet=True, incremental=False)
+
+    def new_context(self, file_name: str, source) -> CumulativeExpenseReportProcessor.ExecutionContext:
+        # The metadata is parsed by the processor itself, so both always agree
+        context = CumulativeExpenseReportProcessor.ExecutionContext(
+            file_name=file_name,
+            source=source,
+            line_classifier=self.processor.line_classifier,
+            pdf_text_extractor=self.processor.pdf_text_extractor,
+            quiet=True,
+            report_limits=self.processor.report_limits,
+            grammar_registry=self.processor.grammar_registry
+        )
+        context.report = CumulativeExpenseReport(file_name)
+
+        return context
+
+    def check(self, file_name: str, source, validate_positions: bool = False) -> dict:
+        context = self.new_context(file_name, source)
+        pdf_number_of_pages = None
+        pages = []
+        errors = []
+
+        def error(code: str, message: str) -> None:
+            logger.warning(f"! {message}")
+            errors.append({"code": code, "message": message})
+
+        try:
+            pdf_number_of_pages, pages = PdfTextExtractor.extract_pages(source, [0, -1])
+
+            if pdf_number_of_pages == 0:
+                error(self.INVALID_REPORT, "El PDF no tiene páginas")
+            else:
+                context.detect_grammar(pages[0])
+
+                for page in pages:
+                    context.extract_metadata(page)
+        except PdfTextExtractor.read_error() as read_error:
+            error(self.INVALID_REPORT, f"El fichero no es un PDF válido: {read_error}")
+        except self.FORMAT_ERRORS as format_error:
+            error(self.INVALID_REPORT, f"El informe no tiene el formato esperado: {format_error!r}")
+        except ReportLimits.LimitExceededError as limit_error:
+            error(limit_error.code, str(limit_error))
+
+        report = context.report
+
+        if not errors:
+            for pattern in context.pending_metadata_extractors:
+                error(self.MISSING_METADATA, f"No se encontraron los datos del informe: {pattern.pattern}")
+
+            if report.number_of_pages is not None and report.number_of_pages != pdf_number_of_pages:
+                error(
+                    self.PAGE_COUNT_MISMATCH,
+                    f"El informe dice tener {report.number_of_pages} páginas, pero el PDF tiene {pdf_number_of_pages}"
+                )
+
+        result = {
+            "file_name": file_name,
+            "object_id": report.object_id,
+            "object_name": report.object_name,
+            "date": report.date.isoformat() if report.date is not None else None,
+            "number_of_pages": report.number_of_pages,
+            "pdf_number_of_pages": pdf_number_of_pages,
+            "total_amount_cents": report.total_amount_cents,
+            "positions_validated": False,
+            "pages_read": len(pages),
+        }
+
+        # Validating the positions of a report whose header or footer are wrong would only repeat the same errors
+        if validate_positions and not errors:
+            result["pages_read"] = self.validate_positions(file_name, source, report.total_amount_cents, error)
+            result["positions_validated"] = not errors
+
+        result["ok"] = not errors
+        result["errors"] = errors
+
+        return result
+
+    @staticmethod
+    def failed_result(file_name: str, code: str, message: str) -> dict:
+        # Result of a check that could not even read the report, with the fields of check
+        return {
+            "file_name": file_name,
+            "object_id": None,
+            "object_name": None,
+            "date": None,
+            "number_of_pages": None,
+            "pdf_number_of_pages": None,
+            "total_amount_cents": None,
+            "positions_validated": False,
+            "pages_read": 0,
+            "ok": False,
+            "errors": [{"code": code, "message": message}],
+        }
+
+    def validate_positions(self, file_name: str, source, total_amount_cents: int, error) -> int:
+        # Returns the number of pages read before finishing or finding the first mismatch
+        context = self.new_context(file_name, source)
+        transaction_totals = {}
+        positions_total_cents = 0
+        current_code = None
+        pages_read = 0
+
+        try:
+            for page in self.processor.pdf_text_extractor.iter_pages(source):
+                pages_read += 1
+                context.report_limits.check_pages(pages_read)
+
+                if pages_read == 1:
+                    context.detect_grammar(page)
+
+                for line in context.clean_page_lines(page):
+                    line_type, match = context.line_classifier.classify(line)
+
+                    if line_type == CumulativeExpenseReportLineClassifier.TRANSACTION_FIRST_LINE:
+                        if match.group("asterisk") is None:
+                            code = match.group("budget_position_code")
+                            transaction_totals[code] = transaction_totals.get(code, 0) + \
+                                parse_es_cents(match.group("amount"))
+                    elif line_type == CumulativeExpenseReportLineClassifier.BUDGET_POSITION_HEADER:
+                        current_code = match.group("code")
+                    elif line_type == CumulativeExpenseReportLineClassifier.BUDGET_POSITION_TOTAL_AMOUNT:
+                        position_total_cents = parse_es_cents(match.group("total_amount"))
+                        transactions_cents = transaction_totals.get(current_code, 0)
+                        positions_total_cents += position_total_cents
+
+                        if transactions_cents != position_total_cents:
+                            error(
+                                self.POSITION_TOTAL_MISMATCH,
+                                f"El total de la posición {current_code} no coincide con la suma de sus movimientos "
+                                f"en la página {pages_read}: {format_es_cents(transactions_cents)} != "
+                                f"{format_es_cents(position_total_cents)}"
+                            )
+                            return pages_read
+        except PdfTextExtractor.read_error() as read_error:
+            error(self.INVALID_REPORT, f"El fichero no es un PDF válido: {read_error}")
+            return pages_read
+        except self.FORMAT_ERRORS as format_error:
+            error(
+                self.INVALID_REPORT,
+                f"El informe no tiene el formato esperado en la página {pages_read}: {format_error!r}"
+            )
+            return pages_read
+        except ReportLimits.LimitExceededError as limit_error:
+            # Also the time and memory limits, when run by run_preflight_check
+            error(limit_error.code, str(limit_error))
+            return pages_read
+
+        if positions_total_cents != total_amount_cents:
+            error(
+                self.REPORT_TOTAL_MISMATCH,
+                f"El importe total del informe no coincide con la suma de todas las posiciones: "
+                f"{format_es_cents(positions_total_cents)} != {format_es_cents(total_amount_cents)}"
+            )
+
+        return pages_read
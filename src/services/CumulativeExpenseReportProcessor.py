@@ -1,69 +1,161 @@
 import datetime
+import logging
 import re
 
-from PyPDF2 import PdfReader
 from colorama import Fore
 
-from config.config import g_ignored_strings, g_number_of_pages_regex, g_date_regex, \
-    g_months, g_total_report_amount_regex, g_budget_position_header_regex, g_budget_positions, logger, \
-    g_budget_position_total_amount_regex, g_transaction_first_line_regex, g_transaction_second_line_regex, \
-    g_report_object_regex
+from config.config import g_months, g_budget_positions, g_quiet_processing, g_incremental_processing, logger
 from src.models.CumulativeExpenseReport import CumulativeExpenseReport
 from src.models.CumulativeExpenseReportTransaction import CumulativeExpenseReportTransaction
-from src.utils.date import format_date
-from src.utils.math import parse_es_float, format_es_float
+from src.services.CumulativeExpenseReportLineClassifier import CumulativeExpenseReportLineClassifier
+from src.services.PdfTextExtractor import PdfTextExtractor
+from src.services.ReportGrammarRegistry import ReportGrammarRegistry, report_grammar_registry
+from src.services.ReportLimits import ReportLimits
+from src.services.ReportMetrics import ReportMetrics
+from src.services.ReportStateStore import ReportStateStore
+from src.utils.date import format_date, parse_es_date
+from src.utils.math import parse_es_cents, format_es_cents
 from src.valueobjects.BudgetPosition import BudgetPosition
 
 
 class CumulativeExpenseReportProcessor:
 
+    # Errors of reports that do not have the expected contents, as opposed to failures of the server
+    class InvalidReportError(Exception):
+        pass
+
+    def __init__(self, quiet: bool = g_quiet_processing, incremental: bool = g_incremental_processing):
+        self.grammar_registry = report_grammar_registry()
+        self.line_classifier = CumulativeExpenseReportLineClassifier()
+        self.pdf_text_extractor = PdfTextExtractor()
+        self.quiet = quiet
+        self.report_state_store = ReportStateStore() if incremental else None
+        self.report_limits = ReportLimits()
+
     def process_report(self,
                        file_name: str,
-                       real_path: str
+                       source,
+                       metrics: ReportMetrics = None
                        ) -> CumulativeExpenseReport:
         context = CumulativeExpenseReportProcessor.ExecutionContext(
             file_name=file_name,
-            real_path=real_path
+            source=source,
+            line_classifier=self.line_classifier,
+            pdf_text_extractor=self.pdf_text_extractor,
+            quiet=self.quiet,
+            metrics=metrics,
+            report_state_store=self.report_state_store,
+            report_limits=self.report_limits,
+            grammar_registry=self.grammar_registry
         )
 
         return context.process_report()
 
     class ExecutionContext:
 
-        def __init__(self, file_name: str, real_path: str):
+        # Messages logged once per budget position, formatted by the logging handlers only if they are emitted
+        BUDGET_POSITION_FOUND_MESSAGE = Fore.LIGHTGREEN_EX + "✓ Posición presupuestaria %s encontrada" + Fore.RESET
+        BUDGET_POSITION_TOTAL_MATCHES_MESSAGE = \
+            Fore.LIGHTGREEN_EX + "✓ El total de la posición %s coincide con la suma de sus movimientos" + Fore.RESET
+
+        def __init__(self,
+                     file_name: str,
+                     source,
+                     line_classifier: CumulativeExpenseReportLineClassifier,
+                     pdf_text_extractor: PdfTextExtractor,
+                     quiet: bool = False,
+                     metrics: ReportMetrics = None,
+                     report_state_store: ReportStateStore = None,
+                     report_limits: ReportLimits = None,
+                     grammar_registry: ReportGrammarRegistry = None
+                     ):
             self.file_name = file_name
-            self.real_path = real_path
-            self.raw_text_source = None
-            self.clean_text_source = None
+            # Path of the PDF file, its contents or a binary file object, see PdfTextExtractor.open_stream
+            self.source = source
+            # Replaced by the one of the layout of the report once its first page is read, see detect_grammar
+            self.line_classifier = line_classifier
+            self.grammar_registry = grammar_registry or report_grammar_registry()
+            self.pdf_text_extractor = pdf_text_extractor
+            # Without the success messages of every budget position, only the report level ones
+            self.quiet = quiet
+            self.metrics = metrics or ReportMetrics()
+            # Only the page limit is checked here, the rest apply to the whole process, see ReportLimits.apply
+            self.report_limits = report_limits or ReportLimits(max_pages=None)
             self.report = None
             self.current_budget_position_code = None
             self.budget_position_totals = {}
             self.current_transaction = None
+            self.metadata_logged = False
+
+            # Incremental processing: the pages of the last report of the same object that are found unchanged, in
+            # the same order and from the first one, are not classified again. Its parsed state is restored instead
+            # before the first page that changed.
+            self.report_state_store = report_state_store
+            self.previous_state = None
+            self.replaying = False
+            self.reused_transactions = 0
+            self.page_hashes = []
+            self.checkpoints = [self.checkpoint()]
+
+            # Metadata still to be found in the streamed lines, in the same order as the report header
+            self.pending_metadata_extractors = self.metadata_extractors()
+
+        def metadata_extractors(self) -> dict:
+            grammar = self.line_classifier.grammar
+
+            return {
+                grammar.report_object_pattern: self.extract_request_data,
+                grammar.number_of_pages_pattern: self.extract_number_of_pages,
+                grammar.date_pattern: self.extract_date,
+                grammar.total_report_amount_pattern: self.extract_total_amount,
+            }
+
+        def detect_grammar(self, first_page: str) -> None:
+            # Layout of the report, from the signatures of the grammars on its first page
+            grammar = self.grammar_registry.detect(first_page)
+
+            if grammar is None:
+                logger.warning(
+                    f"! No se reconoció el formato del informe, se procesa con el formato {self.line_classifier.grammar.name}"
+                )
+                return
 
-        def extract_text(self) -> None:
-            reader = PdfReader(self.real_path)
-            self.raw_text_source = "\n".join([page.extract_text() for page in reader.pages])
+            if grammar is not self.line_classifier.grammar:
+                self.line_classifier = CumulativeExpenseReportLineClassifier(grammar)
+                self.pending_metadata_extractors = self.metadata_extractors()
 
-        def extract_request_data(self) -> None:
-            match = re.search(g_report_object_regex, self.raw_text_source)
+        def extract_request_data(self, match: re.Match) -> None:
             self.report.object_id = match.group("object_id")
             self.report.object_name = match.group("object_name")
 
-        def extract_number_of_pages(self) -> None:
-            match = re.search(g_number_of_pages_regex, self.raw_text_source)
+        def extract_number_of_pages(self, match: re.Match) -> None:
             self.report.number_of_pages = int(match.group("number_of_pages"))
+            # Found in the header of the first page, so a report that is too long is rejected before extracting the rest
+            self.report_limits.check_pages(self.report.number_of_pages)
 
-        def extract_date(self) -> None:
-            match = re.search(g_date_regex, self.raw_text_source)
+        def extract_date(self, match: re.Match) -> None:
             self.report.date = datetime.date(
                 year=int(match.group("year")),
                 month=g_months[match.group("month")],
                 day=int(match.group("day"))
             )
 
-        def extract_total_amount(self) -> None:
-            match = re.search(g_total_report_amount_regex, self.raw_text_source)
-            self.report.total_amount = parse_es_float(match.group("total_amount"))
+        def extract_total_amount(self, match: re.Match) -> None:
+            self.report.total_amount_cents = parse_es_cents(match.group("total_amount"))
+
+        def extract_metadata(self, text: str) -> None:
+            for pattern, extract in list(self.pending_metadata_extractors.items()):
+                match = pattern.search(text)
+
+                if match is not None:
+                    extract(match)
+                    del self.pending_metadata_extractors[pattern]
+
+        def header_metadata_extracted(self) -> bool:
+            return all(
+                pattern is self.line_classifier.grammar.total_report_amount_pattern
+                for pattern in self.pending_metadata_extractors
+            )
 
         def log_metadata(self) -> None:
             logger.info(f"Procesando informe \"{self.file_name}\"")
@@ -71,31 +163,35 @@ class CumulativeExpenseReportProcessor:
             logger.info(f"Nombre del objeto: {self.report.object_name}")
             logger.info(f"Número de páginas: {self.report.number_of_pages}")
             logger.info(f"Fecha del informe: {format_date(self.report.date)}")
-            logger.info(f"Importe total del informe: {format_es_float(self.report.total_amount)} €")
 
-        def extract_clean_text(self) -> None:
-            text = self.raw_text_source
+            self.metadata_logged = True
 
-            for ignored_string in g_ignored_strings:
-                text = re.sub(ignored_string, '', text)
+        def validate_metadata(self) -> None:
+            for pattern in self.pending_metadata_extractors:
+                logger.error(f"No se encontraron los datos del informe: {pattern.pattern}")
+                raise CumulativeExpenseReportProcessor.InvalidReportError(f"No se encontraron los datos del informe: {pattern.pattern}")
 
-            self.clean_text_source = text
+        def clean_page_lines(self, page: str) -> list:
+            # The metadata is searched and the ignored strings removed in the text of the whole page, as some of them
+            # may span several lines, e.g. a separator broken in two lines
+            if self.pending_metadata_extractors:
+                self.extract_metadata(page)
 
-        def process_budget_position_header_line(self, line: str) -> bool:
-            match = re.search(g_budget_position_header_regex, line)
-
-            if match is None:
-                return False
+            return [line for line in self.line_classifier.clean(page).splitlines() if line.strip() != ""]
 
+        def process_budget_position_header_line(self, match: re.Match) -> None:
             code = match.group("code")
 
-            if next((bp for bp in self.report.budget_positions if bp.code == code), None) is not None:
+            if self.report.has_budget_position(code):
                 logger.error(f"La posición {code} está duplicada")
-                raise Exception(f"La posición {code} está duplicada")
+                raise CumulativeExpenseReportProcessor.InvalidReportError(f"La posición {code} está duplicada")
 
             if match.group("code") in g_budget_positions:
                 budget_position = g_budget_positions[code]
-                logger.info(Fore.LIGHTGREEN_EX + f"✓ Posición presupuestaria {code} encontrada" + Fore.RESET)
+
+                if not self.quiet:
+                    logger.info(self.BUDGET_POSITION_FOUND_MESSAGE, code)
+
                 if match.group("name") != budget_position.name:
                     logger.warning(f"! La posición {code} tiene un nombre diferente al registrado: {match.group('name')} != {budget_position.name}")
             else:
@@ -109,25 +205,11 @@ class CumulativeExpenseReportProcessor:
             self.report.add_budget_position(budget_position)
             self.current_budget_position_code = budget_position.code
 
-            return True
-
-        def process_budget_position_total_amount_line(self, line: str) -> bool:
-            match = re.search(g_budget_position_total_amount_regex, line)
-
-            if match is None:
-                return False
-
-            total_amount = parse_es_float(match.group("total_amount"))
-            self.budget_position_totals[self.current_budget_position_code] = total_amount
-
-            return True
-
-        def process_transaction_first_line(self, line: str) -> bool:
-            match = re.search(g_transaction_first_line_regex, line)
-
-            if match is None:
-                return False
+        def process_budget_position_total_amount_line(self, match: re.Match) -> None:
+            total_amount_cents = parse_es_cents(match.group("total_amount"))
+            self.budget_position_totals[self.current_budget_position_code] = total_amount_cents
 
+        def process_transaction_first_line(self, match: re.Match) -> None:
             if self.current_transaction is not None:
                 self.report.add_transaction(self.current_transaction)
 
@@ -135,92 +217,237 @@ class CumulativeExpenseReportProcessor:
                 document_type_code=match.group("document_type"),
                 document_number=match.group("document_number"),
                 document_position=match.group("document_position"),
-                document_date=match.group("document_date"),
+                document_date=parse_es_date(match.group("document_date")),
                 budget_position_code=match.group("budget_position_code"),
                 description=match.group("description"),
-                amount=parse_es_float(match.group("amount")),
+                amount_cents=parse_es_cents(match.group("amount")),
                 excluded_from_total=False if match.group("asterisk") is None else True
             )
 
-            return True
-
-        def process_transaction_second_line(self, line: str) -> bool:
-            match = re.search(g_transaction_second_line_regex, line)
-
-            if match is None:
-                return False
-
+        def process_transaction_second_line(self, match: re.Match) -> None:
             self.current_transaction.complete_with_report_second_line(
                 reference=match.group("reference"),
                 vendor_id=match.group("vendor_id"),
                 vendor_name=match.group("vendor_name")
             )
 
-            return True
-
         def validate_total_report_amount_with_budget_position_totals(self) -> None:
-            total_amount = 0
-
-            for budget_position_total in self.budget_position_totals.values():
-                total_amount += budget_position_total
+            total_amount_cents = sum(self.budget_position_totals.values())
 
-            if abs(total_amount - self.report.total_amount) > 0.01:
-                logger.error(f"El importe total del informe no coincide con la suma de todas las posiciones: {format_es_float(total_amount)} != {format_es_float(self.report.total_amount)}")
-                raise Exception(f"El importe total del informe no coincide con la suma de todas las posiciones: {format_es_float(total_amount)} != {format_es_float(self.report.total_amount)}")
+            if total_amount_cents != self.report.total_amount_cents:
+                logger.error(f"El importe total del informe no coincide con la suma de todas las posiciones: {format_es_cents(total_amount_cents)} != {format_es_cents(self.report.total_amount_cents)}")
+                raise CumulativeExpenseReportProcessor.InvalidReportError(f"El importe total del informe no coincide con la suma de todas las posiciones: {format_es_cents(total_amount_cents)} != {format_es_cents(self.report.total_amount_cents)}")
             else:
                 logger.info(Fore.LIGHTGREEN_EX + f"✓ El importe total del informe coincide con la suma de todas las posiciones" + Fore.RESET)
 
         def validate_budget_position_totals_with_per_position_transactions(self) -> None:
+            log_matches = not self.quiet and logger.isEnabledFor(logging.INFO)
+
             for budget_position_code, total in self.budget_position_totals.items():
-                total_amount = 0
+                total_amount_cents = self.report.budget_position_transactions_total_cents(budget_position_code)
+
+                if total_amount_cents != total:
+                    logger.error(f"El total de la posición {budget_position_code} no coincide con la suma de sus movimientos: {format_es_cents(total_amount_cents)} != {format_es_cents(total)}")
+                    raise CumulativeExpenseReportProcessor.InvalidReportError(f"El total de la posición {budget_position_code} no coincide con la suma de sus movimientos: {format_es_cents(total_amount_cents)} != {format_es_cents(total)}")
+                elif log_matches:
+                    logger.info(self.BUDGET_POSITION_TOTAL_MATCHES_MESSAGE, budget_position_code)
+
+        def process_clean_lines(self, lines: list) -> None:
+            classify = self.line_classifier.classify
+
+            for line in lines:
+                line_type, match = classify(line)
+
+                if line_type == CumulativeExpenseReportLineClassifier.TRANSACTION_SECOND_LINE:
+                    self.process_transaction_second_line(match)
+                elif line_type == CumulativeExpenseReportLineClassifier.TRANSACTION_FIRST_LINE:
+                    self.process_transaction_first_line(match)
+                elif line_type == CumulativeExpenseReportLineClassifier.BUDGET_POSITION_HEADER:
+                    self.process_budget_position_header_line(match)
+                elif line_type == CumulativeExpenseReportLineClassifier.BUDGET_POSITION_TOTAL_AMOUNT:
+                    self.process_budget_position_total_amount_line(match)
+
+        def checkpoint(self) -> list:
+            # State of the parser between two pages: number of transactions, budget positions and budget position
+            # totals found, current budget position and the fields of the transaction not yet added, if any
+            transaction = self.current_transaction
+
+            if transaction is not None:
+                transaction = [getattr(transaction, field) for field in CumulativeExpenseReportTransaction.__slots__]
+                date_index = CumulativeExpenseReportTransaction.__slots__.index("document_date")
+
+                if transaction[date_index] is not None:
+                    transaction[date_index] = transaction[date_index].isoformat()
+
+            return [
+                len(self.report.transactions) if self.report is not None else 0,
+                len(self.report.budget_positions) if self.report is not None else 0,
+                len(self.budget_position_totals),
+                self.current_budget_position_code,
+                transaction,
+            ]
+
+        def restore(self, checkpoint: list) -> None:
+            # Rebuilds the parser state of the checkpoint from the previous report. Nothing has been classified yet,
+            # so the report only has the metadata of the header.
+            number_of_transactions, number_of_budget_positions, number_of_totals, budget_position_code, transaction = \
+                checkpoint
+            previous_report = self.previous_state.report
+
+            for budget_position in previous_report.budget_positions[:number_of_budget_positions]:
+                self.report.add_budget_position(budget_position)
+
+            self.report.set_transactions(previous_report.transactions.head(number_of_transactions))
+
+            self.budget_position_totals = dict(self.previous_state.budget_position_totals[:number_of_totals])
+            self.current_budget_position_code = budget_position_code
+            self.current_transaction = None
 
-                for transaction in self.report.transactions:
-                    if transaction.budget_position_code == budget_position_code and not transaction.excluded_from_total:
-                        total_amount += transaction.amount
+            if transaction is not None:
+                fields = dict(zip(CumulativeExpenseReportTransaction.__slots__, transaction))
 
-                if abs(total_amount - total) > 0.01:
-                    logger.error(f"El total de la posición {budget_position_code} no coincide con la suma de sus movimientos: {format_es_float(total_amount)} != {format_es_float(total)}")
-                    raise Exception(f"El total de la posición {budget_position_code} no coincide con la suma de sus movimientos: {format_es_float(total_amount)} != {format_es_float(total)}")
-                else:
-                    logger.info(
-                        Fore.LIGHTGREEN_EX + f"✓ El total de la posición {budget_position_code} coincide con la suma de sus movimientos" + Fore.RESET)
+                if fields["document_date"] is not None:
+                    fields["document_date"] = datetime.date.fromisoformat(fields["document_date"])
 
-        def process_clean_text(self) -> None:
-            for line in self.clean_text_source.splitlines():
-                if line.strip() == "":
-                    continue
+                self.current_transaction = CumulativeExpenseReportTransaction(**fields)
 
-                if self.process_budget_position_header_line(line):
-                    continue
+            self.replaying = False
+            self.reused_transactions = number_of_transactions
+            self.metrics.reused_pages = len(self.page_hashes)
 
-                if self.process_budget_position_total_amount_line(line):
-                    continue
+            logger.info(
+                "Reutilizadas %d páginas del informe anterior del objeto %s, del %s",
+                len(self.page_hashes), self.report.object_id, format_date(previous_report.date)
+            )
 
-                if self.process_transaction_first_line(line):
-                    continue
+        def load_previous_state(self) -> None:
+            self.previous_state = self.report_state_store.load(self.report.object_id)
+            self.replaying = self.previous_state is not None
 
-                if self.process_transaction_second_line(line):
-                    continue
+        def replay_page(self, page: str, page_hash: str) -> bool:
+            # Whether the page is the same as in the previous report, in which case it is not parsed again
+            index = len(self.page_hashes)
+            previous_state = self.previous_state
 
-            self.report.add_transaction(self.current_transaction)
+            if index < len(previous_state.page_hashes) and previous_state.page_hashes[index] == page_hash:
+                # Metadata of the footer, which is not part of the hash, searched for in the whole page at once
+                if self.pending_metadata_extractors:
+                    self.extract_metadata(page)
 
-        def process_report(self) -> CumulativeExpenseReport:
-            self.extract_text()
+                self.page_hashes.append(page_hash)
+                self.checkpoints.append(previous_state.checkpoints[index + 1])
+                return True
 
+            self.restore(previous_state.checkpoints[index])
+
+            return False
+
+        def process_page(self, page: str) -> None:
+            self.metrics.pages += 1
+            # Also counted, as the page count of the header could be wrong
+            self.report_limits.check_pages(self.metrics.pages)
+            page_hash = None
+
+            if self.metrics.pages == 1:
+                self.detect_grammar(page)
+
+            if self.report_state_store is not None:
+                page_hash = self.line_classifier.page_fingerprint(page)
+
+                if self.replaying and self.replay_page(page, page_hash):
+                    return
+
+            with self.metrics.stage(ReportMetrics.CLEAN):
+                lines = self.clean_page_lines(page)
+
+            self.metrics.lines += len(lines)
+
+            # The header is repeated on every page, so its metadata is known once the first page has been read
+            if not self.metadata_logged and self.header_metadata_extracted():
+                self.log_metadata()
+
+                # The previous report of the object can only be replayed from the first page
+                if self.report_state_store is not None and len(self.page_hashes) == 0:
+                    self.load_previous_state()
+
+                    if self.replaying and self.replay_page(page, page_hash):
+                        return
+
+            with self.metrics.stage(ReportMetrics.CLASSIFY):
+                self.process_clean_lines(lines)
+
+            if self.report_state_store is not None:
+                self.page_hashes.append(page_hash)
+                self.checkpoints.append(self.checkpoint())
+
+        def save_state(self) -> None:
+            # A report that cannot be saved is still a valid report, it will just be parsed whole next time
+            try:
+                self.report_state_store.save(
+                    ReportStateStore.State(
+                        report=self.report,
+                        page_hashes=self.page_hashes,
+                        checkpoints=self.checkpoints,
+                        budget_position_totals=list(self.budget_position_totals.items())
+                    ),
+                    previous=self.previous_state,
+                    common_rows=self.reused_transactions
+                )
+            except OSError as error:
+                logger.warning(f"! No se pudo guardar el estado del informe: {error}")
+
+        def iter_pages(self):
+            # The text of each page is extracted when the next page is requested, so that is what gets timed
+            pages = iter(self.pdf_text_extractor.iter_pages(self.source))
+
+            while True:
+                with self.metrics.stage(ReportMetrics.EXTRACT):
+                    page = next(pages, None)
+
+                if page is None:
+                    return
+
+                yield page
+
+        def process_report(self) -> CumulativeExpenseReport:
             self.report = CumulativeExpenseReport(self.file_name)
 
-            self.extract_request_data()
-            self.extract_number_of_pages()
-            self.extract_date()
-            self.extract_total_amount()
+            try:
+                for page in self.iter_pages():
+                    self.process_page(page)
+            except (AttributeError, KeyError, IndexError, TypeError, ValueError) as error:
+                # Lines that match the patterns but not in the expected order or with unexpected values, e.g. the
+                # second line of a transaction without the first one, or an unknown month
+                logger.error(f"El informe no tiene el formato esperado en la página {self.metrics.pages}: {error!r}")
+                raise CumulativeExpenseReportProcessor.InvalidReportError(
+                    f"El informe no tiene el formato esperado en la página {self.metrics.pages}"
+                ) from error
+            except PdfTextExtractor.read_error() as error:
+                logger.error(f"El fichero no es un PDF válido: {error}")
+                raise CumulativeExpenseReportProcessor.InvalidReportError(
+                    f"El fichero no es un PDF válido: {error}"
+                ) from error
+
+            # Every page was the same as in the previous report, which had the same pages or more
+            if self.replaying:
+                self.restore(self.previous_state.checkpoints[len(self.page_hashes)])
+
+            if self.current_transaction is not None:
+                self.report.add_transaction(self.current_transaction)
+
+            self.metrics.transactions = len(self.report.transactions)
+
+            with self.metrics.stage(ReportMetrics.VALIDATE):
+                self.validate_metadata()
 
-            self.log_metadata()
+                logger.info(f"Importe total del informe: {format_es_cents(self.report.total_amount_cents)} €")
 
-            self.extract_clean_text()
-            self.process_clean_text()
+                self.validate_total_report_amount_with_budget_position_totals()
+                self.validate_budget_position_totals_with_per_position_transactions()
 
-            self.validate_total_report_amount_with_budget_position_totals()
-            self.validate_budget_position_totals_with_per_position_transactions()
+            if self.report_state_store is not None:
+                with self.metrics.stage(ReportMetrics.EXPORT):
+                    self.save_state()
 
             logger.info(Fore.LIGHTGREEN_EX + f"✓ Informe procesado correctamente" + Fore.RESET)
 
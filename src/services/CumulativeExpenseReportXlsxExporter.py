@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+from src.models.CumulativeExpenseReport import CumulativeExpenseReport
+from src.services.CumulativeExpenseReportExcelGenerator import CumulativeExpenseReportExcelGenerator
+from src.services.CumulativeExpenseReportExporter import CumulativeExpenseReportExporter
+
+
+class CumulativeExpenseReportXlsxExporter(CumulativeExpenseReportExporter):
+
+    FORMAT = "xlsx"
+    MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    EXTENSION = ".xlsx"
+
+    # An xlsx file is a zip archive, which is only complete once the workbook is closed
+    streaming = False
+
+    # Bytes of each chunk of iter_chunks
+    CHUNK_BYTES = 64 * 1024
+
+    def __init__(self, excel_generator: CumulativeExpenseReportExcelGenerator = None):
+        self.excel_generator = excel_generator or CumulativeExpenseReportExcelGenerator()
+
+    def iter_chunks(self, report: CumulativeExpenseReport):
+        # The workbook is generated in a temporary file first, see streaming
+        descriptor, path = tempfile.mkstemp(suffix=self.EXTENSION)
+        os.close(descriptor)
+
+        try:
+            self.excel_generator.generate_file(report, path)
+
+            with open(path, "rb") as file:
+                yield from iter(lambda: file.read(self.CHUNK_BYTES), b"")
+        finally:
+            os.remove(path)
+
+    def export_file(self, report: CumulativeExpenseReport, new_path: str) -> None:
+        self.excel_generator.generate_file(report, new_path)
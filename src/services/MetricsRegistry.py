@@ -0,0 +1,172 @@
+import threading
+
+
+class MetricsRegistry:
+    # Metrics of the processed reports in the Prometheus text exposition format. Reports are processed in worker
+    # processes, which return their ReportMetrics as a dictionary to be observed here, in the web server process.
+
+    SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+    COUNT_BUCKETS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 100000, 1000000]
+    BYTES_BUCKETS = [2 ** exponent for exponent in range(24, 34)]
+
+    class Counter:
+
+        def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+            self.name = name
+            self.documentation = documentation
+            self.label_names = label_names
+            self.values = {}
+
+        def inc(self, label_values: tuple = (), amount: float = 1) -> None:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+        def render(self) -> list:
+            lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+
+            for label_values, value in self.values.items():
+                lines.append(f"{self.name}{MetricsRegistry.labels(self.label_names, label_values)} {value}")
+
+            return lines
+
+    class Histogram:
+
+        def __init__(self, name: str, documentation: str, buckets: list, label_names: tuple = ()):
+            self.name = name
+            self.documentation = documentation
+            self.buckets = buckets
+            self.label_names = label_names
+            # Label values -> [count per bucket, without the cumulative sums of the exposition format, sum, count]
+            self.values = {}
+
+        def observe(self, value: float, label_values: tuple = ()) -> None:
+            histogram = self.values.get(label_values)
+
+            if histogram is None:
+                histogram = self.values[label_values] = [[0] * len(self.buckets), 0, 0]
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][index] += 1
+                    break
+
+            histogram[1] += value
+            histogram[2] += 1
+
+        def render(self) -> list:
+            lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+
+            for label_values, (bucket_counts, total, count) in self.values.items():
+                cumulative = 0
+
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    labels = MetricsRegistry.labels(self.label_names + ("le",), label_values + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+                labels = MetricsRegistry.labels(self.label_names + ("le",), label_values + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+
+                labels = MetricsRegistry.labels(self.label_names, label_values)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+
+            return lines
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        self.reports = MetricsRegistry.Counter(
+            "dafi_reports_total", "Reports processed, by result", ("status",)
+        )
+        self.stage_wall_seconds = MetricsRegistry.Histogram(
+            "dafi_report_stage_wall_seconds", "Wall time of each processing stage of a report",
+            self.SECONDS_BUCKETS, ("stage",)
+        )
+        self.stage_cpu_seconds = MetricsRegistry.Histogram(
+            "dafi_report_stage_cpu_seconds", "CPU time of each processing stage of a report",
+            self.SECONDS_BUCKETS, ("stage",)
+        )
+        self.stage_peak_memory_bytes = MetricsRegistry.Histogram(
+            "dafi_report_stage_peak_memory_bytes",
+            "Peak resident memory of the worker during its report, at the end of each stage",
+            self.BYTES_BUCKETS, ("stage",)
+        )
+        self.pages = MetricsRegistry.Histogram(
+            "dafi_report_pages", "Pages per processed report", self.COUNT_BUCKETS
+        )
+        self.lines = MetricsRegistry.Histogram(
+            "dafi_report_lines", "Text lines per processed report, once cleaned", self.COUNT_BUCKETS
+        )
+        self.reused_pages = MetricsRegistry.Histogram(
+            "dafi_report_reused_pages", "Pages per report reused from the last report of the same object",
+            self.COUNT_BUCKETS
+        )
+        self.transactions = MetricsRegistry.Histogram(
+            "dafi_report_transactions", "Transactions per processed report", self.COUNT_BUCKETS
+        )
+        self.peak_memory_bytes = MetricsRegistry.Histogram(
+            "dafi_report_peak_memory_bytes", "Peak resident memory of the worker while it processed a report",
+            self.BYTES_BUCKETS
+        )
+
+        self.metrics = [
+            self.reports,
+            self.stage_wall_seconds,
+            self.stage_cpu_seconds,
+            self.stage_peak_memory_bytes,
+            self.pages,
+            self.lines,
+            self.reused_pages,
+            self.transactions,
+            self.peak_memory_bytes,
+        ]
+
+    @staticmethod
+    def labels(label_names: tuple, label_values: tuple) -> str:
+        if len(label_names) == 0:
+            return ""
+
+        pairs = (f"{name}=\"{MetricsRegistry.escape(str(value))}\"" for name, value in zip(label_names, label_values))
+
+        return "{" + ",".join(pairs) + "}"
+
+    @staticmethod
+    def escape(label_value: str) -> str:
+        return label_value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+    def observe_report(self, metrics: dict, failed: bool = False) -> None:
+        # metrics is ReportMetrics.to_dict() of the report, None if the job did not get to measure it
+        with self.lock:
+            self.reports.inc(("failed" if failed else "done",))
+
+            if metrics is None:
+                return
+
+            for stage, values in metrics["stages"].items():
+                self.stage_wall_seconds.observe(values["wall_seconds"], (stage,))
+                self.stage_cpu_seconds.observe(values["cpu_seconds"], (stage,))
+
+                if values["peak_memory_bytes"] is not None:
+                    self.stage_peak_memory_bytes.observe(values["peak_memory_bytes"], (stage,))
+
+            if failed:
+                return
+
+            self.pages.observe(metrics["pages"])
+            self.lines.observe(metrics["lines"])
+            self.reused_pages.observe(metrics["reused_pages"])
+            self.transactions.observe(metrics["transactions"])
+
+            if metrics["peak_memory_bytes"] is not None:
+                self.peak_memory_bytes.observe(metrics["peak_memory_bytes"])
+
+    def render(self, gauges: dict = None) -> str:
+        # gauges are extra current values, e.g. {"dafi_jobs_pending": ("Queued or running jobs", 3)}
+        with self.lock:
+            lines = [line for metric in self.metrics for line in metric.render()]
+
+        for name, (documentation, value) in (gauges or {}).items():
+            lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {value}"])
+
+        return "\n".join(lines) + "\n"
+
@@ -0,0 +1,155 @@
+import contextlib
+import io
+import mmap
+import os
+import time
+from collections import deque
+
+from config.config import g_pdf_extraction_processes, g_pdf_extraction_chunk_size, g_pdf_mmap, logger
+
+
+# Reader opened once by each worker process of the pool, and the stream it reads, kept open for the whole process
+g_worker_reader = None
+g_worker_stream = None
+
+
+def open_worker_reader(source) -> None:
+    global g_worker_reader, g_worker_stream
+    g_worker_stream = PdfTextExtractor.open_stream(source)
+    g_worker_reader = PdfTextExtractor.backend().PdfReader(g_worker_stream.__enter__())
+
+
+def extract_worker_pages_text(first_page: int, last_page: int) -> list:
+    # Runs inside the worker processes, so it has to be a picklable module level function
+    return extract_pages_text(g_worker_reader, first_page, last_page)
+
+
+def extract_pages_text(reader, first_page: int, last_page: int) -> list:
+    pages = []
+
+    for index in range(first_page, last_page):
+        start = time.perf_counter()
+        text = reader.pages[index].extract_text()
+        pages.append((text, time.perf_counter() - start))
+
+    return pages
+
+
+class PdfTextExtractor:
+
+    def __init__(self,
+                 processes: int = g_pdf_extraction_processes,
+                 chunk_size: int = g_pdf_extraction_chunk_size
+                 ):
+        self.processes = processes
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def backend():
+        # PyPDF2 takes longer to import than the rest of the processor, so it is only imported once a PDF is read
+        import PyPDF2
+        import PyPDF2.errors
+
+        return PyPDF2
+
+    @staticmethod
+    def read_error() -> type:
+        # Error of the files that are not valid PDFs. As the expression of an except clause, it is only evaluated once
+        # an exception is raised.
+        return PdfTextExtractor.backend().errors.PdfReadError
+
+    @staticmethod
+    @contextlib.contextmanager
+    def open_stream(source):
+        # source is the path of a PDF file, its contents (bytes, bytearray, memoryview or mmap) or a binary file
+        # object. PdfReader reads a whole file into memory when given its path, so files are memory mapped instead
+        # and only the parts of them the reader asks for are read.
+        if isinstance(source, str):
+            if not g_pdf_mmap or os.path.getsize(source) == 0:
+                # Empty files cannot be mapped, the reader raises its own error for them
+                yield source
+                return
+
+            with open(source, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+        elif isinstance(source, mmap.mmap):
+            source.seek(0)
+            yield source
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            # Bytes are shared by the stream instead of copied, other contents are copied once
+            yield io.BytesIO(source)
+        else:
+            yield source
+
+    @staticmethod
+    def worker_source(source):
+        # What is sent to each worker process to open its own reader: paths as they are, anything else as bytes
+        if isinstance(source, str):
+            return source
+
+        if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+            return bytes(source) if not isinstance(source, bytes) else source
+
+        source.seek(0)
+
+        return source.read()
+
+    def iter_pages(self, source):
+        with PdfTextExtractor.open_stream(source) as stream:
+            reader = PdfTextExtractor.backend().PdfReader(stream)
+            number_of_pages = len(reader.pages)
+
+            if self.processes <= 1 or number_of_pages <= self.chunk_size:
+                for index in range(number_of_pages):
+                    yield from self.log_pages(index, extract_pages_text(reader, index, index + 1))
+
+                return
+
+        yield from self.iter_pages_in_parallel(source, number_of_pages)
+
+    @staticmethod
+    def extract_pages(source, indexes: list) -> tuple:
+        # (number of pages of the PDF, text of the pages with those indexes), without extracting the rest. Negative
+        # indexes count from the end. Pages that do not exist are left out.
+        with PdfTextExtractor.open_stream(source) as stream:
+            reader = PdfTextExtractor.backend().PdfReader(stream)
+            number_of_pages = len(reader.pages)
+            texts = []
+
+            for index in indexes:
+                if -number_of_pages <= index < number_of_pages:
+                    texts.append(reader.pages[index].extract_text())
+
+            return number_of_pages, texts
+
+    def iter_pages_in_parallel(self, source, number_of_pages: int):
+        from concurrent.futures import ProcessPoolExecutor
+
+        first_pages = range(0, number_of_pages, self.chunk_size)
+
+        with ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=open_worker_reader,
+                initargs=(PdfTextExtractor.worker_source(source),)
+        ) as executor:
+            # Only a bounded window of chunks is in flight, and they are consumed in submission order so the
+            # pages are yielded in document order without buffering the whole document
+            pending = deque()
+
+            for first_page in first_pages:
+                last_page = min(first_page + self.chunk_size, number_of_pages)
+                pending.append((first_page, executor.submit(extract_worker_pages_text, first_page, last_page)))
+
+                if len(pending) >= 2 * self.processes:
+                    index, future = pending.popleft()
+                    yield from self.log_pages(index, future.result())
+
+            while pending:
+                index, future = pending.popleft()
+                yield from self.log_pages(index, future.result())
+
+    @staticmethod
+    def log_pages(first_index: int, pages: list):
+        for number, (text, seconds) in enumerate(pages, start=first_index + 1):
+            logger.debug("Página %d extraída en %.1f ms", number, seconds * 1000)
+            yield text
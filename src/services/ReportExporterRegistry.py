@@ -0,0 +1,45 @@
+from src.services.CumulativeExpenseReportColumnarExporter import CumulativeExpenseReportColumnarExporter
+from src.services.CumulativeExpenseReportCsvExporter import CumulativeExpenseReportCsvExporter
+from src.services.CumulativeExpenseReportExporter import CumulativeExpenseReportExporter
+from src.services.CumulativeExpenseReportNdjsonExporter import CumulativeExpenseReportNdjsonExporter
+from src.services.CumulativeExpenseReportXlsxExporter import CumulativeExpenseReportXlsxExporter
+
+
+class ReportExporterRegistry:
+
+    def __init__(self, exporters: list = None):
+        # The first exporter is the default one
+        self.exporters = {}
+
+        for exporter in exporters or [
+            CumulativeExpenseReportXlsxExporter(),
+            CumulativeExpenseReportCsvExporter(),
+            CumulativeExpenseReportNdjsonExporter(),
+            CumulativeExpenseReportColumnarExporter(),
+        ]:
+            self.register(exporter)
+
+    def register(self, exporter: CumulativeExpenseReportExporter) -> None:
+        self.exporters[exporter.FORMAT] = exporter
+
+    def formats(self) -> list:
+        return list(self.exporters)
+
+    def get(self, export_format: str):
+        return self.exporters.get(export_format.lower())
+
+    def default(self) -> CumulativeExpenseReportExporter:
+        return next(iter(self.exporters.values()))
+
+    def negotiate(self, accept_mimetypes):
+        # Best exporter for a werkzeug Accept header, None if it accepts none of them. As "*/*" matches the first
+        # MIME type, requests that do not ask for a particular format get the default one.
+        if not accept_mimetypes:
+            return self.default()
+
+        mime_type = accept_mimetypes.best_match([exporter.MIME_TYPE for exporter in self.exporters.values()])
+
+        if mime_type is None:
+            return None
+
+        return next(exporter for exporter in self.exporters.values() if exporter.MIME_TYPE == mime_type)
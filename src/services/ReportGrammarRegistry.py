@@ -0,0 +1,52 @@
+import hashlib
+
+from config.config import g_report_layouts
+from src.valueobjects.ReportGrammar import ReportGrammar
+
+
+class ReportGrammarRegistry:
+
+    def __init__(self, layouts: dict = None):
+        # The first grammar is the default one
+        self.grammars = {}
+
+        for name, layout in (layouts or g_report_layouts).items():
+            self.register(ReportGrammar(name, **layout))
+
+        # Changes whenever any grammar does, as it is not known which one parses a report until it is read
+        self.version = hashlib.sha256(
+            "\n".join(grammar.version for grammar in self.grammars.values()).encode("utf-8")
+        ).hexdigest()[:16]
+
+    def register(self, grammar: ReportGrammar) -> None:
+        self.grammars[grammar.name] = grammar
+
+    def names(self) -> list:
+        return list(self.grammars)
+
+    def get(self, name: str):
+        return self.grammars.get(name)
+
+    def default(self) -> ReportGrammar:
+        return next(iter(self.grammars.values()))
+
+    def detect(self, first_page: str):
+        # Grammar of the first layout whose signature is in the first page of a report, None if none is
+        return next(
+            (grammar for grammar in self.grammars.values() if grammar.signature_pattern.search(first_page)),
+            None
+        )
+
+
+# Grammars of g_report_layouts, compiled on first use instead of on import and then shared by every report of the
+# process
+g_report_grammar_registry = None
+
+
+def report_grammar_registry() -> ReportGrammarRegistry:
+    global g_report_grammar_registry
+
+    if g_report_grammar_registry is None:
+        g_report_grammar_registry = ReportGrammarRegistry()
+
+    return g_report_grammar_registry
@@ -0,0 +1,579 @@
+import json
+import os
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config.config import g_job_workers, g_job_max_pending, g_job_history_size, g_job_status_path, \
+    g_job_status_ttl_seconds, g_artifact_cleanup_interval_seconds, g_job_kill_grace_seconds, \
+    g_report_max_wall_seconds, g_transaction_store_enabled, logger
+from src.log.CapturingLogger import CapturingLogger
+from src.services.CumulativeExpenseReportBatchProcessor import CumulativeExpenseReportBatchProcessor
+from src.services.CumulativeExpenseReportColumnarExporter import CumulativeExpenseReportColumnarExporter
+from src.services.CumulativeExpenseReportExcelGenerator import CumulativeExpenseReportExcelGenerator
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.MetricsRegistry import MetricsRegistry
+from src.services.PdfTextExtractor import PdfTextExtractor
+from src.services.ReportLimits import ReportLimits
+from src.services.ReportMetrics import ReportMetrics
+from src.services.TransactionStore import TransactionStore
+
+# Services of each worker process, created on its first job and reused by the following ones
+g_worker_processor = None
+g_worker_excel_generator = None
+g_worker_columnar_exporter = None
+g_worker_transaction_store = None
+
+
+def preload_worker_services(processor: CumulativeExpenseReportProcessor,
+                            excel_generator: CumulativeExpenseReportExcelGenerator) -> None:
+    # Called before the worker processes fork, which then start with these services instead of creating their own
+    global g_worker_processor, g_worker_excel_generator, g_worker_columnar_exporter
+
+    g_worker_processor = processor
+    g_worker_excel_generator = excel_generator
+    g_worker_columnar_exporter = CumulativeExpenseReportColumnarExporter()
+
+    # The PDF and Excel libraries are imported on first use, so they are imported here too for every worker process
+    # to start with them instead of importing them on its first report
+    PdfTextExtractor.backend()
+    CumulativeExpenseReportExcelGenerator.backend()
+
+
+def delete_source(source) -> None:
+    # Sources kept in memory have no file
+    if not isinstance(source, str):
+        return
+
+    try:
+        os.remove(source)
+    except FileNotFoundError:
+        pass
+
+
+def store_transactions(report) -> None:
+    global g_worker_transaction_store
+
+    if not g_transaction_store_enabled or report is None:
+        return
+
+    if g_worker_transaction_store is None:
+        g_worker_transaction_store = TransactionStore()
+
+    g_worker_transaction_store.insert_report(report)
+
+
+def error_code(error: Exception) -> str:
+    # Kind of failure of a job, for clients to tell a report to fix from a report too big or a server error
+    if isinstance(error, ReportLimits.LimitExceededError):
+        return error.code
+
+    if isinstance(error, CumulativeExpenseReportProcessor.InvalidReportError):
+        return ReportJobQueue.INVALID_REPORT
+
+    return ReportJobQueue.ERROR
+
+
+def run_report_job(file_name: str, source) -> dict:
+    # source is the path of the uploaded PDF or, for small uploads, its contents
+    # Runs inside the worker processes, so it has to be a picklable module level function
+    global g_worker_processor, g_worker_excel_generator, g_worker_columnar_exporter
+
+    if g_worker_processor is None:
+        g_worker_processor = CumulativeExpenseReportProcessor()
+        g_worker_excel_generator = CumulativeExpenseReportExcelGenerator()
+        g_worker_columnar_exporter = CumulativeExpenseReportColumnarExporter()
+
+    metrics = ReportMetrics()
+
+    def run():
+        try:
+            with g_worker_processor.report_limits.apply():
+                try:
+                    report = g_worker_processor.process_report(file_name=file_name, source=source, metrics=metrics)
+                finally:
+                    # The source is not needed any more once parsed, whether it could be parsed or not
+                    delete_source(source)
+
+                with metrics.stage(ReportMetrics.GENERATE):
+                    output_file_id = g_worker_excel_generator.generate(report).__str__()
+
+                with metrics.stage(ReportMetrics.EXPORT):
+                    g_worker_columnar_exporter.export_file(
+                        report,
+                        CumulativeExpenseReportColumnarExporter.snapshot_path(output_file_id)
+                    )
+                    store_transactions(report)
+
+            return output_file_id, None, None
+        except Exception as error:
+            logger.error(f"Error al procesar el informe: {error}")
+            return None, str(error), error_code(error)
+
+    (output_file_id, error, code), logs = CapturingLogger.capture_html_logs(run)
+    metrics.finish()
+
+    return {
+        "id": output_file_id,
+        "logs": logs,
+        "error": error,
+        "error_code": code,
+        "metrics": metrics.to_dict()
+    }
+
+
+def run_batch_report_job(sources: list) -> dict:
+    # Runs inside the worker processes, so it has to be a picklable module level function
+    global g_worker_excel_generator
+
+    if g_worker_excel_generator is None:
+        g_worker_excel_generator = CumulativeExpenseReportExcelGenerator()
+
+    reports_logs = []
+
+    def results():
+        for file_name, report, logs, error in CumulativeExpenseReportBatchProcessor().process_reports(sources):
+            reports_logs.append(logs)
+            store_transactions(report)
+            yield file_name, report, error
+
+    def run():
+        try:
+            return g_worker_excel_generator.generate_batch(results()).__str__(), None
+        except Exception as error:
+            logger.error(f"Error al generar el fichero consolidado: {error}")
+            return None, str(error)
+        finally:
+            for _, real_path in sources:
+                delete_source(real_path)
+
+    (output_file_id, error), logs = CapturingLogger.capture_html_logs(run)
+
+    return {
+        "id": output_file_id,
+        "logs": "".join(reports_logs) + logs,
+        "error": error,
+        "error_code": ReportJobQueue.ERROR if error is not None else None
+    }
+
+
+class ReportJobQueue:
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    # Error codes of failed jobs besides those of ReportLimits
+    INVALID_REPORT = "invalid_report"
+    ERROR = "error"
+    # Codes of jobs that took too long, the rest of the ReportLimits ones are counted as rejections
+    TIMEOUT_CODES = [ReportLimits.CPU_TIME, ReportLimits.TIMEOUT]
+
+    class QueueFullError(Exception):
+        pass
+
+    def __init__(self,
+                 workers: int = g_job_workers,
+                 max_pending: int = g_job_max_pending,
+                 history_size: int = g_job_history_size,
+                 metrics_registry: MetricsRegistry = None,
+                 status_path: str = g_job_status_path,
+                 status_ttl_seconds: float = g_job_status_ttl_seconds,
+                 status_cleanup_interval_seconds: float = g_artifact_cleanup_interval_seconds,
+                 max_wall_seconds: float = g_report_max_wall_seconds,
+                 kill_grace_seconds: float = g_job_kill_grace_seconds
+                 ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.history_size = history_size
+        self.metrics_registry = metrics_registry
+        # None keeps the statuses only in memory, which is enough when a single process serves every request
+        self.status_path = status_path
+        # Each process only deletes the files of the jobs it forgets, so the files left by processes that restarted
+        # or were killed, and those of jobs they never forgot, are swept once they have not been written for the TTL
+        self.status_ttl_seconds = status_ttl_seconds
+        self.status_cleanup_interval_seconds = status_cleanup_interval_seconds
+        self.next_status_cleanup = time.monotonic()
+        self.statuses_removed = 0
+        self.executor = None
+        self.jobs = OrderedDict()
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.limit_rejections = 0
+        self.timeouts = 0
+        # Jobs still running this long after their reports' wall time limits are killed, see watch
+        self.max_wall_seconds = max_wall_seconds
+        self.kill_grace_seconds = kill_grace_seconds
+        self.watchdog = None
+        self.lock = threading.Lock()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        # Created on first use, so processes that fork after creating the queue get their own pool
+        if self.executor is None:
+            # Each process leads its own process group, which also holds the pools it starts, so the watchdog can
+            # kill them together
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=os.setpgrp if hasattr(os, "setpgrp") else None
+            )
+
+        return self.executor
+
+    def admit(self, function, arguments: tuple):
+        # Called with the lock held. Rejects the task when too many are pending, or submits it and counts it as
+        # pending until it finishes.
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ReportJobQueue.QueueFullError(f"Hay {self.pending} trabajos pendientes")
+
+        try:
+            future = self.get_executor().submit(function, *arguments)
+        except BrokenProcessPool:
+            # A pool whose processes were killed or died takes no more tasks, so they go to a new one
+            self.executor = None
+            future = self.get_executor().submit(function, *arguments)
+
+        self.pending += 1
+
+        return future
+
+    def kill_after_seconds(self, number_of_reports: int):
+        # Seconds after which a job of that many reports is killed, None if it never is. The reports of a batch may
+        # run one after the other, each of them up to its own limit.
+        if self.max_wall_seconds is None:
+            return None
+
+        return self.max_wall_seconds * max(number_of_reports, 1) + self.kill_grace_seconds
+
+    def submit(self, file_name: str, source, on_success=None, include_metrics: bool = False) -> str:
+        return self.submit_job(file_name, run_report_job, (file_name, source), on_success, include_metrics)
+
+    def submit_batch(self, file_name: str, sources: list, on_success=None) -> str:
+        return self.submit_job(
+            file_name, run_batch_report_job, (sources,), on_success, number_of_reports=len(sources)
+        )
+
+    def run(self, function, arguments: tuple):
+        # Runs a short task in the job processes, isolated from the web process like the jobs, and waits for it.
+        # It is admitted like the jobs, so it counts as pending and is rejected with QueueFullError when the queue
+        # is full.
+        with self.lock:
+            future = self.admit(function, arguments)
+
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            with self.lock:
+                self.executor = None
+
+            raise
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def submit_job(self, file_name: str, function, arguments: tuple, on_success=None,
+                   include_metrics: bool = False, number_of_reports: int = 1) -> str:
+        with self.lock:
+            future = self.admit(function, arguments)
+            job_id = uuid.uuid4().__str__()
+
+            self.store(job_id, {
+                "id": job_id,
+                "file_name": file_name,
+                "status": ReportJobQueue.QUEUED,
+                "result_id": None,
+                "logs": None,
+                "error": None,
+                "error_code": None,
+                "metrics": None,
+                "include_metrics": include_metrics,
+                "future": future,
+                "started": None,
+                "kill_after_seconds": self.kill_after_seconds(number_of_reports),
+                "killed": False
+            })
+            self.submitted += 1
+
+        self.save_status(job_id)
+        future.add_done_callback(lambda done: self.finish(job_id, done, on_success))
+        self.start_watchdog()
+
+        return job_id
+
+    def start_watchdog(self) -> None:
+        # Started on first use, so processes that fork after creating the queue get their own thread
+        if self.max_wall_seconds is None or (self.watchdog is not None and self.watchdog.is_alive()):
+            return
+
+        with self.lock:
+            if self.watchdog is not None and self.watchdog.is_alive():
+                return
+
+            self.watchdog = threading.Thread(target=self.watch, name="report-job-watchdog", daemon=True)
+            self.watchdog.start()
+
+    def watch(self) -> None:
+        # Reports stop by themselves when they reach their limits (see ReportLimits), except when they are stuck in
+        # a long native call that signals cannot interrupt. A pool process cannot be stopped on its own, so the whole
+        # pool is killed, failing its other running jobs as well, rather than losing one of its processes for ever.
+        while True:
+            time.sleep(1)
+            now = time.monotonic()
+            stuck_job_ids = []
+
+            with self.lock:
+                for job_id, job in self.jobs.items():
+                    if job["future"] is None or not job["future"].running():
+                        continue
+
+                    # Measured since the job was first seen running, which is when the pool hands it to a process
+                    if job["started"] is None:
+                        job["started"] = now
+                    elif now - job["started"] > job["kill_after_seconds"] and not job["killed"]:
+                        job["killed"] = True
+                        stuck_job_ids.append(job_id)
+
+                executor = self.executor if stuck_job_ids else None
+
+            if executor is not None:
+                logger.error(f"Se detienen los procesos de trabajo, no terminaron a tiempo: {', '.join(stuck_job_ids)}")
+
+                # ProcessPoolExecutor has no public way of stopping its processes before Python 3.14
+                for process in list(executor._processes.values()):
+                    self.kill(process)
+
+    @staticmethod
+    def kill(process) -> None:
+        # Together with the processes it started, e.g. the pool of a batch, which would otherwise be left running
+        if hasattr(os, "killpg"):
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+                return
+            except ProcessLookupError:
+                # Not yet the leader of its own group
+                pass
+
+        process.kill()
+
+    def add_finished(self, file_name: str, result_id: str, logs: str) -> str:
+        job_id = uuid.uuid4().__str__()
+
+        with self.lock:
+            self.store(job_id, {
+                "id": job_id,
+                "file_name": file_name,
+                "status": ReportJobQueue.DONE,
+                "result_id": result_id,
+                "logs": logs,
+                "error": None,
+                "error_code": None,
+                "metrics": None,
+                "include_metrics": False,
+                "future": None,
+                "started": None,
+                "killed": False
+            })
+
+        self.save_status(job_id)
+
+        return job_id
+
+    def store(self, job_id: str, job: dict) -> None:
+        self.jobs[job_id] = job
+
+        # Only finished jobs are forgotten, oldest first
+        if len(self.jobs) > self.history_size + self.pending:
+            for old_job_id, old_job in list(self.jobs.items()):
+                if old_job["status"] in (ReportJobQueue.DONE, ReportJobQueue.FAILED):
+                    del self.jobs[old_job_id]
+                    self.delete_status(old_job_id)
+                    break
+
+    def finish(self, job_id: str, future, on_success) -> None:
+        try:
+            result = future.result()
+        except Exception as error:
+            result = {"id": None, "logs": None, "error": str(error), "error_code": ReportJobQueue.ERROR}
+
+            if isinstance(error, BrokenProcessPool):
+                logger.error(f"El proceso de trabajo terminó inesperadamente: {error}")
+
+                with self.lock:
+                    self.executor = None
+
+        with self.lock:
+            job = self.jobs.get(job_id)
+            self.pending -= 1
+
+            if job is not None and job["killed"]:
+                result["error"] = "El informe superó el tiempo máximo de procesado y se detuvo su proceso"
+                result["error_code"] = ReportLimits.TIMEOUT
+
+            if result["error"] is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+            if result.get("error_code") in ReportJobQueue.TIMEOUT_CODES:
+                self.timeouts += 1
+            elif result.get("error_code") in (ReportLimits.TOO_MANY_PAGES, ReportLimits.MEMORY):
+                self.limit_rejections += 1
+
+            if job is not None:
+                job["status"] = ReportJobQueue.DONE if result["error"] is None else ReportJobQueue.FAILED
+                job["result_id"] = result["id"]
+                job["logs"] = result["logs"]
+                job["error"] = result["error"]
+                job["error_code"] = result.get("error_code")
+                job["metrics"] = result.get("metrics")
+                job["future"] = None
+
+        self.save_status(job_id)
+
+        # Only jobs of a single report are measured
+        if self.metrics_registry is not None and "metrics" in result:
+            self.metrics_registry.observe_report(result["metrics"], failed=result["error"] is not None)
+
+        if result["error"] is None and on_success is not None:
+            on_success(result["id"], result["logs"])
+
+    @staticmethod
+    def public_status(job: dict) -> dict:
+        status = job["status"]
+
+        if status == ReportJobQueue.QUEUED and job["future"] is not None and job["future"].running():
+            status = ReportJobQueue.RUNNING
+
+        job_status = {
+            "id": job["id"],
+            "file_name": job["file_name"],
+            "status": status,
+            "result_id": job["result_id"],
+            "logs": job["logs"],
+            "error": job["error"],
+            "error_code": job["error_code"]
+        }
+
+        if job["include_metrics"]:
+            job_status["metrics"] = job["metrics"]
+
+        return job_status
+
+    def status_file(self, job_id: str) -> str:
+        return os.path.join(self.status_path, job_id + ".json")
+
+    def save_status(self, job_id: str) -> None:
+        if self.status_path is None:
+            return
+
+        with self.lock:
+            job = self.jobs.get(job_id)
+
+            if job is None:
+                return
+
+            job_status = self.public_status(job)
+
+        # Written aside and then renamed, so other processes never read half of it
+        try:
+            os.makedirs(self.status_path, exist_ok=True)
+
+            with open(self.status_file(job_id) + ".part", "w", encoding="utf-8") as file:
+                json.dump(job_status, file)
+
+            os.replace(self.status_file(job_id) + ".part", self.status_file(job_id))
+        except OSError as error:
+            logger.warning(f"! No se pudo guardar el estado del trabajo {job_id}: {error}")
+
+        # Along with the writes, as files only pile up while jobs are submitted
+        now = time.monotonic()
+
+        with self.lock:
+            if now < self.next_status_cleanup:
+                return
+
+            self.next_status_cleanup = now + self.status_cleanup_interval_seconds
+
+        self.cleanup_statuses()
+
+    def cleanup_statuses(self) -> None:
+        if self.status_path is None:
+            return
+
+        oldest_modification = time.time() - self.status_ttl_seconds
+
+        with self.lock:
+            pending_files = {self.status_file(job_id) for job_id, job in self.jobs.items() if job["future"] is not None}
+
+        try:
+            entries = list(os.scandir(self.status_path))
+        except FileNotFoundError:
+            return
+
+        for entry in entries:
+            if entry.path in pending_files:
+                continue
+
+            try:
+                if entry.is_file() and entry.stat().st_mtime < oldest_modification:
+                    os.remove(entry.path)
+
+                    with self.lock:
+                        self.statuses_removed += 1
+            except FileNotFoundError:
+                # Deleted by another process meanwhile
+                pass
+            except OSError as error:
+                logger.warning(f"! No se pudo eliminar el estado de trabajo {entry.path}: {error}")
+
+    def load_status(self, job_id: str):
+        if self.status_path is None:
+            return None
+
+        try:
+            with open(self.status_file(job_id), encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def delete_status(self, job_id: str) -> None:
+        if self.status_path is None:
+            return
+
+        try:
+            os.remove(self.status_file(job_id))
+        except OSError:
+            pass
+
+    def status(self, job_id: str):
+        # Jobs submitted by another process are only known through their status files
+        with self.lock:
+            job = self.jobs.get(job_id)
+
+            if job is not None:
+                return self.public_status(job)
+
+        return self.load_status(job_id)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "limit_rejections": self.limit_rejections,
+                "timeouts": self.timeouts,
+                "statuses_removed": self.statuses_removed,
+            }
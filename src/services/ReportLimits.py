@@ -0,0 +1,109 @@
+import contextlib
+import math
+import signal
+import threading
+import time
+
+from config.config import g_report_max_pages, g_report_max_cpu_seconds, g_report_max_wall_seconds, \
+    g_report_max_memory_bytes
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where only the page limit applies
+    resource = None
+
+
+class ReportLimits:
+    # Resources a single report may take in the process that parses it, so a huge or hostile PDF fails on its own
+    # instead of holding a worker process for ever. None disables a limit. The time and memory limits rely on
+    # signals and resource limits of the process, so they only apply in the main thread of a process with them, as
+    # the job worker processes are.
+
+    TOO_MANY_PAGES = "too_many_pages"
+    CPU_TIME = "cpu_time"
+    TIMEOUT = "timeout"
+    MEMORY = "memory"
+
+    class LimitExceededError(Exception):
+
+        def __init__(self, code: str, message: str):
+            super().__init__(message)
+            self.code = code
+
+    def __init__(self,
+                 max_pages: int = g_report_max_pages,
+                 max_cpu_seconds: float = g_report_max_cpu_seconds,
+                 max_wall_seconds: float = g_report_max_wall_seconds,
+                 max_memory_bytes: int = g_report_max_memory_bytes
+                 ):
+        self.max_pages = max_pages
+        self.max_cpu_seconds = max_cpu_seconds
+        self.max_wall_seconds = max_wall_seconds
+        self.max_memory_bytes = max_memory_bytes
+
+    def check_pages(self, number_of_pages: int) -> None:
+        if self.max_pages is not None and number_of_pages > self.max_pages:
+            raise ReportLimits.LimitExceededError(
+                ReportLimits.TOO_MANY_PAGES,
+                f"El informe tiene {number_of_pages} páginas, el máximo es {self.max_pages}"
+            )
+
+    def raise_cpu_time_exceeded(self, signal_number, frame) -> None:
+        raise ReportLimits.LimitExceededError(
+            ReportLimits.CPU_TIME,
+            f"El informe superó el tiempo de CPU máximo de {self.max_cpu_seconds} s"
+        )
+
+    def raise_timeout(self, signal_number, frame) -> None:
+        raise ReportLimits.LimitExceededError(
+            ReportLimits.TIMEOUT,
+            f"El informe superó el tiempo máximo de procesado de {self.max_wall_seconds} s"
+        )
+
+    @contextlib.contextmanager
+    def apply(self):
+        # The CPU time and memory limits are lowered for the duration of a report and then restored, as the worker
+        # processes are reused for the following reports
+        if resource is None or threading.current_thread() is not threading.main_thread():
+            yield
+            return
+
+        previous_handlers = {}
+        previous_limits = {}
+
+        try:
+            if self.max_cpu_seconds is not None:
+                # The limit is on the CPU time of the whole process, so it is counted from what it has already used
+                soft, hard = previous_limits[resource.RLIMIT_CPU] = resource.getrlimit(resource.RLIMIT_CPU)
+                limit = math.ceil(time.process_time() + self.max_cpu_seconds)
+                previous_handlers[signal.SIGXCPU] = signal.signal(signal.SIGXCPU, self.raise_cpu_time_exceeded)
+                limit = limit if hard == resource.RLIM_INFINITY else min(limit, hard)
+                resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+            if self.max_memory_bytes is not None:
+                # Allocations over the limit then fail with a MemoryError
+                soft, hard = previous_limits[resource.RLIMIT_AS] = resource.getrlimit(resource.RLIMIT_AS)
+                limit = self.max_memory_bytes if hard == resource.RLIM_INFINITY else min(self.max_memory_bytes, hard)
+                resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+            if self.max_wall_seconds is not None:
+                previous_handlers[signal.SIGALRM] = signal.signal(signal.SIGALRM, self.raise_timeout)
+                signal.setitimer(signal.ITIMER_REAL, self.max_wall_seconds)
+
+            try:
+                yield
+            except MemoryError:
+                raise ReportLimits.LimitExceededError(
+                    ReportLimits.MEMORY,
+                    f"El informe superó la memoria máxima de {self.max_memory_bytes // 1024 ** 2} MiB"
+                ) from None
+        finally:
+            if signal.SIGALRM in previous_handlers:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+
+            for limit, value in previous_limits.items():
+                resource.setrlimit(limit, value)
+
+            for signal_number, handler in previous_handlers.items():
+                signal.signal(signal_number, handler)
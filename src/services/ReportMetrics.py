@@ -0,0 +1,111 @@
+import contextlib
+import os
+import sys
+import time
+
+# Linux files of the resident memory of the process, whose high-water mark can be reset, unlike ru_maxrss, which
+# covers the whole life of the process. Elsewhere the peak memory is not measured.
+g_process_status_path = "/proc/self/status"
+g_process_clear_refs_path = "/proc/self/clear_refs"
+g_process_peak_rss_available = sys.platform.startswith("linux") and os.path.exists(g_process_clear_refs_path)
+
+
+class ReportMetrics:
+
+    # Stages of the processing of a report, in order. Text extraction, cleaning and classification run page by page,
+    # interleaved, so their times are the sums over all the pages.
+    EXTRACT = "extract"
+    CLEAN = "clean"
+    CLASSIFY = "classify"
+    VALIDATE = "validate"
+    GENERATE = "generate"
+    EXPORT = "export"
+
+    STAGES = [EXTRACT, CLEAN, CLASSIFY, VALIDATE, GENERATE, EXPORT]
+
+    # Stages timed once per page, whose peak memory is not measured, as that would read the status of the process
+    # for every page. The peak of the stages after them covers their pages.
+    PAGE_STAGES = {EXTRACT, CLEAN, CLASSIFY}
+
+    def __init__(self):
+        self.stages = {}
+        self.pages = 0
+        self.lines = 0
+        # Pages found unchanged since the last report of the same object, which were not parsed again. Their lines
+        # are not counted in lines, which only counts the lines cleaned.
+        self.reused_pages = 0
+        self.transactions = 0
+        self.peak_memory_bytes = None
+        # A worker process runs many reports, so its peak is reset for it to only cover this one. Without the files of
+        # Linux it is neither reset nor read.
+        self.peak_rss_reset = self.reset_peak_rss() if g_process_peak_rss_available else False
+
+    @staticmethod
+    def reset_peak_rss() -> bool:
+        try:
+            with open(g_process_clear_refs_path, "w") as file:
+                file.write("5")
+
+            return True
+        except OSError:
+            return False
+
+    def peak_rss_bytes(self):
+        # High-water mark of the resident memory of the process since this report started, None if unknown
+        if not self.peak_rss_reset:
+            return None
+
+        try:
+            with open(g_process_status_path) as file:
+                for line in file:
+                    # E.g.: "VmHWM:	    8752 kB"
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+
+        return None
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+    def add(self, name: str, wall_seconds: float, cpu_seconds: float) -> None:
+        stage = self.stages.get(name)
+
+        if stage is None:
+            stage = self.stages[name] = {"wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_memory_bytes": None}
+
+        stage["wall_seconds"] += wall_seconds
+        stage["cpu_seconds"] += cpu_seconds
+
+        # As the peak never decreases during the report, the first stage whose peak grows is the one that needed it
+        if self.peak_rss_reset and name not in self.PAGE_STAGES:
+            stage["peak_memory_bytes"] = self.peak_rss_bytes()
+
+    def finish(self) -> None:
+        self.peak_memory_bytes = self.peak_rss_bytes()
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": {
+                name: {
+                    "wall_seconds": round(self.stages[name]["wall_seconds"], 6),
+                    "cpu_seconds": round(self.stages[name]["cpu_seconds"], 6),
+                    "peak_memory_bytes": self.stages[name]["peak_memory_bytes"],
+                }
+                for name in self.STAGES
+                if name in self.stages
+            },
+            "pages": self.pages,
+            "lines": self.lines,
+            "reused_pages": self.reused_pages,
+            "transactions": self.transactions,
+            "peak_memory_bytes": self.peak_memory_bytes,
+        }
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+from config.config import g_result_cache_max_entries
+from src.services.ReportGrammarRegistry import report_grammar_registry
+
+
+class ReportResultCache:
+    # Results of already processed uploads by their contents. The files of the results belong to the ArtifactStore,
+    # which may delete them at any time, so a result whose Excel file is no longer available is a miss.
+
+    def __init__(self, artifact_store, max_entries: int = g_result_cache_max_entries):
+        self.artifact_store = artifact_store
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(digest: str) -> str:
+        # digest is the SHA-256 hex digest of the upload, computed by ArtifactStore.save_upload while saving it
+        return f"{digest}:{report_grammar_registry().version}"
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None and self.artifact_store.lookup(entry["id"], entry["id"] + ".xlsx") is None:
+                del self.entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+            return entry["id"], entry["logs"]
+
+    def put(self, key: str, output_file_id: str, logs: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = {"id": output_file_id, "logs": logs}
+
+            # Forgetting a result does not delete its files, the artifact store expires them when no longer used
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
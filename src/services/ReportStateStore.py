@@ -0,0 +1,167 @@
+import contextlib
+import json
+import os
+import re
+import tempfile
+
+from config.config import g_report_state_path, logger
+from src.models.CumulativeExpenseReport import CumulativeExpenseReport
+from src.services.CumulativeExpenseReportColumnarExporter import CumulativeExpenseReportColumnarExporter
+from src.services.CumulativeExpenseReportDeltaExporter import CumulativeExpenseReportDeltaExporter
+from src.services.ReportGrammarRegistry import report_grammar_registry
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where the saves of the same object are not serialised
+    fcntl = None
+
+
+class ReportStateStore:
+    # Parsed state of the last report processed for each object id, so the next report of the same object only has
+    # to parse the pages that changed, and the changes between both. For each object id it keeps:
+    #   <object id>.dafc: the report, in the columnar format
+    #   <object id>.json: the fingerprint of every page and the state of the parser before every page
+    #   <object id>.delta.ndjson: the changes from the report processed before it, if any
+    #   <object id>.lock: locked while the files of the object are replaced, so they always belong to the same report
+
+    STATE_EXTENSION = ".json"
+    LOCK_EXTENSION = ".lock"
+
+    # Object ids are used as file names, so anything else is not stored
+    OBJECT_ID_PATTERN = re.compile(r"\w+")
+
+    class State:
+
+        def __init__(self,
+                     report: CumulativeExpenseReport,
+                     page_hashes: list,
+                     checkpoints: list,
+                     budget_position_totals: list
+                     ):
+            self.report = report
+            # CumulativeExpenseReportLineClassifier.page_fingerprint of each page
+            self.page_hashes = page_hashes
+            # State of the parser before each page, and after the last one, see
+            # CumulativeExpenseReportProcessor.ExecutionContext.checkpoint
+            self.checkpoints = checkpoints
+            # (budget position code, total amount in cents) in the order they were found
+            self.budget_position_totals = budget_position_totals
+
+    def __init__(self, root: str = g_report_state_path):
+        self.root = root
+        self.columnar_exporter = CumulativeExpenseReportColumnarExporter()
+        self.delta_exporter = CumulativeExpenseReportDeltaExporter()
+
+    def path(self, object_id: str, extension: str) -> str:
+        return os.path.join(self.root, object_id + extension)
+
+    @contextlib.contextmanager
+    def lock(self, object_id: str, exclusive: bool):
+        # Held by the process that replaces the files of the object, exclusively, and by the ones that read them
+        if fcntl is None:
+            yield
+            return
+
+        with open(self.path(object_id, self.LOCK_EXTENSION), "a") as file:
+            fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    @contextlib.contextmanager
+    def replacing(self, path: str):
+        # Yields a new path in the same folder to write to, which then replaces path. Each writer gets its own, so
+        # concurrent writers never write to the same file.
+        descriptor, part_path = tempfile.mkstemp(dir=self.root, prefix=os.path.basename(path) + ".", suffix=".part")
+        os.close(descriptor)
+
+        try:
+            yield part_path
+            os.replace(part_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(part_path)
+
+            raise
+
+    def delta_path(self, object_id: str):
+        # Path of the changes of the last report of the object, None if there are none
+        if not self.OBJECT_ID_PATTERN.fullmatch(object_id or ""):
+            return None
+
+        path = self.path(object_id, CumulativeExpenseReportDeltaExporter.EXTENSION)
+
+        return path if os.path.exists(path) else None
+
+    def load(self, object_id: str):
+        if not self.OBJECT_ID_PATTERN.fullmatch(object_id or ""):
+            return None
+
+        state_path = self.path(object_id, self.STATE_EXTENSION)
+
+        if not os.path.exists(state_path):
+            return None
+
+        try:
+            with self.lock(object_id, exclusive=False):
+                with open(state_path, encoding="utf-8") as file:
+                    data = json.load(file)
+
+                # States saved by another version of the grammar may have been parsed differently
+                if data["version"] != report_grammar_registry().version:
+                    return None
+
+                report = self.columnar_exporter.load(
+                    self.path(object_id, CumulativeExpenseReportColumnarExporter.EXTENSION)
+                )
+
+            # Without the lock, both files could belong to different reports
+            if len(report.transactions) != data["transactions"]:
+                return None
+        except (OSError, ValueError, KeyError, TypeError, CumulativeExpenseReportColumnarExporter.FormatError) as error:
+            logger.warning(f"! No se pudo leer el estado del último informe del objeto {object_id}: {error}")
+            return None
+
+        return ReportStateStore.State(
+            report=report,
+            page_hashes=data["page_hashes"],
+            checkpoints=data["checkpoints"],
+            budget_position_totals=[tuple(total) for total in data["budget_position_totals"]]
+        )
+
+    def save(self, state: State, previous: State = None, common_rows: int = 0) -> None:
+        # common_rows is the number of leading transactions reused from the previous state
+        object_id = state.report.object_id
+
+        if not self.OBJECT_ID_PATTERN.fullmatch(object_id or ""):
+            return
+
+        os.makedirs(self.root, exist_ok=True)
+
+        # Every file is written aside and then renamed, so readers never see half of it, and all of them are replaced
+        # under the lock of the object, so they always belong to the same report
+        with self.lock(object_id, exclusive=True):
+            delta_path = self.path(object_id, CumulativeExpenseReportDeltaExporter.EXTENSION)
+
+            if previous is not None:
+                with self.replacing(delta_path) as part_path:
+                    self.delta_exporter.export_file(previous.report, state.report, part_path, common_rows)
+            elif os.path.exists(delta_path):
+                # Changes from a report that is no longer the previous one
+                os.remove(delta_path)
+
+            with self.replacing(self.path(object_id, CumulativeExpenseReportColumnarExporter.EXTENSION)) as part_path:
+                self.columnar_exporter.export_file(state.report, part_path)
+
+            with self.replacing(self.path(object_id, self.STATE_EXTENSION)) as part_path:
+                with open(part_path, "w", encoding="utf-8") as file:
+                    json.dump({
+                        "version": report_grammar_registry().version,
+                        "transactions": len(state.report.transactions),
+                        "page_hashes": state.page_hashes,
+                        "checkpoints": state.checkpoints,
+                        "budget_position_totals": state.budget_position_totals,
+                    }, file)
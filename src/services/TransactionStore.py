@@ -0,0 +1,211 @@
+import datetime
+import os
+import sqlite3
+import threading
+
+from config.config import g_transaction_store_path, logger
+from src.models.CumulativeExpenseReport import CumulativeExpenseReport
+from src.services.CumulativeExpenseReportExporter import CumulativeExpenseReportExporter
+
+
+class TransactionStore:
+    # Transactions of every processed report in a SQLite database, so questions across reports, e.g. the total
+    # spent with a vendor this year, are answered without parsing the reports again. A cumulative report holds every
+    # transaction of its object so far, so each report replaces the previous one of the same object.
+
+    SCHEMA_VERSION = 1
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS reports (
+            object_id TEXT PRIMARY KEY,
+            object_name TEXT,
+            file_name TEXT,
+            date TEXT,
+            number_of_pages INTEGER,
+            total_amount_cents INTEGER,
+            number_of_transactions INTEGER,
+            stored_at TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS budget_positions (
+            code TEXT PRIMARY KEY,
+            name TEXT,
+            budget_chapter TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS transactions (
+            object_id TEXT NOT NULL,
+            budget_position_code TEXT,
+            budget_chapter TEXT,
+            document_type_code TEXT,
+            document_number TEXT,
+            document_position TEXT,
+            document_date TEXT,
+            reference TEXT,
+            vendor_id TEXT,
+            vendor_name TEXT,
+            description TEXT,
+            amount_cents INTEGER NOT NULL,
+            excluded_from_total INTEGER NOT NULL
+        );
+
+        CREATE INDEX IF NOT EXISTS transactions_object_id ON transactions (object_id);
+        CREATE INDEX IF NOT EXISTS transactions_budget_position_code ON transactions (budget_position_code);
+        CREATE INDEX IF NOT EXISTS transactions_vendor_id ON transactions (vendor_id);
+        CREATE INDEX IF NOT EXISTS transactions_document_date ON transactions (document_date);
+    """
+
+    # Aggregations by name -> expression of the group, and expression of a name to show with it
+    GROUPS = {
+        "position": ("budget_position_code", "(SELECT name FROM budget_positions WHERE code = budget_position_code)"),
+        "chapter": ("budget_chapter", None),
+        "vendor": ("vendor_id", "MAX(vendor_name)"),
+        "month": ("substr(document_date, 1, 7)", None),
+    }
+
+    # Filters of the aggregations by name -> condition
+    FILTERS = {
+        "object_id": "object_id = ?",
+        "position": "budget_position_code = ?",
+        "chapter": "budget_chapter = ?",
+        "vendor_id": "vendor_id = ?",
+        "from": "document_date >= ?",
+        "to": "document_date <= ?",
+    }
+
+    class QueryError(Exception):
+        pass
+
+    def __init__(self, path: str = g_transaction_store_path):
+        self.path = path
+        # One connection per thread and process, as SQLite connections cannot be shared by threads nor survive a fork
+        self.local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self.local, "connection", None)
+
+        if connection is not None and self.local.pid == os.getpid():
+            return connection
+
+        if os.path.dirname(self.path) != "":
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        # Several worker processes may write at once, so they wait for each other's transactions instead of failing
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        if connection.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            with connection:
+                connection.executescript(self.SCHEMA)
+                connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+        self.local.connection = connection
+        self.local.pid = os.getpid()
+
+        return connection
+
+    @staticmethod
+    def rows(report: CumulativeExpenseReport):
+        # Values of CumulativeExpenseReportExporter.FIELDS, with dates as ISO text and booleans as integers
+        date_index = CumulativeExpenseReportExporter.FIELDS.index("document_date")
+
+        for row in CumulativeExpenseReportExporter.iter_rows(report):
+            row = list(row)
+            row[date_index] = row[date_index].isoformat() if row[date_index] is not None else None
+            row[-1] = int(row[-1])
+            yield row
+
+    def insert_report(self, report: CumulativeExpenseReport) -> bool:
+        # Returns whether the report was stored, which it is not if a later report of the same object already is.
+        # The report has already been processed, so a failure to store it is only warned about.
+        try:
+            return self.replace_transactions(report)
+        except sqlite3.Error as error:
+            logger.warning(f"! No se pudieron guardar los movimientos del informe en {self.path}: {error}")
+            return False
+
+    def replace_transactions(self, report: CumulativeExpenseReport) -> bool:
+        connection = self.connection()
+        date = report.date.isoformat() if report.date is not None else None
+
+        with connection:
+            # The write lock is taken before the report is compared with the stored one, so no other process can store
+            # a newer report between the check and the write
+            connection.execute("BEGIN IMMEDIATE")
+            stored = connection.execute("SELECT date FROM reports WHERE object_id = ?", (report.object_id,)).fetchone()
+
+            if stored is not None and date is not None and stored[0] is not None and stored[0] > date:
+                logger.warning(f"! No se guardan los movimientos del informe, ya hay uno posterior del objeto {report.object_id}")
+                return False
+
+            connection.execute("DELETE FROM transactions WHERE object_id = ?", (report.object_id,))
+            connection.executemany(
+                f"INSERT INTO transactions ({', '.join(CumulativeExpenseReportExporter.FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(CumulativeExpenseReportExporter.FIELDS))})",
+                self.rows(report)
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO budget_positions VALUES (?, ?, ?)",
+                [
+                    (budget_position.code, budget_position.name, budget_position.budget_chapter)
+                    for budget_position in report.budget_positions
+                ]
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    report.object_id,
+                    report.object_name,
+                    report.file_name,
+                    date,
+                    report.number_of_pages,
+                    report.total_amount_cents,
+                    len(report.transactions),
+                    datetime.datetime.now().isoformat(timespec="seconds"),
+                )
+            )
+
+        return True
+
+    def aggregate(self, group: str, filters: dict = None, include_excluded: bool = False) -> list:
+        # Number of transactions and amount of each group, largest amount first. Transactions excluded from the
+        # report totals are not counted unless include_excluded.
+        if group not in self.GROUPS:
+            raise TransactionStore.QueryError(f"Agrupación desconocida, las agrupaciones disponibles son: {', '.join(self.GROUPS)}")
+
+        conditions = [] if include_excluded else ["excluded_from_total = 0"]
+        parameters = []
+
+        for name, value in (filters or {}).items():
+            if name not in self.FILTERS:
+                raise TransactionStore.QueryError(f"Filtro desconocido: {name}")
+
+            if name in ("from", "to"):
+                try:
+                    value = datetime.date.fromisoformat(value).isoformat()
+                except ValueError:
+                    raise TransactionStore.QueryError(f"Fecha no válida: {value}")
+
+            conditions.append(self.FILTERS[name])
+            parameters.append(value)
+
+        key, name = self.GROUPS[group]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        cursor = self.connection().execute(
+            f"SELECT {key} AS key, {name or 'NULL'} AS name, COUNT(*), SUM(amount_cents) FROM transactions "
+            f"{where} GROUP BY key ORDER BY SUM(amount_cents) DESC",
+            parameters
+        )
+
+        return [
+            {"key": key, "name": name, "transactions": transactions, "amount_cents": amount_cents}
+            for key, name, transactions, amount_cents in cursor
+        ]
+
+    def reports(self) -> list:
+        cursor = self.connection().execute("SELECT * FROM reports ORDER BY object_id")
+        names = [column[0] for column in cursor.description]
+
+        return [dict(zip(names, row)) for row in cursor]
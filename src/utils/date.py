@@ -1,5 +1,16 @@
 import datetime
+import functools
+
+from config.config import setup_locale
 
 
 def format_date(date: datetime.date) -> str:
+    setup_locale()
+
     return date.strftime("%-d de %B de %Y")
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_es_date(value: str) -> datetime.date:
+    # E.g.: "18.04.2023". Reports repeat the same few hundred dates, so parsed dates are cached
+    return datetime.date(year=int(value[6:10]), month=int(value[3:5]), day=int(value[0:2]))
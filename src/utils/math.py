@@ -1,9 +1,26 @@
 import locale
 
+from config.config import setup_locale
+
 
 def parse_es_float(value) -> float:
     return float(value.replace(".", "").replace(",", "."))
 
 
+def parse_es_cents(value: str) -> int:
+    # Only valid for amounts with exactly two decimals, as matched by g_amount_regex. E.g.: "11.384.852,92"
+    # Amounts below 1.000,00 have no thousands separator, so removing the decimal comma is enough
+    if len(value) < 7:
+        return int(value.replace(",", ""))
+
+    return int(value.replace(".", "").replace(",", ""))
+
+
 def format_es_float(value: float) -> str:
+    setup_locale()
+
     return locale.format_string("%.2f", value, True, True)
+
+
+def format_es_cents(value: int) -> str:
+    return format_es_float(value / 100)
@@ -0,0 +1,60 @@
+import hashlib
+import re
+
+
+class ReportGrammar:
+    # Compiled patterns of one layout of the report, see g_report_layouts. They are compiled once, instead of being
+    # looked up in the small cache of the re module on every use.
+
+    # Named groups, which cannot be repeated in a single pattern
+    NAMED_GROUP_PATTERN = re.compile(r"\(\?P<\w+>")
+
+    def __init__(self,
+                 name: str,
+                 signature: str,
+                 report_object: str,
+                 number_of_pages: str,
+                 date: str,
+                 total_report_amount: str,
+                 budget_position_header: str,
+                 budget_position_total_amount: str,
+                 transaction_first_line: str,
+                 transaction_second_line: str,
+                 ignored_strings: list,
+                 document_types: list
+                 ):
+        self.name = name
+        self.signature_pattern = re.compile(signature)
+
+        # Page header and footer lines, which are searched for the report metadata and then removed
+        self.report_object_pattern = re.compile(report_object)
+        self.number_of_pages_pattern = re.compile(number_of_pages)
+        self.date_pattern = re.compile(date)
+        self.total_report_amount_pattern = re.compile(total_report_amount)
+
+        self.budget_position_header_pattern = re.compile(budget_position_header)
+        self.budget_position_total_amount_pattern = re.compile(budget_position_total_amount)
+        self.transaction_first_line_pattern = re.compile(transaction_first_line)
+        self.transaction_second_line_pattern = re.compile(transaction_second_line)
+
+        # Every ignored string in a single alternation, so each line is scanned once instead of once per string
+        self.ignored_pattern = re.compile("|".join(
+            f"(?:{self.NAMED_GROUP_PATTERN.sub('(?:', ignored_string)})" for ignored_string in ignored_strings
+        ))
+
+        # E.g.: "OY ", "RY ", "FM ", "RJ ", "KJ "
+        self.transaction_first_line_prefixes = frozenset(code + " " for code in document_types)
+
+        # Metadata of the page header and footer that changes between two versions of the same report, even on the
+        # pages that do not change otherwise
+        self.volatile_metadata_pattern = re.compile("|".join(
+            f"(?:{self.NAMED_GROUP_PATTERN.sub('(?:', pattern.pattern)})"
+            for pattern in [self.number_of_pages_pattern, self.date_pattern, self.total_report_amount_pattern]
+        ))
+
+        # Changes whenever a pattern or a document type does, so results parsed with another grammar are not reused
+        self.version = hashlib.sha256("\n".join(
+            [name, signature, report_object, number_of_pages, date, total_report_amount, budget_position_header,
+             budget_position_total_amount, transaction_first_line, transaction_second_line] +
+            list(ignored_strings) + sorted(self.transaction_first_line_prefixes)
+        ).encode("utf-8")).hexdigest()[:16]
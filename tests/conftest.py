@@ -0,0 +1,18 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import types
+
+# The tests import the app as run.py and cli.py do, from the root of the repository
+g_root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if g_root_path not in sys.path:
+    sys.path.insert(0, g_root_path)
+
+# config/configlocal.py is not versioned, so the tests bring their own when there is none
+if "config.configlocal" not in sys.modules and importlib.util.find_spec("config.configlocal") is None:
+    configlocal = types.ModuleType("config.configlocal")
+    configlocal.local_g_tmp_path = tempfile.mkdtemp(prefix="dafi-tests-")
+    configlocal.local_g_http_port = 5000
+    sys.modules["config.configlocal"] = configlocal
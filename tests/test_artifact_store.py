@@ -0,0 +1,167 @@
+import io
+import os
+import time
+import uuid
+
+import pytest
+
+from src.services.ArtifactStore import ArtifactStore
+from src.services.ReportResultCache import ReportResultCache
+
+
+def new_store(root, **kwargs) -> ArtifactStore:
+    # Cleaned up by the tests themselves instead of by its thread
+    return ArtifactStore(root=str(root), cleanup_interval_seconds=3600, **kwargs)
+
+
+def new_output(store: ArtifactStore, size: int = 10, extensions: tuple = (".xlsx",)) -> tuple:
+    artifact_id = uuid.uuid4().__str__()
+    file_names = [artifact_id + extension for extension in extensions]
+
+    for file_name in file_names:
+        with open(store.path(file_name), "wb") as file:
+            file.write(b"x" * size)
+
+    return artifact_id, file_names
+
+
+def make_old(store: ArtifactStore, artifact_id: str = None, file_names: list = ()) -> None:
+    # As if neither this process nor any other had used them for longer than the TTL
+    old = time.time() - 2 * store.ttl_seconds
+
+    for file_name in file_names:
+        os.utime(store.path(file_name), (old, old))
+
+    if artifact_id is not None:
+        store.artifacts[artifact_id]["last_access"] -= 2 * store.ttl_seconds
+
+
+def test_lookup_of_registered_and_unknown_files(tmp_path):
+    store = new_store(tmp_path)
+    artifact_id, file_names = new_output(store)
+    store.register(artifact_id, file_names)
+
+    assert store.lookup(artifact_id, file_names[0]) == store.path(file_names[0])
+    assert store.lookup(artifact_id, artifact_id + ".dafc") is None
+
+    # E.g. written by another process
+    other_id, other_file_names = new_output(store)
+    assert store.lookup(other_id, other_file_names[0]) == store.path(other_file_names[0])
+    assert other_id in store.artifacts
+
+
+def test_least_recently_used_outputs_are_evicted_over_the_size_limit(tmp_path):
+    store = new_store(tmp_path, max_bytes=25)
+    first_id, first_file_names = new_output(store)
+    second_id, second_file_names = new_output(store)
+    store.register(first_id, first_file_names)
+    store.register(second_id, second_file_names)
+    store.lookup(first_id, first_file_names[0])
+
+    third_id, third_file_names = new_output(store)
+    store.register(third_id, third_file_names)
+
+    assert list(store.artifacts) == [first_id, third_id]
+    assert not os.path.exists(store.path(second_file_names[0]))
+    assert store.total_bytes == 20
+    assert store.evicted == 1
+
+
+def test_newest_output_is_kept_even_over_the_size_limit(tmp_path):
+    store = new_store(tmp_path, max_bytes=5)
+    artifact_id, file_names = new_output(store)
+    store.register(artifact_id, file_names)
+
+    assert store.lookup(artifact_id, file_names[0]) is not None
+
+
+def test_outputs_not_used_for_the_ttl_expire_with_all_their_files(tmp_path):
+    store = new_store(tmp_path, ttl_seconds=60)
+    old_id, old_file_names = new_output(store, extensions=(".xlsx", ".dafc"))
+    new_id, new_file_names = new_output(store)
+    store.register(old_id, old_file_names)
+    store.register(new_id, new_file_names)
+    make_old(store, old_id, old_file_names)
+
+    store.cleanup()
+
+    assert list(store.artifacts) == [new_id]
+    assert not any(os.path.exists(store.path(file_name)) for file_name in old_file_names)
+    assert store.expired == 1
+
+
+def test_outputs_used_by_another_process_do_not_expire(tmp_path):
+    store = new_store(tmp_path, ttl_seconds=60)
+    other_store = new_store(tmp_path, ttl_seconds=60)
+    artifact_id, file_names = new_output(store)
+    store.register(artifact_id, file_names)
+    make_old(store, artifact_id, file_names)
+
+    other_store.lookup(artifact_id, file_names[0])
+    store.cleanup()
+
+    assert os.path.exists(store.path(file_names[0]))
+    assert store.expired == 0
+
+
+def test_orphan_sweep_only_deletes_unused_files_of_the_store(tmp_path):
+    store = new_store(tmp_path, ttl_seconds=60)
+    other_store = new_store(tmp_path, ttl_seconds=60)
+
+    orphan_id, orphan_file_names = new_output(store, extensions=(".xlsx", ".dafc"))
+    make_old(store, file_names=orphan_file_names)
+
+    # Registered by another process, and used since, through one of its files only
+    other_id, other_file_names = new_output(store, extensions=(".xlsx", ".dafc"))
+    make_old(store, file_names=other_file_names)
+    other_store.register(other_id, other_file_names[:1])
+
+    unrelated_path = os.path.join(str(tmp_path), "notes.txt")
+
+    with open(unrelated_path, "w") as file:
+        file.write("x")
+
+    os.utime(unrelated_path, (0, 0))
+
+    store.cleanup()
+
+    assert not any(os.path.exists(store.path(file_name)) for file_name in orphan_file_names)
+    assert all(os.path.exists(store.path(file_name)) for file_name in other_file_names)
+    assert os.path.exists(unrelated_path)
+    assert store.orphans_removed == 2
+
+
+def test_small_uploads_are_kept_in_memory(tmp_path):
+    store = new_store(tmp_path)
+    source, digest = store.receive_upload(io.BytesIO(b"%PDF-1.4"), max_memory_bytes=100)
+
+    assert source == b"%PDF-1.4"
+    assert len(digest) == 64
+
+
+def test_uploads_over_their_limit_are_deleted(tmp_path):
+    store = new_store(tmp_path, chunk_size=4)
+
+    with pytest.raises(ArtifactStore.UploadTooLargeError):
+        store.save_upload(io.BytesIO(b"x" * 100), max_bytes=10)
+
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_cached_results_whose_files_were_deleted_are_misses(tmp_path):
+    store = new_store(tmp_path, max_bytes=15)
+    cache = ReportResultCache(store, max_entries=10)
+
+    first_id, first_file_names = new_output(store)
+    store.register(first_id, first_file_names)
+    cache.put("first", output_file_id=first_id, logs="logs")
+
+    assert cache.get("first") == (first_id, "logs")
+
+    # Evicts the first output
+    second_id, second_file_names = new_output(store)
+    store.register(second_id, second_file_names)
+
+    assert cache.get("first") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,38 @@
+import os
+import re
+import zipfile
+
+import pytest
+
+from benchmarks.synthetic_report import SyntheticPageSource, synthetic_report_pages
+from config.config import g_tmp_path
+from src.services.CumulativeExpenseReportExcelGenerator import CumulativeExpenseReportExcelGenerator
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+
+
+@pytest.fixture(scope="module")
+def report():
+    processor = CumulativeExpenseReportProcessor(quiet=True, incremental=False)
+    processor.pdf_text_extractor = SyntheticPageSource(synthetic_report_pages(200, 3))
+
+    return processor.process_report("report.pdf", None)
+
+
+def worksheet_names(path: str) -> list:
+    with zipfile.ZipFile(path) as workbook:
+        return re.findall(r'<sheet name="([^"]*)"', workbook.read("xl/workbook.xml").decode())
+
+
+@pytest.mark.parametrize("object_id", ["Resumen", "RESUMEN"])
+def test_reports_named_like_the_summary_get_a_unique_worksheet(report, object_id):
+    report.object_id = object_id
+    output_file_id = CumulativeExpenseReportExcelGenerator().generate_batch([
+        ("a.pdf", report, None),
+        ("b.pdf", report, None),
+    ])
+    path = os.path.join(g_tmp_path, f"{output_file_id}.xlsx")
+
+    try:
+        assert worksheet_names(path) == ["Resumen", f"{object_id} (2)", f"{object_id} (3)"]
+    finally:
+        os.remove(path)
@@ -0,0 +1,44 @@
+import io
+import zipfile
+
+import pytest
+
+from benchmarks.synthetic_report import SyntheticPageSource, synthetic_report_pages
+from src.services.CumulativeExpenseReportExporter import CumulativeExpenseReportExporter
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.ReportExporterRegistry import ReportExporterRegistry
+
+
+@pytest.fixture(scope="module")
+def report():
+    processor = CumulativeExpenseReportProcessor(quiet=True, incremental=False)
+    processor.pdf_text_extractor = SyntheticPageSource(synthetic_report_pages(500, 5))
+
+    return processor.process_report("report.pdf", None)
+
+
+def test_exporters_must_produce_chunks():
+    class IncompleteExporter(CumulativeExpenseReportExporter):
+        FORMAT = "incomplete"
+
+    with pytest.raises(TypeError):
+        IncompleteExporter()
+
+
+@pytest.mark.parametrize("export_format", ReportExporterRegistry().formats())
+def test_every_format_can_be_exported_in_chunks_and_to_a_file(report, export_format, tmp_path):
+    exporter = ReportExporterRegistry().get(export_format)
+    chunks = b"".join(exporter.iter_chunks(report))
+    path = str(tmp_path / ("report" + exporter.EXTENSION))
+    exporter.export_file(report, path)
+
+    with open(path, "rb") as file:
+        exported = file.read()
+
+    if export_format == "xlsx":
+        # Workbooks record when they were created, so both are only checked to be complete
+        for workbook in (chunks, exported):
+            with zipfile.ZipFile(io.BytesIO(workbook)) as archive:
+                assert "xl/workbook.xml" in archive.namelist()
+    else:
+        assert chunks == exported
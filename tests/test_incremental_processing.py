@@ -0,0 +1,144 @@
+import os
+
+import pytest
+
+from benchmarks.synthetic_report import SyntheticPageSource, synthetic_report_pages
+from src.services.CumulativeExpenseReportColumnarExporter import CumulativeExpenseReportColumnarExporter
+from src.services.CumulativeExpenseReportExporter import CumulativeExpenseReportExporter
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.ReportMetrics import ReportMetrics
+from src.services.ReportStateStore import ReportStateStore
+
+g_object_id = "E0390122A400"
+
+
+def report_rows(report) -> tuple:
+    return (
+        report.object_id,
+        report.number_of_pages,
+        report.date,
+        report.total_amount_cents,
+        [(position.code, position.name, position.budget_chapter) for position in report.budget_positions],
+        list(CumulativeExpenseReportExporter.iter_rows(report)),
+    )
+
+
+def process(processor: CumulativeExpenseReportProcessor, pages: list, metrics: ReportMetrics = None):
+    processor.pdf_text_extractor = SyntheticPageSource(pages)
+
+    return processor.process_report("report.pdf", None, metrics=metrics)
+
+
+@pytest.fixture
+def state_store(tmp_path) -> ReportStateStore:
+    return ReportStateStore(str(tmp_path))
+
+
+@pytest.fixture
+def incremental_processor(state_store) -> CumulativeExpenseReportProcessor:
+    processor = CumulativeExpenseReportProcessor(quiet=True)
+    processor.report_state_store = state_store
+
+    return processor
+
+
+@pytest.fixture
+def full_processor() -> CumulativeExpenseReportProcessor:
+    return CumulativeExpenseReportProcessor(quiet=True, incremental=False)
+
+
+def test_incremental_parse_equals_full_parse(incremental_processor, full_processor):
+    first = synthetic_report_pages(3000, 20)
+    grown = synthetic_report_pages(3000, 20, new_transactions=300)
+    edited = list(grown)
+    edited[5] = edited[5].replace("OFIPAPEL CENTER. S.L.", "OFIPAPEL CENTRO S.L.")
+    assert edited[5] != grown[5]
+
+    for name, pages, reused in [
+        ("first", first, False),
+        ("grown", grown, True),
+        ("unchanged", grown, True),
+        ("edited", edited, True),
+        ("shrunk", first, True),
+    ]:
+        metrics = ReportMetrics()
+        incremental = process(incremental_processor, pages, metrics)
+
+        assert report_rows(incremental) == report_rows(process(full_processor, pages)), name
+        assert (metrics.reused_pages > 0) == reused, name
+
+        if name == "unchanged":
+            assert metrics.reused_pages == len(pages)
+
+
+def test_state_is_restored_by_another_processor(incremental_processor, full_processor, state_store):
+    first = synthetic_report_pages(2000, 13)
+    grown = synthetic_report_pages(2000, 13, new_transactions=200)
+    process(incremental_processor, first)
+
+    # E.g. another worker process, or the same one after a restart
+    restarted_processor = CumulativeExpenseReportProcessor(quiet=True)
+    restarted_processor.report_state_store = ReportStateStore(state_store.root)
+    metrics = ReportMetrics()
+    report = process(restarted_processor, grown, metrics)
+
+    assert metrics.reused_pages > 0
+    assert report_rows(report) == report_rows(process(full_processor, grown))
+
+
+def test_state_holds_the_last_report(incremental_processor, state_store):
+    pages = synthetic_report_pages(2000, 13)
+    report = process(incremental_processor, pages)
+    state = state_store.load(g_object_id)
+
+    assert state is not None
+    assert len(state.page_hashes) == len(pages)
+    assert report_rows(state.report) == report_rows(report)
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: data[:len(data) // 2],
+    lambda data: data[:12],
+    lambda data: data[:-40] + bytes(40),
+], ids=["truncated", "header only", "zeroed end"])
+def test_corrupt_state_falls_back_to_a_full_parse(incremental_processor, full_processor, state_store, corrupt):
+    pages = synthetic_report_pages(2000, 13)
+    process(incremental_processor, pages)
+    path = state_store.path(g_object_id, CumulativeExpenseReportColumnarExporter.EXTENSION)
+
+    with open(path, "rb") as file:
+        data = file.read()
+
+    with open(path, "wb") as file:
+        file.write(corrupt(data))
+
+    assert state_store.load(g_object_id) is None
+
+    metrics = ReportMetrics()
+    report = process(incremental_processor, pages, metrics)
+
+    assert metrics.reused_pages == 0
+    assert report_rows(report) == report_rows(process(full_processor, pages))
+
+
+def test_object_ids_are_checked_whole(incremental_processor, state_store):
+    process(incremental_processor, synthetic_report_pages(500, 5))
+    state = state_store.load(g_object_id)
+    state.report.object_id = g_object_id + "\n"
+    file_names = sorted(os.listdir(state_store.root))
+
+    state_store.save(state)
+
+    assert sorted(os.listdir(state_store.root)) == file_names
+    assert state_store.load(g_object_id + "\n") is None
+
+
+def test_ignored_strings_spanning_several_lines_are_removed(full_processor):
+    pages = synthetic_report_pages(500, 5)
+    split_pages = [
+        page.replace("    de    ", "    de\n    ").replace("_______________________ _______________________", "_____\n_____")
+        for page in pages
+    ]
+
+    assert split_pages != pages
+    assert report_rows(process(full_processor, split_pages)) == report_rows(process(full_processor, pages))
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.import_time import g_budgets, g_lazy_libraries
+
+g_tests_path = os.path.dirname(os.path.abspath(__file__))
+
+
+def imported_libraries(module: str) -> set:
+    # Libraries among g_lazy_libraries in sys.modules once a new interpreter imports the module. It imports conftest
+    # first, which sets up the same environment as for the tests.
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, [g_tests_path, environment.get("PYTHONPATH")]))
+    process = subprocess.run(
+        [sys.executable, "-c", f"import sys, conftest, {module}; print(' '.join(sys.modules))"],
+        env=environment, capture_output=True, text=True, check=True
+    )
+
+    return {name.split(".")[0] for name in process.stdout.split()} & set(g_lazy_libraries)
+
+
+@pytest.mark.parametrize("module", list(g_budgets))
+def test_modules_do_not_import_the_libraries_they_do_not_use_yet(module):
+    assert imported_libraries(module) == set()
@@ -0,0 +1,84 @@
+from benchmarks.line_classifier import clean_lines, sequential_search_classify
+from src.services.CumulativeExpenseReportLineClassifier import CumulativeExpenseReportLineClassifier
+
+classifier = CumulativeExpenseReportLineClassifier()
+
+
+def test_budget_position_header():
+    line_type, match = classifier.classify("Posición Presupuestaria: G/2050000/2000 Mobiliario y Enseres")
+
+    assert line_type == CumulativeExpenseReportLineClassifier.BUDGET_POSITION_HEADER
+    assert match.group("code") == "G/2050000/2000"
+    assert match.group("name") == "Mobiliario y Enseres"
+
+
+def test_budget_position_total_amount():
+    line_type, match = classifier.classify("Importe total de la partida G/2050000/2000:               855,71")
+
+    assert line_type == CumulativeExpenseReportLineClassifier.BUDGET_POSITION_TOTAL_AMOUNT
+    assert match.group("total_amount") == "855,71"
+
+
+def test_transaction_first_line_of_known_document_type():
+    line_type, match = classifier.classify(
+        "KJ 2320053719   / 20.11.2023 G/2230100/2000 Tren Pedro Martínez Ritsi Valencia 8-12 noviembre   118,15 *"
+    )
+
+    assert line_type == CumulativeExpenseReportLineClassifier.TRANSACTION_FIRST_LINE
+    assert match.group("document_type") == "KJ"
+    assert match.group("amount") == "118,15"
+    assert match.group("asterisk") == "*"
+
+
+def test_transaction_first_line_of_unknown_document_type():
+    # Not among the document types of the grammar, but the pattern accepts any two characters
+    line_type, match = classifier.classify("ZX 4000240529   / 001 18.04.2023 G/2050000/2000               855,71")
+
+    assert line_type == CumulativeExpenseReportLineClassifier.TRANSACTION_FIRST_LINE
+    assert match.group("document_type") == "ZX"
+    assert match.group("document_position") == "001"
+
+
+def test_transaction_second_line():
+    line_type, match = classifier.classify("0842773 B82560947 OFIPAPEL CENTER. S.L.")
+
+    assert line_type == CumulativeExpenseReportLineClassifier.TRANSACTION_SECOND_LINE
+    assert match.group("reference") == "0842773"
+    assert match.group("vendor_id") == "B82560947"
+    assert match.group("vendor_name") == "OFIPAPEL CENTER. S.L."
+
+
+def test_lines_with_a_prefix_but_not_its_pattern_fall_back_to_the_second_line():
+    line_type, _ = classifier.classify("OY parece un movimiento")
+
+    assert line_type == CumulativeExpenseReportLineClassifier.TRANSACTION_SECOND_LINE
+
+
+def test_unknown_line():
+    assert classifier.classify("") == (None, None)
+
+
+def test_indented_and_prefixed_lines_are_classified_like_unindented_ones():
+    for line, line_type in [
+        ("  Posición Presupuestaria: G/2050000/2000 Mobiliario y Enseres",
+         CumulativeExpenseReportLineClassifier.BUDGET_POSITION_HEADER),
+        ("x Importe total de la partida G/2050000/2000:               855,71",
+         CumulativeExpenseReportLineClassifier.BUDGET_POSITION_TOTAL_AMOUNT),
+        ("   OY 4000240529   / 001 18.04.2023 G/2050000/2000               855,71",
+         CumulativeExpenseReportLineClassifier.TRANSACTION_FIRST_LINE),
+        ("Pág. OY 4000240529   / 001 18.04.2023 G/2050000/2000               855,71",
+         CumulativeExpenseReportLineClassifier.TRANSACTION_FIRST_LINE),
+    ]:
+        assert classifier.classify(line)[0] == line_type, line
+
+
+def test_lines_are_classified_like_the_sequential_search():
+    # The line classification before the classifier, with every pattern searched in order
+    lines = clean_lines(5_000)
+
+    for line in lines + ["  " + line for line in lines] + ["- " + line for line in lines]:
+        line_type, match = classifier.classify(line)
+        expected_line_type, expected_match = sequential_search_classify(line)
+
+        assert line_type == expected_line_type, line
+        assert (match and match.groupdict()) == (expected_match and expected_match.groupdict()), line
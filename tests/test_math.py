@@ -0,0 +1,38 @@
+import random
+
+from benchmarks.synthetic_report import SyntheticPageSource, format_es_amount, synthetic_report_pages
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.utils.math import parse_es_cents, parse_es_float
+
+
+def test_parse_es_cents():
+    assert parse_es_cents("0,91") == 91
+    assert parse_es_cents("855,71") == 85571
+    assert parse_es_cents("1.000,00") == 100000
+    assert parse_es_cents("11.384.852,92") == 1138485292
+
+
+def test_parse_es_cents_matches_the_rounded_float():
+    rng = random.Random(0)
+
+    for cents in [rng.randrange(10 ** rng.randrange(1, 12)) for _ in range(10_000)]:
+        assert parse_es_cents(format_es_amount(cents)) == cents == round(parse_es_float(format_es_amount(cents)) * 100)
+
+
+def test_sums_of_cents_are_exact():
+    # Summed as floats, 0,10 ten times is not 1,00
+    assert sum([parse_es_float("0,10")] * 10) != 1.0
+    assert sum([parse_es_cents("0,10")] * 10) == parse_es_cents("1,00")
+
+
+def test_report_total_is_the_exact_sum_of_its_transactions():
+    processor = CumulativeExpenseReportProcessor(quiet=True, incremental=False)
+    processor.pdf_text_extractor = SyntheticPageSource(synthetic_report_pages(3000, 13))
+
+    report = processor.process_report("report.pdf", None)
+
+    assert report.total_amount_cents == sum(
+        report.transactions.amount_cents(row)
+        for row in range(len(report.transactions))
+        if not report.transactions.excluded_from_total(row)
+    )
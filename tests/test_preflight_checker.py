@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+from benchmarks.synthetic_report import synthetic_report_pdf
+from src.services import CumulativeExpenseReportPreflightChecker as preflight_checker_module
+from src.services.CumulativeExpenseReportPreflightChecker import CumulativeExpenseReportPreflightChecker, \
+    run_preflight_check
+from src.services.PdfTextExtractor import PdfTextExtractor
+from src.services.ReportLimits import ReportLimits
+
+g_invalid_report = CumulativeExpenseReportPreflightChecker.INVALID_REPORT
+
+
+@pytest.fixture
+def checker(monkeypatch) -> CumulativeExpenseReportPreflightChecker:
+    # The one run_preflight_check uses, without limits, which would apply to the whole test process
+    checker = CumulativeExpenseReportPreflightChecker()
+    checker.processor.report_limits = ReportLimits(max_cpu_seconds=None, max_memory_bytes=None, max_wall_seconds=None)
+    monkeypatch.setattr(preflight_checker_module, "g_worker_preflight_checker", checker)
+
+    return checker
+
+
+def test_processable_report(checker):
+    result = run_preflight_check("report.pdf", synthetic_report_pdf(500), False)
+
+    assert result["ok"], result["errors"]
+    assert result["object_id"] == "E0390122A400"
+    assert result["number_of_pages"] == result["pdf_number_of_pages"]
+
+
+def test_pdf_without_pages(checker):
+    stream = io.BytesIO()
+    PdfTextExtractor.backend().PdfWriter().write(stream)
+
+    result = run_preflight_check("report.pdf", stream.getvalue(), False)
+
+    assert not result["ok"]
+    assert [error["code"] for error in result["errors"]] == [CumulativeExpenseReportPreflightChecker.INVALID_REPORT]
+
+
+@pytest.mark.parametrize("error, code", [
+    (ReportLimits.LimitExceededError(ReportLimits.MEMORY, "Memoria"), ReportLimits.MEMORY),
+    (ReportLimits.LimitExceededError(ReportLimits.TIMEOUT, "Tiempo"), ReportLimits.TIMEOUT),
+    (AttributeError("'NoneType' object has no attribute 'get_object'"), g_invalid_report),
+    (IndexError("list index out of range"), g_invalid_report),
+])
+def test_errors_outside_the_check_are_reported_like_its_own(checker, monkeypatch, error, code):
+    # E.g. a MemoryError turned into a limit error once check has returned, or a malformed PDF
+    expected_fields = set(run_preflight_check("report.pdf", b"", False))
+
+    def check(*arguments):
+        raise error
+
+    monkeypatch.setattr(checker, "check", check)
+    result = run_preflight_check("report.pdf", b"", False)
+
+    assert not result["ok"]
+    assert [error["code"] for error in result["errors"]] == [code]
+    assert set(result) == expected_fields
@@ -0,0 +1,79 @@
+import pytest
+
+from benchmarks.synthetic_report import SyntheticPageSource, synthetic_report_pages
+from config.config import g_report_layouts
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.ReportGrammarRegistry import ReportGrammarRegistry, report_grammar_registry
+
+# A later layout of the report, whose transactions header and object line changed
+g_new_signature = r"Clase doc\. Documento"
+g_new_report_object = r"Orden de gasto: (?P<object_id>\w+) - (?P<object_name>.+)"
+
+
+def new_layout() -> dict:
+    layout = dict(g_report_layouts["2023"])
+    layout["signature"] = g_new_signature
+    layout["report_object"] = g_new_report_object
+    layout["ignored_strings"] = [
+        ignored_string for ignored_string in layout["ignored_strings"]
+        if "Tipo" not in ignored_string and "Orden:" not in ignored_string
+    ] + [g_new_signature + ".*", g_new_report_object]
+
+    return layout
+
+
+def new_layout_pages(pages: list) -> list:
+    return [
+        page.replace("Tipo doc. Nº.Documento", "Clase doc. Documento")
+            .replace("Orden: E0390122A400 ", "Orden de gasto: E0390122A400 - ")
+        for page in pages
+    ]
+
+
+@pytest.fixture
+def registry() -> ReportGrammarRegistry:
+    return ReportGrammarRegistry({**g_report_layouts, "2024": new_layout()})
+
+
+def test_detects_the_layout_from_the_first_page(registry):
+    pages = synthetic_report_pages(100, 3)
+
+    assert registry.detect(pages[0]).name == "2023"
+    assert registry.detect(new_layout_pages(pages)[0]).name == "2024"
+    assert registry.detect("Otro documento") is None
+
+
+def test_first_layout_is_the_default(registry):
+    assert registry.names() == ["2023", "2024"]
+    assert registry.default().name == "2023"
+
+
+def test_version_changes_with_any_layout(registry):
+    assert registry.version != report_grammar_registry().version
+    assert ReportGrammarRegistry(g_report_layouts).version == report_grammar_registry().version
+
+
+def test_reports_of_every_layout_are_parsed_alike(registry):
+    pages = synthetic_report_pages(2000, 13, seed=1)
+    reports = []
+
+    for layout_pages in [pages, new_layout_pages(pages)]:
+        processor = CumulativeExpenseReportProcessor(quiet=True, incremental=False)
+        processor.grammar_registry = registry
+        processor.pdf_text_extractor = SyntheticPageSource(layout_pages)
+        reports.append(processor.process_report("report.pdf", None))
+
+    old, new = reports
+
+    assert (old.object_id, old.object_name) == ("E0390122A400", "DELEGACION ALUMNOS")
+    assert (new.object_id, new.object_name) == (old.object_id, old.object_name)
+    assert len(new.transactions) == len(old.transactions) == 2000
+    assert new.total_amount_cents == old.total_amount_cents
+
+
+def test_unknown_layouts_are_parsed_with_the_default_one():
+    processor = CumulativeExpenseReportProcessor(quiet=True, incremental=False)
+    processor.pdf_text_extractor = SyntheticPageSource(new_layout_pages(synthetic_report_pages(100, 3)))
+
+    with pytest.raises(CumulativeExpenseReportProcessor.InvalidReportError):
+        processor.process_report("report.pdf", None)
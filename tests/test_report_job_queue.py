@@ -0,0 +1,130 @@
+import os
+import time
+
+import pytest
+
+from src.services.ReportJobQueue import ReportJobQueue
+from src.services.ReportLimits import ReportLimits
+
+
+# Jobs run in the worker processes, so they have to be picklable module level functions
+def job(seconds: float) -> dict:
+    time.sleep(seconds)
+
+    return {"id": "result", "logs": "", "error": None, "error_code": None}
+
+
+def process_id() -> int:
+    return os.getpid()
+
+
+@pytest.fixture
+def new_queue():
+    queues = []
+
+    def new(**kwargs) -> ReportJobQueue:
+        queue = ReportJobQueue(**{"workers": 1, "status_path": None, **kwargs})
+        queues.append(queue)
+
+        return queue
+
+    yield new
+
+    for queue in queues:
+        if queue.executor is not None:
+            queue.executor.shutdown(cancel_futures=True)
+
+
+def wait_for(queue: ReportJobQueue, job_id: str, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+
+    while queue.status(job_id)["status"] not in (ReportJobQueue.DONE, ReportJobQueue.FAILED):
+        assert time.monotonic() < deadline, f"The job {job_id} did not finish"
+        time.sleep(0.05)
+
+    return queue.status(job_id)
+
+
+def test_jobs_over_the_pending_limit_are_rejected(new_queue):
+    queue = new_queue(max_pending=2)
+    job_ids = [queue.submit_job("a.pdf", job, (1,)), queue.submit_job("b.pdf", job, (1,))]
+
+    with pytest.raises(ReportJobQueue.QueueFullError):
+        queue.submit_job("c.pdf", job, (0,))
+
+    # Short tasks count towards the same limit
+    with pytest.raises(ReportJobQueue.QueueFullError):
+        queue.run(job, (0,))
+
+    assert queue.stats()["rejected"] == 2
+
+    for job_id in job_ids:
+        assert wait_for(queue, job_id)["status"] == ReportJobQueue.DONE
+
+    assert queue.stats()["pending"] == 0
+    assert queue.run(job, (0,))["id"] == "result"
+    assert queue.stats()["pending"] == 0
+
+
+def test_jobs_run_in_other_processes(new_queue):
+    queue = new_queue(max_pending=2)
+
+    assert queue.run(process_id, ()) != os.getpid()
+
+
+def test_kill_deadline_grows_with_the_reports_of_a_job(new_queue):
+    queue = new_queue(max_wall_seconds=10, kill_grace_seconds=5)
+
+    assert queue.kill_after_seconds(1) == 15
+    assert queue.kill_after_seconds(4) == 45
+    assert new_queue(max_wall_seconds=None).kill_after_seconds(4) is None
+
+
+def test_watchdog_kills_jobs_past_their_deadline(new_queue):
+    queue = new_queue(max_pending=4, max_wall_seconds=1, kill_grace_seconds=0)
+    job_id = queue.submit_job("stuck.pdf", job, (60,))
+    start = time.monotonic()
+
+    status = wait_for(queue, job_id)
+
+    assert status["status"] == ReportJobQueue.FAILED
+    assert status["error_code"] == ReportLimits.TIMEOUT
+    assert time.monotonic() - start < 30
+    assert queue.stats()["timeouts"] == 1
+
+    # The killed pool is replaced by a new one
+    assert wait_for(queue, queue.submit_job("next.pdf", job, (0,)))["status"] == ReportJobQueue.DONE
+
+
+def test_status_files_not_written_for_the_ttl_are_swept(new_queue, tmp_path):
+    queue = new_queue(max_pending=2, status_path=str(tmp_path), status_ttl_seconds=60)
+    job_id = queue.submit_job("a.pdf", job, (0,))
+    wait_for(queue, job_id)
+
+    # E.g. of a worker that was restarted, and the partial file of one killed while writing it
+    old = time.time() - 120
+    old_file_names = ["0b4a8c1e-old.json", "5f7d2e90-old.json.part"]
+
+    for file_name in old_file_names:
+        path = tmp_path / file_name
+        path.write_text("{}")
+        os.utime(path, (old, old))
+
+    queue.cleanup_statuses()
+
+    assert sorted(os.listdir(str(tmp_path))) == [job_id + ".json"]
+    assert queue.stats()["statuses_removed"] == 2
+    assert queue.status(job_id)["status"] == ReportJobQueue.DONE
+
+
+def test_status_files_are_swept_along_with_the_writes(new_queue, tmp_path):
+    queue = new_queue(max_pending=2, status_path=str(tmp_path), status_ttl_seconds=0)
+    first_job_id = queue.submit_job("a.pdf", job, (0,))
+    wait_for(queue, first_job_id)
+    time.sleep(0.05)
+
+    queue.next_status_cleanup = 0
+    second_job_id = queue.submit_job("b.pdf", job, (0,))
+
+    assert not os.path.exists(queue.status_file(first_job_id))
+    assert wait_for(queue, second_job_id)["status"] == ReportJobQueue.DONE
@@ -0,0 +1,36 @@
+import builtins
+
+from src.services import ReportMetrics as report_metrics_module
+from src.services.ReportMetrics import ReportMetrics
+
+
+def test_the_peak_memory_is_not_read_for_every_page(monkeypatch):
+    metrics = ReportMetrics()
+    reads = []
+    monkeypatch.setattr(metrics, "peak_rss_bytes", lambda: reads.append(None) or 1024)
+
+    for _ in range(10):
+        for stage in ReportMetrics.PAGE_STAGES:
+            metrics.add(stage, 0.001, 0.001)
+
+    metrics.add(ReportMetrics.VALIDATE, 0.001, 0.001)
+    stages = metrics.to_dict()["stages"]
+
+    assert all(stages[stage]["peak_memory_bytes"] is None for stage in ReportMetrics.PAGE_STAGES)
+    assert len(reads) == (1 if metrics.peak_rss_reset else 0)
+
+
+def test_the_peak_memory_is_skipped_without_proc(monkeypatch):
+    monkeypatch.setattr(report_metrics_module, "g_process_peak_rss_available", False)
+    opened = []
+    monkeypatch.setattr(builtins, "open", lambda *args, **kwargs: opened.append(args))
+
+    metrics = ReportMetrics()
+
+    with metrics.stage(ReportMetrics.VALIDATE):
+        pass
+    metrics.finish()
+
+    assert opened == []
+    assert metrics.to_dict()["peak_memory_bytes"] is None
+    assert metrics.to_dict()["stages"][ReportMetrics.VALIDATE]["peak_memory_bytes"] is None
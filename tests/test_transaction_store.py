@@ -0,0 +1,52 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from benchmarks.synthetic_report import SyntheticPageSource, synthetic_report_pages
+from src.services.CumulativeExpenseReportProcessor import CumulativeExpenseReportProcessor
+from src.services.TransactionStore import TransactionStore
+
+
+@pytest.fixture(scope="module")
+def report():
+    processor = CumulativeExpenseReportProcessor(quiet=True, incremental=False)
+    processor.pdf_text_extractor = SyntheticPageSource(synthetic_report_pages(200, 3))
+
+    return processor.process_report("report.pdf", None)
+
+
+@pytest.fixture
+def store(tmp_path) -> TransactionStore:
+    return TransactionStore(str(tmp_path / "transactions.sqlite3"))
+
+
+def test_older_reports_do_not_replace_newer_ones(store, report):
+    assert store.replace_transactions(report)
+
+    with store.connection() as connection:
+        connection.execute("UPDATE reports SET date = '2099-01-01' WHERE object_id = ?", (report.object_id,))
+
+    assert not store.replace_transactions(report)
+
+
+def test_newer_reports_stored_during_the_check_are_not_replaced(store, report):
+    store.connection()
+    other = sqlite3.connect(store.path)
+    other.execute("BEGIN IMMEDIATE")
+    results = []
+    writer = threading.Thread(target=lambda: results.append(store.replace_transactions(report)))
+    writer.start()
+    # The writer waits for the write lock before comparing its report with the stored one
+    time.sleep(0.2)
+    other.execute(
+        "INSERT INTO reports VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (report.object_id, report.object_name, "newer.pdf", "2099-01-01", 1, 0, 0, "2099-01-01T00:00:00")
+    )
+    other.commit()
+    writer.join()
+    other.close()
+
+    assert results == [False]
+    assert store.connection().execute("SELECT file_name FROM reports").fetchall() == [("newer.pdf",)]
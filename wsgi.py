@@ -0,0 +1,4 @@
+from src.app import App
+
+# Production entry point, e.g. gunicorn -c gunicorn.conf.py (see gunicorn.conf.py)
+application = App.create_app()